@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Request
 from sqlalchemy.orm import Session
 from typing import Optional
 
 from ..database.connection import get_db
 from ..services.auth_service import AuthService
+from .dependencies import get_auth_service, get_current_user, client_ip
 from ..schemas.user import (
     LoginRequest, LoginResponse, UserCreate, UserResponse, 
     UserSessionsResponse
@@ -11,24 +12,8 @@ from ..schemas.user import (
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
-def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
-    return AuthService(db)
-
-def get_current_user(
-    session_token: str = Header(..., alias="X-Session-Token"),
-    auth_service: AuthService = Depends(get_auth_service)
-) -> UserResponse:
-    """Get current authenticated user"""
-    user = auth_service.get_current_user(session_token)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid session token"
-        )
-    return user
-
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(
+def register(
     user_data: UserCreate,
     auth_service: AuthService = Depends(get_auth_service)
 ):
@@ -45,21 +30,15 @@ async def register(
         )
 
 @router.post("/login", response_model=LoginResponse)
-async def login(
+def login(
     login_data: LoginRequest,
+    request: Request,
     auth_service: AuthService = Depends(get_auth_service)
 ):
-    """User login - optimized async version with fallback"""
+    """User login (runs in the threadpool, so bcrypt and DB work stay off the event loop)"""
     try:
-        # Try async login method first (faster, non-blocking)
-        try:
-            response = await auth_service.login_async(login_data)
-            return response
-        except Exception as async_error:
-            # If async fails, fallback to synchronous method
-            print(f"Async login failed, using sync fallback: {async_error}")
-            response = auth_service.login(login_data)
-            return response
+        ip_address = client_ip(request)
+        return auth_service.login(login_data, ip_address)
     except HTTPException:
         raise
     except Exception as e:
@@ -73,7 +52,7 @@ async def login(
         )
 
 @router.post("/logout")
-async def logout(
+def logout(
     session_token: str = Header(..., alias="X-Session-Token"),
     auth_service: AuthService = Depends(get_auth_service)
 ):
@@ -95,7 +74,7 @@ async def logout(
         )
 
 @router.post("/logout-all")
-async def logout_all_sessions(
+def logout_all_sessions(
     current_user: UserResponse = Depends(get_current_user),
     auth_service: AuthService = Depends(get_auth_service)
 ):
@@ -117,7 +96,7 @@ async def get_current_user_info(
     return current_user
 
 @router.get("/sessions", response_model=UserSessionsResponse)
-async def get_user_sessions(
+def get_user_sessions(
     current_user: UserResponse = Depends(get_current_user),
     auth_service: AuthService = Depends(get_auth_service)
 ):
@@ -135,7 +114,7 @@ async def get_user_sessions(
         )
 
 @router.post("/cleanup-sessions")
-async def cleanup_expired_sessions(
+def cleanup_expired_sessions(
     auth_service: AuthService = Depends(get_auth_service)
 ):
     """Clean up expired sessions (admin endpoint)"""
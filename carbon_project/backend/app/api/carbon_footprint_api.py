@@ -1,70 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Header, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 
 from ..database.connection import get_db
 from ..services.carbon_footprint_service import CarbonFootprintService
-from ..services.auth_service import AuthService
+from ..services.degraded_mode import FALLBACK_MODEL_VERSION
+from ..services.footprint_export import EXPORT_FORMATS
+from ..services.footprint_import import FootprintImportService, ImportFileTooLarge
+from ..services.idempotency import (
+    MAX_KEY_LENGTH, IdempotencyKeyInProgress, IdempotencyKeyReused, idempotency_store, request_fingerprint
+)
+from .dependencies import get_current_user, admit_inference, client_ip, inference_slot
+from ..config import settings
 from ..schemas.carbon_footprint import (
     CarbonFootprintCalculationRequest,
     CarbonFootprintCalculationResponse,
     CarbonFootprintResponse,
     CarbonFootprintStats,
     EmissionTrend,
+    EmissionTrendBucket,
     RecommendationStats,
     UserGoalCreate,
     UserGoalProgress,
-    PaginationParams
+    PaginationParams,
+    CarbonFootprintPage,
+    FootprintImportStatus
 )
 from ..schemas.user import UserResponse
+from ..repositories.pagination import cursor_page
+from ..repositories.trends import TREND_BUCKETS
 
 router = APIRouter(prefix="/carbon-footprint", tags=["carbon-footprint"])
 
 def get_carbon_service(db: Session = Depends(get_db)) -> CarbonFootprintService:
     return CarbonFootprintService(db)
 
-def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
-    return AuthService(db)
-
-def get_current_user(
-    session_token: str = Header(..., alias="X-Session-Token"),
-    auth_service: AuthService = Depends(get_auth_service)
-) -> UserResponse:
-    """Get current authenticated user"""
-    user = auth_service.get_current_user(session_token)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid session token"
-        )
-    return user
+def get_import_service(db: Session = Depends(get_db)) -> FootprintImportService:
+    return FootprintImportService(db)
 
 @router.post("/calculate", response_model=CarbonFootprintCalculationResponse)
-async def calculate_carbon_footprint(
+def calculate_carbon_footprint(
     calculation_data: CarbonFootprintCalculationRequest,
     request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    deadline_ms: Optional[str] = Header(None, alias="X-Deadline-Ms"),
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
 ):
-    """Calculate carbon footprint for authenticated user"""
-    try:
-        ip_address = request.client.host if request.client else None
+    """
+    Calculate carbon footprint for authenticated user.
+    Retries that repeat the first request's Idempotency-Key get its response back
+    (with an Idempotent-Replayed header) instead of recording a second calculation;
+    while the first request is still running they wait for its response, and get
+    409 with Retry-After if it takes longer than IDEMPOTENCY_WAIT_TIMEOUT_SECONDS.
+    Only the request that runs the calculation takes an inference slot.
+    """
+    # Convert to dict for processing
+    input_data = calculation_data.dict()
+    
+    def calculate() -> dict:
+        ip_address = client_ip(request)
         user_agent = request.headers.get("user-agent")
         
-        # Convert to dict for processing
-        input_data = calculation_data.dict()
-        
-        # Calculate footprint
-        footprint = carbon_service.calculate_carbon_footprint(
-            user_id=current_user.id,
-            input_data=input_data,
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
-        
-        # Get recommendations for this footprint
-        recommendations = carbon_service.get_recommendations(current_user.id, 0, 10)
-        footprint_recommendations = [rec for rec in recommendations if rec.get('carbon_footprint_id') == footprint.id]
+        # Calculate footprint (its recommendations are saved in the background)
+        with inference_slot(settings.CALCULATE_DEADLINE_MS, deadline_ms) as degraded_reason:
+            footprint, recommendations = carbon_service.calculate_with_recommendations(
+                user_id=current_user.id,
+                input_data=input_data,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                degraded_reason=degraded_reason
+            )
         
         # Calculate breakdown for response
         breakdown = {
@@ -82,19 +90,50 @@ async def calculate_carbon_footprint(
             feature_importance={},  # TODO: Implement feature importance
             recommendations=[
                 {
-                    "category": rec["category"],
-                    "action": rec["action_required"],
-                    "potential_savings": rec["potential_savings"],
-                    "priority": rec["priority"]
+                    "category": rec.category,
+                    "action": rec.action_required,
+                    "potential_savings": rec.potential_savings,
+                    "priority": rec.priority.value
                 }
-                for rec in footprint_recommendations
+                for rec in recommendations[:10]
             ],
             calculation_uuid=footprint.calculation_uuid,
             model_name=footprint.model_name,
             model_version=footprint.model_version or "v3",
-            breakdown=breakdown  # Include breakdown data
+            breakdown=breakdown,  # Include breakdown data
+            degraded=footprint.model_version == FALLBACK_MODEL_VERSION
+        ).dict()
+    
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"
+        )
+    
+    try:
+        if idempotency_key is None:
+            result = calculate()
+        else:
+            result, replayed = idempotency_store.run(
+                str(current_user.id), idempotency_key, request_fingerprint(input_data), calculate
+            )
+            if replayed:
+                response.headers["Idempotent-Replayed"] = "true"
+        return CarbonFootprintCalculationResponse(**result)
+    
+    except HTTPException:
+        raise
+    except IdempotencyKeyReused as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    except IdempotencyKeyInProgress as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
-        
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -102,14 +141,15 @@ async def calculate_carbon_footprint(
         )
 
 @router.post("/calculate-anonymous", response_model=CarbonFootprintCalculationResponse)
-async def calculate_carbon_footprint_anonymous(
+def calculate_carbon_footprint_anonymous(
     calculation_data: CarbonFootprintCalculationRequest,
     request: Request,
-    carbon_service: CarbonFootprintService = Depends(get_carbon_service)
+    carbon_service: CarbonFootprintService = Depends(get_carbon_service),
+    degraded_reason: Optional[str] = Depends(admit_inference(settings.CALCULATE_DEADLINE_MS))
 ):
     """Calculate carbon footprint for anonymous user"""
     try:
-        ip_address = request.client.host if request.client else None
+        ip_address = client_ip(request)
         user_agent = request.headers.get("user-agent")
         
         # Convert to dict for processing
@@ -120,7 +160,8 @@ async def calculate_carbon_footprint_anonymous(
             user_id=None,  # Anonymous
             input_data=input_data,
             ip_address=ip_address,
-            user_agent=user_agent
+            user_agent=user_agent,
+            degraded_reason=degraded_reason
         )
         
         # Calculate breakdown for response
@@ -141,7 +182,8 @@ async def calculate_carbon_footprint_anonymous(
             calculation_uuid=footprint.calculation_uuid,
             model_name=footprint.model_name,
             model_version=footprint.model_version or "v3",
-            breakdown=breakdown  # Include breakdown data
+            breakdown=breakdown,  # Include breakdown data
+            degraded=footprint.model_version == FALLBACK_MODEL_VERSION
         )
         
     except Exception as e:
@@ -150,28 +192,107 @@ async def calculate_carbon_footprint_anonymous(
             detail=f"Calculation failed: {str(e)}"
         )
 
-@router.get("/history", response_model=List[CarbonFootprintResponse])
-async def get_carbon_footprint_history(
+@router.get("/history", response_model=Union[List[CarbonFootprintResponse], CarbonFootprintPage])
+def get_carbon_footprint_history(
     pagination: PaginationParams = Depends(),
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
 ):
-    """Get user's carbon footprint history"""
+    """Get user's carbon footprint history (a page with next_cursor when `cursor` is passed)"""
     try:
         footprints = carbon_service.get_user_footprints(
             user_id=current_user.id,
             skip=pagination.skip,
-            limit=pagination.limit
+            limit=pagination.limit,
+            cursor=pagination.cursor
         )
+        if pagination.cursor is not None:
+            return cursor_page(footprints, pagination.limit, lambda f: (f.calculation_date, f.id))
         return footprints
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get history: {str(e)}"
         )
 
+@router.get("/export")
+def export_carbon_footprint_history(
+    request: Request,
+    format: str = "csv",
+    current_user: UserResponse = Depends(get_current_user),
+    carbon_service: CarbonFootprintService = Depends(get_carbon_service)
+):
+    """
+    Download the user's full history as CSV or NDJSON (one JSON object per line).
+    Rows are streamed from the database as they are sent, and gzip-compressed when
+    the client accepts it.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format '{format}'; use one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {
+        "Content-Disposition": f'attachment; filename="carbon_footprint_history.{format}"',
+        "Vary": "Accept-Encoding"
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(
+        carbon_service.export_footprints(current_user.id, format, compress=compress),
+        media_type=EXPORT_FORMATS[format],
+        headers=headers
+    )
+
+@router.post("/import", response_model=FootprintImportStatus, status_code=status.HTTP_202_ACCEPTED)
+def import_carbon_footprints(
+    file: UploadFile = File(...),
+    current_user: UserResponse = Depends(get_current_user),
+    import_service: FootprintImportService = Depends(get_import_service)
+):
+    """
+    Upload a CSV of households (columns as in the calculate request) to be scored and saved
+    in the background; poll GET /carbon-footprint/import/{import_uuid} for progress
+    """
+    try:
+        footprint_import = import_service.start_import(current_user.id, file.filename, file.file)
+        return FootprintImportStatus.from_orm(footprint_import)
+    except ImportFileTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to start import: {str(e)}"
+        )
+
+@router.get("/import/{import_uuid}", response_model=FootprintImportStatus)
+def get_import_status(
+    import_uuid: str,
+    current_user: UserResponse = Depends(get_current_user),
+    import_service: FootprintImportService = Depends(get_import_service)
+):
+    """Get the progress and per-row errors of a bulk import"""
+    footprint_import = import_service.get_import(current_user.id, import_uuid)
+    if not footprint_import:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import not found"
+        )
+    return FootprintImportStatus.from_orm(footprint_import)
+
 @router.get("/stats", response_model=CarbonFootprintStats)
-async def get_carbon_footprint_stats(
+def get_carbon_footprint_stats(
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
 ):
@@ -185,21 +306,36 @@ async def get_carbon_footprint_stats(
             detail=f"Failed to get stats: {str(e)}"
         )
 
-@router.get("/trends", response_model=List[EmissionTrend])
-async def get_emission_trends(
+@router.get("/trends", response_model=Union[List[EmissionTrendBucket], List[EmissionTrend]])
+def get_emission_trends(
     days: int = 30,
+    bucket: Optional[str] = None,
+    max_points: Optional[int] = None,
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
 ):
-    """Get user's emission trends over time"""
+    """
+    Get user's emission trends over time.
+    `bucket` (day, week, month) aggregates per period; `max_points` downsamples long series.
+    """
     try:
         if days < 1 or days > 365:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Days must be between 1 and 365"
             )
+        if bucket is not None and bucket not in TREND_BUCKETS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Bucket must be one of: {', '.join(TREND_BUCKETS)}"
+            )
+        if max_points is not None and (max_points < 3 or max_points > 5000):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="max_points must be between 3 and 5000"
+            )
         
-        trends = carbon_service.get_emission_trends(current_user.id, days)
+        trends = carbon_service.get_emission_trends(current_user.id, days, bucket, max_points)
         return trends
     except HTTPException:
         raise
@@ -210,19 +346,27 @@ async def get_emission_trends(
         )
 
 @router.get("/recommendations")
-async def get_recommendations(
+def get_recommendations(
     pagination: PaginationParams = Depends(),
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
 ):
-    """Get user's recommendations"""
+    """Get user's recommendations (a page with next_cursor when `cursor` is passed)"""
     try:
         recommendations = carbon_service.get_recommendations(
             user_id=current_user.id,
             skip=pagination.skip,
-            limit=pagination.limit
+            limit=pagination.limit,
+            cursor=pagination.cursor
         )
+        if pagination.cursor is not None:
+            return cursor_page(recommendations, pagination.limit, lambda r: (r["created_at"], r["id"]))
         return recommendations
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -230,7 +374,7 @@ async def get_recommendations(
         )
 
 @router.post("/recommendations/{recommendation_id}/implement")
-async def mark_recommendation_implemented(
+def mark_recommendation_implemented(
     recommendation_id: int,
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
@@ -253,7 +397,7 @@ async def mark_recommendation_implemented(
         )
 
 @router.get("/recommendations/stats", response_model=RecommendationStats)
-async def get_recommendation_stats(
+def get_recommendation_stats(
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
 ):
@@ -268,7 +412,7 @@ async def get_recommendation_stats(
         )
 
 @router.post("/goals")
-async def create_goal(
+def create_goal(
     goal_data: UserGoalCreate,
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
@@ -284,19 +428,27 @@ async def create_goal(
         )
 
 @router.get("/goals")
-async def get_user_goals(
+def get_user_goals(
     pagination: PaginationParams = Depends(),
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
 ):
-    """Get user's goals"""
+    """Get user's goals (a page with next_cursor when `cursor` is passed)"""
     try:
         goals = carbon_service.get_user_goals(
             user_id=current_user.id,
             skip=pagination.skip,
-            limit=pagination.limit
+            limit=pagination.limit,
+            cursor=pagination.cursor
         )
+        if pagination.cursor is not None:
+            return cursor_page(goals, pagination.limit, lambda g: (g["target_date"], g["id"]))
         return goals
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -304,7 +456,7 @@ async def get_user_goals(
         )
 
 @router.get("/goals/{goal_id}/progress", response_model=UserGoalProgress)
-async def get_goal_progress(
+def get_goal_progress(
     goal_id: int,
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
@@ -327,7 +479,7 @@ async def get_goal_progress(
         )
 
 @router.post("/goals/{goal_id}/achieve")
-async def mark_goal_achieved(
+def mark_goal_achieved(
     goal_id: int,
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
@@ -350,7 +502,7 @@ async def mark_goal_achieved(
         )
 
 @router.delete("/goals/{goal_id}")
-async def delete_goal(
+def delete_goal(
     goal_id: int,
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
@@ -373,7 +525,7 @@ async def delete_goal(
         )
 
 @router.get("/dashboard")
-async def get_dashboard_data(
+def get_dashboard_data(
     current_user: UserResponse = Depends(get_current_user),
     carbon_service: CarbonFootprintService = Depends(get_carbon_service)
 ):
@@ -4,27 +4,11 @@ from typing import Optional
 from pydantic import BaseModel
 
 from ..database.connection import get_db
-from ..services.auth_service import AuthService
+from .dependencies import get_optional_user
 from ..schemas.user import UserResponse
 
 router = APIRouter(prefix="/chatbot", tags=["chatbot"])
 
-def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
-    return AuthService(db)
-
-def get_current_user(
-    session_token: Optional[str] = Header(None, alias="X-Session-Token"),
-    auth_service: AuthService = Depends(get_auth_service)
-) -> Optional[UserResponse]:
-    """Get current user if authenticated, otherwise return None (for anonymous access)"""
-    if not session_token:
-        return None
-    try:
-        user = auth_service.get_user_by_session_token(session_token)
-        return user
-    except Exception:
-        return None
-
 # Chatbot Models
 class ChatbotRequest(BaseModel):
     question: str
@@ -187,7 +171,7 @@ What would you like to know?"""
 @router.post("", response_model=ChatbotResponse)
 async def chat_with_bot(
     request: ChatbotRequest,
-    current_user: Optional[UserResponse] = Depends(get_current_user),
+    current_user: Optional[UserResponse] = Depends(get_optional_user),
     db: Session = Depends(get_db)
 ):
     """Chat with the AI sustainability assistant"""
@@ -0,0 +1,99 @@
+from fastapi import Depends, HTTPException, status, Header, Request
+from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import math
+
+from ..database.connection import get_db
+from ..services.auth_service import AuthService
+from ..services.admission import AdmissionRejected, effective_deadline, inference_admission
+from ..services.degraded_mode import degraded_mode
+from ..services.rate_limit import resolve_client_ip
+from ..schemas.user import UserResponse
+
+def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
+    return AuthService(db)
+
+def client_ip(request: Request) -> Optional[str]:
+    """Client address, taken from X-Forwarded-For only when the peer is a trusted proxy"""
+    return resolve_client_ip(
+        request.client.host if request.client else None,
+        ",".join(request.headers.getlist("x-forwarded-for"))
+    )
+
+def charge_user_rate_limit(request: Request, user: UserResponse) -> None:
+    """
+    Spend the request's cost from the user's bucket as well as the client IP's one;
+    only done once the session token has resolved to a user, so made-up tokens get no bucket
+    """
+    limiter = getattr(request.state, "rate_limiter", None)
+    if limiter is None:
+        return
+    retry_after = limiter.charge(f"user:{user.id}", request.state.rate_limit_cost)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded. Please slow down.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+def get_current_user(
+    request: Request,
+    session_token: str = Header(..., alias="X-Session-Token"),
+    auth_service: AuthService = Depends(get_auth_service)
+) -> UserResponse:
+    """Get current authenticated user"""
+    user = auth_service.get_current_user(session_token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid session token"
+        )
+    charge_user_rate_limit(request, user)
+    return user
+
+def get_optional_user(
+    request: Request,
+    session_token: Optional[str] = Header(None, alias="X-Session-Token"),
+    auth_service: AuthService = Depends(get_auth_service)
+) -> Optional[UserResponse]:
+    """Get current user if authenticated, otherwise return None (for anonymous access)"""
+    if not session_token:
+        return None
+    try:
+        user = auth_service.get_current_user(session_token)
+    except Exception:
+        return None
+    if user:
+        charge_user_rate_limit(request, user)
+    return user
+
+@contextmanager
+def inference_slot(route_deadline_ms: int, deadline_ms: Optional[str]) -> Iterator[Optional[str]]:
+    """
+    Hold a model inference slot for the block. Yields None when the primary model should
+    serve it, or the reason to serve the fallback model instead; with degraded mode off,
+    requests that can't make their deadline get 503 with Retry-After
+    """
+    reason = degraded_mode.overload_reason()
+    if reason is None:
+        try:
+            with inference_admission.admit(effective_deadline(route_deadline_ms, deadline_ms)):
+                yield None
+            return
+        except AdmissionRejected as e:
+            if not degraded_mode.enabled:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"Prediction service is overloaded: {e.reason}",
+                    headers={"Retry-After": str(e.retry_after)}
+                )
+            reason = "deadline"
+    yield reason
+
+def admit_inference(route_deadline_ms: int):
+    """Dependency holding a model inference slot (see inference_slot) for the whole request"""
+    def admission(deadline_ms: Optional[str] = Header(None, alias="X-Deadline-Ms")):
+        with inference_slot(route_deadline_ms, deadline_ms) as reason:
+            yield reason
+    return admission
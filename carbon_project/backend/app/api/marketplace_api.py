@@ -1,30 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 
 from ..database.connection import get_db
-from ..services.auth_service import AuthService
+from .dependencies import get_optional_user, client_ip
 from ..schemas.user import UserResponse
+from ..services.audit_log import audit_log
 
 router = APIRouter(prefix="/marketplace", tags=["marketplace"])
 
-def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
-    return AuthService(db)
-
-def get_current_user(
-    session_token: Optional[str] = Header(None, alias="X-Session-Token"),
-    auth_service: AuthService = Depends(get_auth_service)
-) -> Optional[UserResponse]:
-    """Get current user if authenticated, otherwise return None (for anonymous access)"""
-    if not session_token:
-        return None
-    try:
-        user = auth_service.get_user_by_session_token(session_token)
-        return user
-    except Exception:
-        return None
-
 # Marketplace Item Models
 class MarketplaceItem(BaseModel):
     id: str
@@ -250,7 +235,7 @@ MARKETPLACE_ITEMS = [
 async def get_marketplace_items(
     category: Optional[str] = None,
     featured: Optional[bool] = None,
-    current_user: Optional[UserResponse] = Depends(get_current_user)
+    current_user: Optional[UserResponse] = Depends(get_optional_user)
 ):
     """Get all marketplace items, optionally filtered by category or featured status"""
     items = MARKETPLACE_ITEMS.copy()
@@ -268,7 +253,7 @@ async def get_marketplace_items(
 @router.get("/items/{item_id}", response_model=MarketplaceItem)
 async def get_marketplace_item(
     item_id: str,
-    current_user: Optional[UserResponse] = Depends(get_current_user)
+    current_user: Optional[UserResponse] = Depends(get_optional_user)
 ):
     """Get a specific marketplace item by ID"""
     item = next((item for item in MARKETPLACE_ITEMS if item["id"] == item_id), None)
@@ -280,9 +265,10 @@ async def get_marketplace_item(
     return item
 
 @router.post("/purchase", response_model=PurchaseResponse)
-async def purchase_item(
+def purchase_item(
     purchase_request: PurchaseRequest,
-    current_user: Optional[UserResponse] = Depends(get_current_user),
+    request: Request,
+    current_user: Optional[UserResponse] = Depends(get_optional_user),
     db: Session = Depends(get_db)
 ):
     """Purchase a marketplace item"""
@@ -311,6 +297,17 @@ async def purchase_item(
     
     # For now, return success response
     purchase_id = f"purchase_{purchase_request.item_id}_{current_user.id if current_user else 'anon'}"
+    audit_log.record(
+        "PURCHASE", "marketplace_items", user_id=current_user.id if current_user else None,
+        new_values={
+            "purchase_id": purchase_id,
+            "item_id": purchase_request.item_id,
+            "quantity": purchase_request.quantity,
+            "price": item["price"]
+        },
+        ip_address=client_ip(request),
+        user_agent=request.headers.get("user-agent")
+    )
     
     return PurchaseResponse(
         success=True,
@@ -0,0 +1,65 @@
+import json
+import math
+from typing import Dict, Optional
+
+from ..services.rate_limit import TokenBucketStore, resolve_client_ip
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing token buckets per client IP (behind TRUSTED_PROXIES,
+    the X-Forwarded-For client). Each request spends its path's cost from the
+    bucket; empty buckets get 429 with Retry-After.
+
+    Session tokens are not trusted here: authenticated requests are also charged
+    to a per-user bucket once get_current_user has resolved the token, through
+    the limiter and cost this middleware leaves in request.state.
+    """
+
+    def __init__(self, app, store: TokenBucketStore, per_minute: int, burst: int,
+                 route_costs: Optional[Dict[str, float]] = None, enabled: bool = True):
+        self.app = app
+        self.store = store
+        self.rate_per_second = per_minute / 60.0
+        self.capacity = float(burst)
+        self.route_costs = route_costs or {}
+        self.enabled = enabled
+
+    @staticmethod
+    def _client_key(scope) -> str:
+        forwarded_for = ",".join(
+            value.decode("latin-1") for name, value in scope.get("headers", []) if name == b"x-forwarded-for"
+        )
+        client = scope.get("client")
+        return f"ip:{resolve_client_ip(client[0] if client else None, forwarded_for) or 'unknown'}"
+
+    def charge(self, key: str, cost: float) -> float:
+        """Spend `cost` from the key's bucket; return 0 if allowed, else seconds until it can be"""
+        return self.store.take(key, cost, self.rate_per_second, self.capacity) if cost else 0
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        # A cost above the burst size could never be paid, so cap it at a full bucket
+        cost = min(self.route_costs.get(scope["path"].rstrip("/") or "/", 1.0), self.capacity)
+        state = scope.setdefault("state", {})
+        state["rate_limiter"] = self
+        state["rate_limit_cost"] = cost
+        retry_after = self.charge(self._client_key(scope), cost)
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Rate limit exceeded. Please slow down."}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -14,6 +14,11 @@ class Settings:
     DB_USER: str = os.getenv("DB_USER", "carbon_user")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "secure_password")
     DB_NAME: str = os.getenv("DB_NAME", "carbon_footprint_db")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    
+    # Worker threads for sync route handlers; defaults to one per pooled DB connection
+    THREADPOOL_SIZE: int = int(os.getenv("THREADPOOL_SIZE", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
     
     @property
     def DATABASE_URL(self) -> str:
@@ -31,6 +36,40 @@ class Settings:
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
     
+    # Session tokens: "opaque" (random, resolved through user_sessions) or "signed"
+    # (HMAC-signed with SECRET_KEY, valid for ACCESS_TOKEN_EXPIRE_MINUTES, verified without I/O;
+    # the app refuses to start in signed mode unless SECRET_KEY is changed and at least 32 characters)
+    SESSION_TOKEN_MODE: str = os.getenv("SESSION_TOKEN_MODE", "opaque")
+    SESSION_REVOCATION_SYNC_SECONDS: int = int(os.getenv("SESSION_REVOCATION_SYNC_SECONDS", "30"))
+    
+    # Expired session sweeper (interval 0 disables it); jitter spreads sweeps across workers
+    SESSION_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "900"))
+    SESSION_SWEEP_JITTER_SECONDS: int = int(os.getenv("SESSION_SWEEP_JITTER_SECONDS", "120"))
+    SESSION_CLEANUP_BATCH_SIZE: int = int(os.getenv("SESSION_CLEANUP_BATCH_SIZE", "5000"))
+    
+    # Background jobs (durable SQLite queue drained by a worker task in each process; an
+    # interval of 0 disables the worker)
+    JOB_QUEUE_PATH: str = os.getenv("JOB_QUEUE_PATH", "cache/jobs.sqlite3")
+    JOB_WORKER_INTERVAL_SECONDS: float = float(os.getenv("JOB_WORKER_INTERVAL_SECONDS", "0.5"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+    
+    # Audit trail (buffered per process and written in batches; events that can't be buffered
+    # or written are appended to the spill file and replayed later)
+    AUDIT_LOG_ENABLED: bool = os.getenv("AUDIT_LOG_ENABLED", "True").lower() == "true"
+    AUDIT_BUFFER_SIZE: int = int(os.getenv("AUDIT_BUFFER_SIZE", "10000"))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    AUDIT_FLUSH_INTERVAL_MS: int = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "1000"))
+    AUDIT_BLOCK_TIMEOUT_MS: int = int(os.getenv("AUDIT_BLOCK_TIMEOUT_MS", "20"))
+    AUDIT_SPILL_PATH: str = os.getenv("AUDIT_SPILL_PATH", "cache/audit_spill.jsonl")
+    
+    # Password hashing pool ("thread" or "process"); workers 0 means one per CPU core.
+    # Logins/registrations wait up to the queue timeout for one of workers + max_pending slots, then get a 503
+    PASSWORD_HASH_MODE: str = os.getenv("PASSWORD_HASH_MODE", "thread")
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS", "2"))
+    
     # Application Configuration
     APP_NAME: str = os.getenv("APP_NAME", "Carbon Footprint Calculator")
     APP_VERSION: str = os.getenv("APP_VERSION", "1.0.0")
@@ -49,11 +88,89 @@ class Settings:
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
     RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", "100"))
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    RATE_LIMIT_MAX_CLIENTS: int = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+    # Token cost per request path ("path=cost,..."); unlisted paths cost 1, cost 0 exempts a path
+    RATE_LIMIT_ROUTE_COSTS: dict = {
+        path.strip(): float(cost)
+        for path, cost in (
+            item.split("=", 1)
+            for item in os.getenv(
+                "RATE_LIMIT_ROUTE_COSTS",
+                "/predict=10,/carbon-footprint/calculate-anonymous=10,/carbon-footprint/calculate=5,"
+                "/carbon-footprint/export=10,/carbon-footprint/import=10,/health=0,/metrics=0"
+            ).split(",")
+            if "=" in item
+        )
+    }
+    
+    # Proxies/load balancers (IPs or CIDR ranges) whose X-Forwarded-For is trusted for the client IP
+    TRUSTED_PROXIES: List[str] = [
+        proxy.strip() for proxy in os.getenv("TRUSTED_PROXIES", "").split(",") if proxy.strip()
+    ]
+    
+    # Login throttling (sliding window per email and per client IP)
+    LOGIN_THROTTLE_WINDOW_SECONDS: int = int(os.getenv("LOGIN_THROTTLE_WINDOW_SECONDS", "300"))
+    LOGIN_ATTEMPTS_PER_EMAIL: int = int(os.getenv("LOGIN_ATTEMPTS_PER_EMAIL", "10"))
+    LOGIN_ATTEMPTS_PER_IP: int = int(os.getenv("LOGIN_ATTEMPTS_PER_IP", "50"))
+    LOGIN_THROTTLE_MAX_KEYS: int = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+    
+    # Inference admission control (concurrency 0 means one per CPU core); clients may send a
+    # shorter budget in the X-Deadline-Ms header
+    INFERENCE_CONCURRENCY: int = int(os.getenv("INFERENCE_CONCURRENCY", "0"))
+    PREDICT_DEADLINE_MS: int = int(os.getenv("PREDICT_DEADLINE_MS", "2000"))
+    CALCULATE_DEADLINE_MS: int = int(os.getenv("CALCULATE_DEADLINE_MS", "5000"))
+    
+    # Degraded mode: serve the lightweight fallback model when the primary model failed to load
+    # or more than DEGRADED_QUEUE_THRESHOLD inference requests are queued ("auto", "off" or "force")
+    DEGRADED_MODE: str = os.getenv("DEGRADED_MODE", "auto").lower()
+    DEGRADED_QUEUE_THRESHOLD: int = int(os.getenv("DEGRADED_QUEUE_THRESHOLD", "8"))
+    FALLBACK_MODEL_PATH: str = os.getenv("FALLBACK_MODEL_PATH", "")
+    PRIMARY_MODEL_RETRY_SECONDS: int = int(os.getenv("PRIMARY_MODEL_RETRY_SECONDS", "60"))
+    
+    # Query Monitoring
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+    QUERY_COUNT_WARNING_THRESHOLD: int = int(os.getenv("QUERY_COUNT_WARNING_THRESHOLD", "15"))
+    
+    # Caching ("memory" is per-process; "sqlite" is shared by workers on one host)
+    CACHE_SQLITE_PATH: str = os.getenv("CACHE_SQLITE_PATH", "cache/app_cache.sqlite3")
+    # "sqlite" so an invalidation after a write (or a recommendations job run by another worker)
+    # reaches every worker; with "memory" other workers serve the old dashboard for up to the TTL
+    DASHBOARD_CACHE_BACKEND: str = os.getenv("DASHBOARD_CACHE_BACKEND", "sqlite")
+    DASHBOARD_CACHE_TTL_SECONDS: int = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "300"))
+    DASHBOARD_CACHE_MAX_ENTRIES: int = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "10000"))
+    SINGLE_FLIGHT_TIMEOUT_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_TIMEOUT_SECONDS", "10"))
+    # Logout only clears the session cache of the worker that handled it: with the "memory" backend
+    # other workers keep accepting the token for up to SESSION_CACHE_TTL_SECONDS; "sqlite" makes it
+    # immediate for every worker on the host (signed tokens are bounded by the revocation sync instead)
+    SESSION_CACHE_BACKEND: str = os.getenv("SESSION_CACHE_BACKEND", "memory")
+    SESSION_CACHE_TTL_SECONDS: int = int(os.getenv("SESSION_CACHE_TTL_SECONDS", "5"))
+    SESSION_CACHE_MAX_ENTRIES: int = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "50000"))
+
+    # Idempotency-Key support for /carbon-footprint/calculate ("sqlite" so a retry that lands on
+    # another worker still finds the first request; "memory" is only safe with a single worker)
+    IDEMPOTENCY_CACHE_BACKEND: str = os.getenv("IDEMPOTENCY_CACHE_BACKEND", "sqlite")
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_MAX_ENTRIES: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "100000"))
+    # How long a key stays claimed by a request that never finished (e.g. its worker died)
+    IDEMPOTENCY_IN_PROGRESS_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_IN_PROGRESS_TTL_SECONDS", "120"))
+    # How long a retry waits for the first request with its key to finish before getting 409
+    IDEMPOTENCY_WAIT_TIMEOUT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT_SECONDS", "10"))
+    
+    # History export (rows fetched per round trip from the server-side cursor)
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
     
     # File Upload
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
     
+    # Bulk CSV imports (uploads are kept under UPLOAD_DIR/imports until processed; each background
+    # job scores IMPORT_CHUNKS_PER_JOB chunks of IMPORT_CHUNK_SIZE rows, then queues the rest)
+    IMPORT_MAX_FILE_SIZE: int = int(os.getenv("IMPORT_MAX_FILE_SIZE", "52428800"))  # 50MB
+    IMPORT_CHUNK_SIZE: int = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+    IMPORT_CHUNKS_PER_JOB: int = int(os.getenv("IMPORT_CHUNKS_PER_JOB", "20"))
+    IMPORT_MAX_REPORTED_ERRORS: int = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+    
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE: str = os.getenv("LOG_FILE", "logs/app.log")
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
@@ -7,6 +7,7 @@ from typing import Generator
 from dotenv import load_dotenv
 
 from app.config import settings
+from app.database.query_monitor import install_query_monitor
 
 # Load environment variables
 load_dotenv()
@@ -18,13 +19,16 @@ DATABASE_URL = os.getenv("DATABASE_URL") or settings.DATABASE_URL
 engine = create_engine(
     DATABASE_URL,
     poolclass=QueuePool,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
     pool_pre_ping=True,
     pool_recycle=3600,
     echo=False  # Set to True for SQL query logging
 )
 
+# Per-request query counts, DB time and slow-query logging
+install_query_monitor(engine)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -47,9 +51,32 @@ def create_tables():
     """
     # Import models to register them with Base.metadata
     from ..models.user import User, UserSession
-    from ..models.carbon_footprint import CarbonFootprint, Recommendation, UserGoal, AuditLog
+    from ..models.carbon_footprint import (
+        CarbonFootprint, Recommendation, UserGoal, AuditLog,
+        UserFootprintRollup, UserFootprintRollupBucket, FootprintImport
+    )
     
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+
+def add_missing_columns(bind=engine):
+    """
+    Add columns that newer code reads to tables created before them (create_all only
+    creates missing tables); scripts/migrate_database.py has the MySQL-specific versions
+    """
+    columns = {column["name"] for column in inspect(bind).get_columns("user_sessions")}
+    if "revoked_at" not in columns:
+        with bind.begin() as connection:
+            connection.execute(text("ALTER TABLE user_sessions ADD COLUMN revoked_at TIMESTAMP NULL"))
+            connection.execute(text("CREATE INDEX idx_revoked_at ON user_sessions (revoked_at)"))
+        print("✅ Added user_sessions.revoked_at")
+    
+    columns = {column["name"] for column in inspect(bind).get_columns("carbon_footprints")}
+    if "import_id" not in columns:
+        with bind.begin() as connection:
+            connection.execute(text("ALTER TABLE carbon_footprints ADD COLUMN import_id INTEGER NULL"))
+            connection.execute(text("CREATE INDEX ix_carbon_footprints_import_id ON carbon_footprints (import_id)"))
+        print("✅ Added carbon_footprints.import_id")
 
 def drop_tables():
     """
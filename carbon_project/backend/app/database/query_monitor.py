@@ -0,0 +1,217 @@
+"""
+Per-request SQL query monitoring.
+
+Hooks SQLAlchemy's cursor events to count statements and DB time for the
+current request, log slow statements with their call site, and flag
+requests that issue more statements than expected (typical N+1 patterns).
+"""
+import os
+import re
+import threading
+import time
+import traceback
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.config import settings
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(statement: str) -> str:
+    """Collapse literals, IN-lists and whitespace so similar statements group together"""
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("(?)", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return normalized
+
+
+def _find_call_site() -> str:
+    """Return the innermost application frame outside the database package"""
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(_APP_DIR) and not filename.startswith(_DATABASE_DIR):
+            return f"{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+class RequestQueryStats:
+    """Query counters collected while handling a single request"""
+
+    def __init__(self):
+        self.query_count = 0
+        self.total_db_time_ms = 0.0
+        self.slow_queries: List[Dict[str, Any]] = []
+        self.statement_counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration_ms: float, slow_entry: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self.query_count += 1
+            self.total_db_time_ms += duration_ms
+            self.statement_counts[normalize_sql(statement)] += 1
+            if slow_entry:
+                self.slow_queries.append(slow_entry)
+
+    def repeated_statements(self, min_count: int = 2) -> List[Dict[str, Any]]:
+        """Statements issued several times in this request, most frequent first"""
+        return [
+            {"statement": statement, "count": count}
+            for statement, count in self.statement_counts.most_common()
+            if count >= min_count
+        ]
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def start_request_tracking():
+    """Begin collecting query stats for the current request; returns (stats, token)"""
+    stats = RequestQueryStats()
+    token = _current_stats.set(stats)
+    return stats, token
+
+
+def stop_request_tracking(token) -> None:
+    _current_stats.reset(token)
+
+
+def get_current_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+class QueryMetrics:
+    """Process-wide aggregates exposed through the /metrics endpoint"""
+
+    def __init__(self, max_tracked_statements: int = 100, max_tracked_routes: int = 200):
+        self._lock = threading.Lock()
+        self._max_tracked_statements = max_tracked_statements
+        self._max_tracked_routes = max_tracked_routes
+        self.total_requests = 0
+        self.total_queries = 0
+        self.total_db_time_ms = 0.0
+        self.max_queries_per_request = 0
+        self.query_count_warnings = 0
+        self.slow_query_count = 0
+        self._slow_statements: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._routes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def record_slow_query(self, entry: Dict[str, Any]):
+        with self._lock:
+            self.slow_query_count += 1
+            statement = entry["statement"]
+            tracked = self._slow_statements.pop(statement, None)
+            if tracked is None:
+                tracked = {"statement": statement, "count": 0, "max_ms": 0.0, "call_site": entry["call_site"]}
+            tracked["count"] += 1
+            tracked["max_ms"] = max(tracked["max_ms"], entry["duration_ms"])
+            tracked["call_site"] = entry["call_site"]
+            self._slow_statements[statement] = tracked
+            while len(self._slow_statements) > self._max_tracked_statements:
+                self._slow_statements.popitem(last=False)
+
+    def record_request(self, route: str, stats: RequestQueryStats, warned: bool = False):
+        with self._lock:
+            self.total_requests += 1
+            self.total_queries += stats.query_count
+            self.total_db_time_ms += stats.total_db_time_ms
+            self.max_queries_per_request = max(self.max_queries_per_request, stats.query_count)
+            if warned:
+                self.query_count_warnings += 1
+
+            route_stats = self._routes.pop(route, None)
+            if route_stats is None:
+                route_stats = {"requests": 0, "queries": 0, "max_queries": 0, "db_time_ms": 0.0}
+            route_stats["requests"] += 1
+            route_stats["queries"] += stats.query_count
+            route_stats["max_queries"] = max(route_stats["max_queries"], stats.query_count)
+            route_stats["db_time_ms"] += stats.total_db_time_ms
+            self._routes[route] = route_stats
+            while len(self._routes) > self._max_tracked_routes:
+                self._routes.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {
+                route: {
+                    "requests": data["requests"],
+                    "avg_queries": round(data["queries"] / data["requests"], 2),
+                    "max_queries": data["max_queries"],
+                    "avg_db_time_ms": round(data["db_time_ms"] / data["requests"], 2),
+                }
+                for route, data in self._routes.items()
+            }
+            return {
+                "total_requests": self.total_requests,
+                "total_queries": self.total_queries,
+                "avg_queries_per_request": round(self.total_queries / self.total_requests, 2) if self.total_requests else 0,
+                "max_queries_per_request": self.max_queries_per_request,
+                "total_db_time_ms": round(self.total_db_time_ms, 2),
+                "query_count_warnings": self.query_count_warnings,
+                "slow_query_count": self.slow_query_count,
+                "slow_statements": sorted(self._slow_statements.values(), key=lambda s: s["max_ms"], reverse=True),
+                "routes": routes,
+            }
+
+    def reset(self):
+        self.__init__(self._max_tracked_statements, self._max_tracked_routes)
+
+
+query_metrics = QueryMetrics()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    duration_ms = (time.perf_counter() - start_times.pop()) * 1000
+
+    slow_entry = None
+    if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+        slow_entry = {
+            "statement": normalize_sql(statement),
+            "duration_ms": round(duration_ms, 2),
+            "call_site": _find_call_site(),
+        }
+        query_metrics.record_slow_query(slow_entry)
+        print(f"🐢 Slow query ({slow_entry['duration_ms']}ms) at {slow_entry['call_site']}: {slow_entry['statement']}")
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration_ms, slow_entry)
+
+
+def install_query_monitor(engine) -> None:
+    """Attach the query monitor to an engine (idempotent)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def finish_request(route: str, stats: RequestQueryStats) -> bool:
+    """Record request totals and warn when the statement count looks like an N+1; returns True if warned"""
+    warned = stats.query_count > settings.QUERY_COUNT_WARNING_THRESHOLD
+    if warned:
+        repeated = stats.repeated_statements()[:3]
+        print(f"⚠️  {route} issued {stats.query_count} queries "
+              f"(threshold {settings.QUERY_COUNT_WARNING_THRESHOLD}, {stats.total_db_time_ms:.1f}ms in DB)")
+        for item in repeated:
+            print(f"   → {item['count']}x {item['statement'][:200]}")
+    query_metrics.record_request(route, stats, warned)
+    return warned
@@ -1,10 +1,13 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import sys
 import os
+import time
+import asyncio
+import anyio.to_thread
 
 # Setup Python path FIRST before any imports
 # Get the directory containing this file (app/)
@@ -40,7 +43,20 @@ CarbonEmissionPredictorFixed = predict_module.CarbonEmissionPredictorFixed
 
 print(f"DEBUG: Successfully imported CarbonEmissionPredictorFixed")
 from app.config import settings
-from app.database.connection import create_tables, test_database_connection
+from app.database.connection import SessionLocal, create_tables, test_database_connection
+from app.database.query_monitor import start_request_tracking, stop_request_tracking, finish_request, query_metrics
+from app.services.carbon_footprint_service import dashboard_cache, read_flight
+from app.services.idempotency import idempotency_store
+from app.services.session_sweeper import run_session_sweeper
+from app.services.session_tokens import check_signing_key
+from app.services.password_hasher import password_hasher
+from app.services.rate_limit import login_throttle, request_buckets
+from app.api.middleware import RateLimitMiddleware
+from app.api.dependencies import admit_inference
+from app.services.admission import inference_admission
+from app.services.degraded_mode import degraded_mode
+from app.services.job_queue import job_queue, run_job_worker
+from app.services.audit_log import audit_log
 
 # Create FastAPI app
 app = FastAPI(
@@ -49,6 +65,16 @@ app = FastAPI(
     description="API for predicting carbon footprint with user management and historical tracking"
 )
 
+# Per-client token buckets (added before CORS so 429 responses still carry CORS headers)
+app.add_middleware(
+    RateLimitMiddleware,
+    store=request_buckets,
+    per_minute=settings.RATE_LIMIT_PER_MINUTE,
+    burst=settings.RATE_LIMIT_BURST,
+    route_costs=settings.RATE_LIMIT_ROUTE_COSTS,
+    enabled=settings.RATE_LIMIT_ENABLED
+)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -58,9 +84,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def add_timing_headers(request: Request, call_next):
+    """Expose request time, DB time and query count via Server-Timing and X-DB-Query-Count"""
+    start_time = time.perf_counter()
+    stats, token = start_request_tracking()
+    try:
+        response = await call_next(request)
+    finally:
+        stop_request_tracking(token)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    
+    response.headers["Server-Timing"] = (
+        f'app;dur={elapsed_ms:.2f}, db;dur={stats.total_db_time_ms:.2f};desc="{stats.query_count} queries"'
+    )
+    response.headers["X-Process-Time"] = f"{elapsed_ms:.2f}ms"
+    response.headers["X-DB-Query-Count"] = str(stats.query_count)
+    
+    route = request.scope.get("route")
+    finish_request(f"{request.method} {getattr(route, 'path', request.url.path)}", stats)
+    return response
+
 # Global predictor variable (will be initialized on startup)
 predictor = None
 
+def load_predictor():
+    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    model_path = os.path.join(current_dir, "app", "ml", "models", "v3_carbon_emission_model_minimal.pkl")
+    preprocessor_path = os.path.join(current_dir, "app", "ml", "models", "v3_preprocessor.pkl")
+    return CarbonEmissionPredictorFixed(
+        model_path=model_path,
+        preprocessor_path=preprocessor_path
+    )
+
 # Create database tables and load ML model on startup
 @app.on_event("startup")
 async def startup_event():
@@ -69,6 +125,13 @@ async def startup_event():
     print("🚀 Starting Carbon Footprint API...")
     print("=" * 60)
     
+    # Signed session tokens with a guessable key would let anyone forge a session
+    check_signing_key()
+    
+    # DB-bound routes are sync handlers run on AnyIO's threadpool; size it to the connection pool
+    # so requests queue for a thread instead of timing out waiting for a connection
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    
     # Initialize database tables
     try:
         create_tables()
@@ -88,22 +151,35 @@ async def startup_event():
         print(f"⚠️  Database connection check failed: {e}")
         print("⚠️  Server will continue - check database settings if you need database features")
     
-    # Load ML model (this is the heavy part)
-    try:
-        print("📦 Loading ML model...")
-        current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        model_path = os.path.join(current_dir, "app", "ml", "models", "v3_carbon_emission_model_minimal.pkl")
-        preprocessor_path = os.path.join(current_dir, "app", "ml", "models", "v3_preprocessor.pkl")
-        
-        predictor = CarbonEmissionPredictorFixed(
-            model_path=model_path,
-            preprocessor_path=preprocessor_path
-        )
+    # Load ML model (this is the heavy part); until it loads, requests are served by the fallback model
+    print("📦 Loading ML model...")
+    predictor = degraded_mode.load_primary(load_predictor)
+    if predictor is not None:
         print("✅ ML model loaded successfully")
-    except Exception as e:
-        print(f"❌ Failed to load ML model: {e}")
+    elif degraded_mode.enabled:
+        print("⚠️  Serving the fallback model (degraded mode) until the ML model loads")
+    else:
         print("⚠️  Prediction endpoints will not work until model is loaded")
     
+    # Drain the background job queue (recommendation inserts etc.)
+    if settings.JOB_WORKER_INTERVAL_SECONDS > 0:
+        app.state.job_worker = asyncio.create_task(run_job_worker(
+            job_queue,
+            SessionLocal,
+            settings.JOB_WORKER_INTERVAL_SECONDS
+        ))
+    
+    # Write buffered audit events in batches
+    if settings.AUDIT_LOG_ENABLED and settings.AUDIT_FLUSH_INTERVAL_MS > 0:
+        app.state.audit_flusher = asyncio.create_task(audit_log.run(settings.AUDIT_FLUSH_INTERVAL_MS / 1000))
+    
+    # Periodically remove expired sessions instead of relying on /auth/cleanup-sessions
+    if settings.SESSION_SWEEP_INTERVAL_SECONDS > 0:
+        app.state.session_sweeper = asyncio.create_task(run_session_sweeper(
+            settings.SESSION_SWEEP_INTERVAL_SECONDS,
+            settings.SESSION_SWEEP_JITTER_SECONDS
+        ))
+    
     port = os.environ.get("PORT", 8000)
     print("=" * 60)
     print(f"✅ Backend ready on port {port}")
@@ -111,6 +187,16 @@ async def startup_event():
     print(f"🔗 Test endpoint: http://0.0.0.0:{port}/ping")
     print("=" * 60)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task_name in ("session_sweeper", "job_worker"):
+        task = getattr(app.state, task_name, None)
+        if task is not None:
+            task.cancel()
+    if getattr(app.state, "audit_flusher", None) is not None:
+        await anyio.to_thread.run_sync(audit_log.close)
+    password_hasher.shutdown()
+
 # Include API routers
 from app.api.auth import router as auth_router
 from app.api.carbon_footprint_api import router as carbon_router
@@ -163,6 +249,7 @@ class CarbonPredictionResponse(BaseModel):
     confidence_score: float
     feature_importance: Dict[str, float]
     recommendations: list
+    degraded: bool = False
 
 @app.get("/")
 async def root():
@@ -177,8 +264,30 @@ async def ping():
     """Simple ping endpoint for connectivity testing"""
     return {"status": "ok", "message": "pong"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Per-process performance metrics"""
+    return {
+        "database": query_metrics.snapshot(),
+        "caches": {
+            "dashboard": dashboard_cache.stats()
+        },
+        "idempotency": idempotency_store.stats(),
+        "single_flight": read_flight.stats(),
+        "password_hashing": password_hasher.stats(),
+        "login_throttle": login_throttle.stats(),
+        "rate_limit": {"clients": len(request_buckets), "rejected": request_buckets.rejected},
+        "inference_admission": inference_admission.stats(),
+        "degraded_mode": degraded_mode.stats(),
+        "jobs": job_queue.stats(),
+        "audit_log": audit_log.stats()
+    }
+
 @app.post("/predict", response_model=CarbonPredictionResponse)
-async def predict_carbon_emissions(request: CarbonPredictionRequest):
+def predict_carbon_emissions(
+    request: CarbonPredictionRequest,
+    degraded_reason: Optional[str] = Depends(admit_inference(settings.PREDICT_DEADLINE_MS))
+):
     """
     Predict carbon emissions based on household characteristics
     """
@@ -186,11 +295,12 @@ async def predict_carbon_emissions(request: CarbonPredictionRequest):
         # Convert request to dictionary
         input_data = request.dict()
         
-        # Make prediction using the correct method
-        prediction_result = predictor.predict_from_raw_inputs(input_data)
+        # Make prediction using the correct method (the fallback model when degraded)
+        model, degraded = degraded_mode.select(degraded_reason, load_predictor)
+        prediction_result = model.predict_from_raw_inputs(input_data)
         
         # Get recommendations
-        recommendations = predictor.get_recommendations(input_data, prediction_result["predicted_carbon_footprint"])
+        recommendations = model.get_recommendations(input_data, prediction_result["predicted_carbon_footprint"])
         
         # Extract numeric confidence score from percentage string
         confidence_str = prediction_result["model_confidence"]
@@ -200,7 +310,8 @@ async def predict_carbon_emissions(request: CarbonPredictionRequest):
             predicted_emissions=prediction_result["predicted_carbon_footprint"],
             confidence_score=confidence_score,
             feature_importance={},  # Will be populated if available
-            recommendations=recommendations
+            recommendations=recommendations,
+            degraded=degraded
         )
         
     except Exception as e:
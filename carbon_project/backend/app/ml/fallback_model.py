@@ -0,0 +1,166 @@
+"""
+Lightweight fallback emission model.
+
+A linear model over the same per-unit emission terms _calculate_breakdown uses
+(annual electricity, vehicle fuel, home size, household size, air travel). It
+needs no preprocessor and predicts in microseconds, so the API serves it when
+the primary model fails to load or its inference queue is too deep.
+
+The coefficients are fitted on the raw training data by the model comparison
+pipeline and saved as a small JSON file; without that file the published
+emission factors are used as-is.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from .predict_carbon_fixed import CarbonEmissionPredictorFixed
+except ImportError:
+    # Run as a script from app/ml (e.g. by the model comparison pipeline)
+    from predict_carbon_fixed import CarbonEmissionPredictorFixed
+
+# Fuel emission factors in kg CO2 per liter
+VEHICLE_EMISSION_FACTORS = {
+    'petrol_sedan': 2.31,
+    'petrol_suv': 2.31,
+    'diesel': 2.68,
+    'hybrid': 1.5,
+    'electric': 0.0,
+    'bicycle': 0.0
+}
+
+FEATURES = [
+    'electricity_kwh_annual',
+    'vehicle_co2_annual',
+    'electric_vehicle_km_annual',
+    'home_size_sqft',
+    'household_size',
+    'air_travel_hours'
+]
+
+# kg CO2/year per unit of each feature
+DEFAULT_COEFFICIENTS = {
+    'electricity_kwh_annual': 0.4,
+    'vehicle_co2_annual': 1.0,
+    'electric_vehicle_km_annual': 0.05,
+    'home_size_sqft': 0.1,
+    'household_size': 300.0,
+    'air_travel_hours': 90.0
+}
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "fallback_emission_model.json")
+
+
+def fallback_features(raw_inputs: Dict[str, Any]) -> Dict[str, float]:
+    """Annualised emission terms from raw calculator inputs"""
+    electricity = float(raw_inputs.get('electricity_usage_kwh') or 0)
+    # Values under 1000 kWh are monthly bills
+    electricity_annual = electricity * 12 if electricity < 1000 else electricity
+
+    distance_annual = float(raw_inputs.get('vehicle_monthly_distance_km') or 0) * 12
+    vehicles = float(raw_inputs.get('vehicles_per_household') or 1)
+    vehicle_type = raw_inputs.get('vehicle_type', 'petrol_sedan')
+    fuel_usage_liters = float(raw_inputs.get('fuel_usage_liters') or 0)
+    fuel_efficiency = float(raw_inputs.get('fuel_efficiency') or 15)
+
+    vehicle_co2 = 0.0
+    electric_km = 0.0
+    if vehicle_type == 'electric':
+        electric_km = distance_annual * vehicles
+    elif vehicle_type != 'bicycle':
+        fuel_liters = fuel_usage_liters * 12 if fuel_usage_liters > 0 else distance_annual / fuel_efficiency
+        vehicle_co2 = fuel_liters * VEHICLE_EMISSION_FACTORS.get(vehicle_type, 2.31) * vehicles
+
+    return {
+        'electricity_kwh_annual': electricity_annual,
+        'vehicle_co2_annual': vehicle_co2,
+        'electric_vehicle_km_annual': electric_km,
+        'home_size_sqft': float(raw_inputs.get('home_size_sqft') or 0),
+        'household_size': float(raw_inputs.get('household_size') or 1),
+        'air_travel_hours': float(raw_inputs.get('air_travel_hours') or 0)
+    }
+
+
+class FallbackEmissionModel:
+    """Calibrated emission factor model used in degraded mode"""
+
+    model_name = "Fallback Linear"
+    model_version = "fallback"
+
+    def __init__(self, coefficients: Optional[Dict[str, float]] = None, intercept: float = 0.0,
+                 score: float = 0.5, training_date: Optional[str] = None):
+        self.coefficients = dict(DEFAULT_COEFFICIENTS, **(coefficients or {}))
+        self.intercept = intercept
+        self.score = score
+        self.training_date = training_date
+
+    # Rule-based recommendations don't depend on the model, so both predictors share them
+    get_recommendations = CarbonEmissionPredictorFixed.get_recommendations
+
+    @classmethod
+    def fit(cls, rows: Iterable[Dict[str, Any]], targets: Iterable[float]) -> "FallbackEmissionModel":
+        """Least-squares fit of the coefficients on raw input rows and their total emissions"""
+        X = np.array([[fallback_features(row)[name] for name in FEATURES] for row in rows], dtype=float)
+        y = np.array(list(targets), dtype=float)
+        design = np.hstack([X, np.ones((len(X), 1))])
+        solution, _, _, _ = np.linalg.lstsq(design, y, rcond=None)
+
+        residual = y - design @ solution
+        total = ((y - y.mean()) ** 2).sum()
+        score = float(1 - (residual ** 2).sum() / total) if total else 0.0
+
+        return cls(
+            coefficients=dict(zip(FEATURES, (float(c) for c in solution[:-1]))),
+            intercept=float(solution[-1]),
+            score=max(score, 0.0),
+            training_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        )
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> "FallbackEmissionModel":
+        """Load fitted coefficients, or the default emission factors if there is no artifact"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            data = json.load(f)
+        return cls(
+            coefficients=data.get('coefficients'),
+            intercept=data.get('intercept', 0.0),
+            score=data.get('score', 0.5),
+            training_date=data.get('training_date')
+        )
+
+    def save(self, path: str = DEFAULT_MODEL_PATH) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                'model_name': self.model_name,
+                'features': FEATURES,
+                'coefficients': self.coefficients,
+                'intercept': self.intercept,
+                'score': self.score,
+                'training_date': self.training_date
+            }, f, indent=2)
+        return path
+
+    def predict_batch(self, rows: List[Dict[str, Any]]) -> List[float]:
+        """Predictions for many raw inputs with one matrix product"""
+        if not rows:
+            return []
+        X = np.array([[fallback_features(row)[name] for name in FEATURES] for row in rows], dtype=float)
+        predictions = X @ np.array([self.coefficients[name] for name in FEATURES]) + self.intercept
+        return [round(float(prediction), 2) for prediction in np.maximum(predictions, 0.0)]
+
+    def predict_from_raw_inputs(self, raw_inputs: Dict[str, Any]) -> Dict[str, Any]:
+        features = fallback_features(raw_inputs)
+        prediction = self.intercept + sum(self.coefficients[name] * features[name] for name in FEATURES)
+        return {
+            'predicted_carbon_footprint': round(max(prediction, 0.0), 2),
+            'prediction_units': 'kg CO2/year',
+            'model_confidence': f"{self.score:.1%}",
+            'model_name': self.model_name
+        }
@@ -287,6 +287,10 @@ class CarbonEmissionPredictorFixed:
         # 2. Handle outliers
         df = self.handle_outliers(df)
         
+        return self.engineer_features(df)
+    
+    def engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Encode, derive, scale and select features; every step works row by row"""
         # 3. Encode categorical features
         df = self.encode_categorical_features(df)
         
@@ -322,6 +326,18 @@ class CarbonEmissionPredictorFixed:
         
         return df
     
+    def predict_batch(self, rows: list) -> list:
+        """
+        Predict carbon emissions for many validated raw inputs with one model call.
+        Missing-value and outlier handling are skipped: they use statistics of the frame
+        itself, so they leave a single request unchanged but would let the rows of a
+        batch change each other's predictions.
+        """
+        if not rows:
+            return []
+        processed_df = self.engineer_features(pd.DataFrame(rows))
+        return [round(float(prediction), 2) for prediction in self.model.predict(processed_df)]
+    
     def predict_from_raw_inputs(self, raw_inputs: dict):
         """
         Predict carbon emission from raw user inputs
@@ -22,6 +22,7 @@ except ImportError:
     print("⚠️ LightGBM not available. Install with: pip install lightgbm")
 
 from sklearn.preprocessing import RobustScaler
+from fallback_model import FallbackEmissionModel
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -40,8 +41,10 @@ class CarbonEmissionModelComparator:
     Trains multiple models and automatically selects the best performing one
     """
     
-    def __init__(self, data_path: str = "../../../data/processed/v3_processed_carbon_data.csv"):
+    def __init__(self, data_path: str = "../../../data/processed/v3_processed_carbon_data.csv",
+                 raw_data_path: str = "../../../data/raw/residential_carbon_data_v3.csv"):
         self.data_path = data_path
+        self.raw_data_path = raw_data_path
         self.models = {}
         self.results = {}
         self.best_model = None
@@ -394,6 +397,26 @@ class CarbonEmissionModelComparator:
         
         return model_path, comparison_path
     
+    def save_fallback_model(self, output_dir: str = "models"):
+        """Fit the lightweight degraded-mode model on the raw inputs and save it next to the best model"""
+        if not os.path.exists(self.raw_data_path):
+            print(f"⚠️ Raw data not found at {self.raw_data_path}, skipping fallback model")
+            return None
+        
+        print("🪶 Fitting fallback model on raw inputs...")
+        df = pd.read_csv(self.raw_data_path)
+        y = df['total_carbon_footprint']
+        rows = df.drop(columns=['total_carbon_footprint']).to_dict('records')
+        train_rows, test_rows, y_train, y_test = train_test_split(rows, y, test_size=0.2, random_state=42)
+        
+        fallback = FallbackEmissionModel.fit(train_rows, y_train)
+        predictions = [fallback.predict_from_raw_inputs(row)['predicted_carbon_footprint'] for row in test_rows]
+        fallback.score = max(float(r2_score(y_test, predictions)), 0.0)
+        
+        fallback_path = fallback.save(os.path.join(output_dir, 'fallback_emission_model.json'))
+        print(f"✅ Fallback model saved to: {fallback_path} (Test R²: {fallback.score:.4f})")
+        return fallback_path
+    
     def generate_comparison_report(self):
         """Generate detailed comparison report"""
         print("📋 Generating detailed comparison report...")
@@ -479,6 +502,9 @@ Generated on: {self.training_date}
             # Save best model
             model_path, comparison_path = self.save_best_model()
             
+            # Save the degraded-mode fallback model
+            fallback_path = self.save_fallback_model()
+            
             # Generate report
             report_path = self.generate_comparison_report()
             
@@ -499,6 +525,7 @@ Generated on: {self.training_date}
                 'all_results': self.results,
                 'model_path': model_path,
                 'comparison_path': comparison_path,
+                'fallback_path': fallback_path,
                 'report_path': report_path
             }
             
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Boolean, DECIMAL, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Date, Text, JSON, Boolean, DECIMAL, ForeignKey, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from enum import Enum as PyEnum
@@ -44,12 +44,19 @@ class CarbonFootprint(Base):
     ip_address = Column(String(45), nullable=True)
     user_agent = Column(Text, nullable=True)
     is_anonymous = Column(Boolean, default=False)
+    # Set for households scored by a bulk import; those rows stay out of the uploader's own history and stats
+    import_id = Column(Integer, nullable=True, index=True)
     
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     recommendations = relationship("Recommendation", back_populates="carbon_footprint")
+    
+    __table_args__ = (
+        # History, trends, stats and keyset pagination: filter by user, newest first
+        Index("ix_carbon_footprints_user_date", user_id, calculation_date.desc(), id.desc()),
+    )
 
 class Recommendation(Base):
     __tablename__ = "recommendations"
@@ -61,7 +68,8 @@ class Recommendation(Base):
     description = Column(Text, nullable=False)
     action_required = Column(Text, nullable=False)
     potential_savings = Column(String(255), nullable=False)
-    priority = Column(Enum(PriorityEnum), nullable=False, index=True)
+    # Stored by value to match the lowercase ENUM('high', 'medium', 'low') column
+    priority = Column(Enum(PriorityEnum, values_callable=lambda e: [m.value for m in e]), nullable=False, index=True)
     estimated_impact = Column(DECIMAL(5, 2), nullable=True)  # Percentage reduction
     is_implemented = Column(Boolean, default=False)
     implemented_at = Column(DateTime, nullable=True)
@@ -69,6 +77,11 @@ class Recommendation(Base):
     
     # Relationships
     carbon_footprint = relationship("CarbonFootprint", back_populates="recommendations")
+    
+    __table_args__ = (
+        # Per-footprint listing ordered by priority, then age
+        Index("ix_recommendations_footprint_priority_created", carbon_footprint_id, priority, created_at),
+    )
 
 class UserGoal(Base):
     __tablename__ = "user_goals"
@@ -84,6 +97,56 @@ class UserGoal(Base):
     achieved_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        # Active goals by target date, and goal listing / keyset pagination
+        Index("ix_user_goals_user_achieved_target", user_id, is_achieved, target_date),
+        Index("ix_user_goals_user_target", user_id, target_date.desc(), id.desc()),
+    )
+
+class UserFootprintRollup(Base):
+    """Running per-user aggregates, maintained alongside carbon_footprints writes"""
+    __tablename__ = "user_footprint_rollups"
+    
+    user_id = Column(Integer, primary_key=True)
+    calculation_count = Column(Integer, nullable=False, default=0)
+    emissions_sum = Column(DECIMAL(18, 2), nullable=False, default=0)
+    emissions_sum_squares = Column(DECIMAL(30, 4), nullable=False, default=0)
+    min_emissions = Column(DECIMAL(10, 2), nullable=True)
+    max_emissions = Column(DECIMAL(10, 2), nullable=True)
+    latest_footprint_id = Column(Integer, nullable=True)
+    latest_calculation_date = Column(DateTime, nullable=True)
+    latest_emissions = Column(DECIMAL(10, 2), nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class UserFootprintRollupBucket(Base):
+    """Per-user daily/weekly calculation counts and emission sums"""
+    __tablename__ = "user_footprint_rollup_buckets"
+    
+    user_id = Column(Integer, primary_key=True)
+    bucket_type = Column(String(10), primary_key=True)  # 'day' or 'week'
+    bucket_start = Column(Date, primary_key=True)
+    calculation_count = Column(Integer, nullable=False, default=0)
+    emissions_sum = Column(DECIMAL(18, 2), nullable=False, default=0)
+
+class FootprintImport(Base):
+    """A bulk CSV import of household calculations and its progress"""
+    __tablename__ = "footprint_imports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    import_uuid = Column(String(36), unique=True, index=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(Integer, nullable=False, index=True)
+    filename = Column(String(255), nullable=True)
+    file_path = Column(String(500), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, failed
+    processed_rows = Column(Integer, nullable=False, default=0)
+    imported_rows = Column(Integer, nullable=False, default=0)
+    failed_rows = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=True)  # [{"row": n, "errors": [...]}], capped at IMPORT_MAX_REPORTED_ERRORS
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
@@ -18,4 +18,7 @@ class UserSession(Base):
     user_id = Column(Integer, nullable=False, index=True)
     session_token = Column(String(255), unique=True, index=True, nullable=False)
     created_at = Column(DateTime, default=func.now())
-    expires_at = Column(DateTime, nullable=False)
+    # Indexed for the expired-session sweep (cleanup_expired_sessions)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    # Set on logout of signed-token sessions; rows stay until expiry so workers can sync revocations
+    revoked_at = Column(DateTime, nullable=True, index=True)
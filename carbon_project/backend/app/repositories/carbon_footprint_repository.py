@@ -1,18 +1,41 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, func
-from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, desc, func, case, text, insert, select, Row
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import math
 import uuid
 
-from ..models.carbon_footprint import CarbonFootprint, Recommendation, UserGoal, AuditLog
+from ..models.carbon_footprint import (
+    CarbonFootprint, Recommendation, UserGoal, AuditLog,
+    UserFootprintRollup, UserFootprintRollupBucket, FootprintImport
+)
 from ..schemas.carbon_footprint import CarbonFootprintCreate, RecommendationCreate, UserGoalCreate, UserGoalUpdate
+from .pagination import apply_keyset
+from .trends import TREND_CATEGORIES, bucket_expression, bucket_label, lttb
+
+def personal_footprints(user_id: int):
+    """Filter for a user's own calculations; households they bulk-imported (import_id set) are left out"""
+    return and_(CarbonFootprint.user_id == user_id, CarbonFootprint.import_id.is_(None))
+
+def stats_window_start(days: int) -> date:
+    """
+    First day of the last `days` calendar days (UTC), today included. The live stats query
+    and the rollup's daily buckets both count from here, so /stats doesn't depend on the path
+    """
+    return datetime.utcnow().date() - timedelta(days=days - 1)
 
 class CarbonFootprintRepository:
     def __init__(self, db: Session):
         self.db = db
+        self.rollup_repo = UserFootprintRollupRepository(db)
     
-    def create_carbon_footprint(self, user_id: int, footprint_data: CarbonFootprintCreate) -> CarbonFootprint:
-        """Create a new carbon footprint calculation"""
+    def create_carbon_footprint(self, user_id: int, footprint_data: CarbonFootprintCreate,
+                                commit: bool = True) -> CarbonFootprint:
+        """Create a new carbon footprint calculation; with commit=False the row is only flushed"""
         db_footprint = CarbonFootprint(
             user_id=user_id,
             calculation_uuid=str(uuid.uuid4()),
@@ -29,14 +52,69 @@ class CarbonFootprintRepository:
             other_emissions=footprint_data.other_emissions or 0,
             ip_address=footprint_data.ip_address,
             user_agent=footprint_data.user_agent,
-            is_anonymous=footprint_data.is_anonymous
+            is_anonymous=footprint_data.is_anonymous,
+            calculation_date=datetime.utcnow()
         )
         
         self.db.add(db_footprint)
-        self.db.commit()
-        self.db.refresh(db_footprint)
+        if user_id is not None or not commit:
+            # Flush for the new id, then update the rollup in the same transaction
+            self.db.flush()
+        if user_id is not None:
+            self.rollup_repo.add_footprint(db_footprint)
+        if commit:
+            self.db.commit()
+            self.db.refresh(db_footprint)
         return db_footprint
     
+    def create_footprints_batch(self, user_id: int, footprints_data: List[CarbonFootprintCreate],
+                                import_id: Optional[int] = None) -> int:
+        """
+        Insert many calculations for one user with a single multi-row INSERT and fold them into
+        the user's rollup (caller commits). Returns the number of rows inserted. Rows of a bulk
+        import are tagged with `import_id` and kept out of the rollup: they aren't the user's own.
+        """
+        if not footprints_data:
+            return 0
+        
+        calculation_date = datetime.utcnow()
+        rows = [
+            {
+                "user_id": user_id,
+                "calculation_uuid": str(uuid.uuid4()),
+                "input_data": data.input_data,
+                "total_emissions": data.total_emissions,
+                "confidence_score": data.confidence_score,
+                "model_name": data.model_name,
+                "model_version": data.model_version,
+                "electricity_emissions": data.electricity_emissions or 0,
+                "transportation_emissions": data.transportation_emissions or 0,
+                "heating_emissions": data.heating_emissions or 0,
+                "waste_emissions": data.waste_emissions or 0,
+                "lifestyle_emissions": data.lifestyle_emissions or 0,
+                "other_emissions": data.other_emissions or 0,
+                "ip_address": data.ip_address,
+                "user_agent": data.user_agent,
+                "is_anonymous": False,
+                "calculation_date": calculation_date,
+                "import_id": import_id
+            }
+            for data in footprints_data
+        ]
+        self.db.execute(insert(CarbonFootprint), rows)
+        if import_id is not None:
+            return len(rows)
+        
+        # All rows share one calculation date, so the last one inserted is the user's latest
+        latest_id = self.db.query(CarbonFootprint.id).filter(
+            CarbonFootprint.calculation_uuid == rows[-1]["calculation_uuid"]
+        ).scalar()
+        self.rollup_repo.add_footprints_batch(
+            user_id, calculation_date,
+            [Decimal(str(row["total_emissions"])) for row in rows], latest_id
+        )
+        return len(rows)
+    
     def get_footprint_by_id(self, footprint_id: int) -> Optional[CarbonFootprint]:
         """Get carbon footprint by ID"""
         return self.db.query(CarbonFootprint).filter(CarbonFootprint.id == footprint_id).first()
@@ -45,82 +123,156 @@ class CarbonFootprintRepository:
         """Get carbon footprint by calculation UUID"""
         return self.db.query(CarbonFootprint).filter(CarbonFootprint.calculation_uuid == calculation_uuid).first()
     
-    def get_user_footprints(self, user_id: int, skip: int = 0, limit: int = 50) -> List[CarbonFootprint]:
-        """Get user's carbon footprint history"""
-        return self.db.query(CarbonFootprint).filter(
-            CarbonFootprint.user_id == user_id
-        ).order_by(desc(CarbonFootprint.calculation_date)).offset(skip).limit(limit).all()
+    def get_user_footprints(self, user_id: int, skip: int = 0, limit: int = 50,
+                            cursor: Optional[str] = None) -> List[CarbonFootprint]:
+        """Get user's carbon footprint history (keyset-paged when a cursor is given)"""
+        query = self.db.query(CarbonFootprint).filter(personal_footprints(user_id))
+        return apply_keyset(
+            query, CarbonFootprint.calculation_date, CarbonFootprint.id, cursor, skip, limit
+        ).all()
     
-    def get_recent_footprints(self, days: int = 7, skip: int = 0, limit: int = 100) -> List[CarbonFootprint]:
+    def get_recent_footprints(self, days: int = 7, skip: int = 0, limit: int = 100,
+                              cursor: Optional[str] = None) -> List[CarbonFootprint]:
         """Get recent carbon footprints across all users"""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
-        return self.db.query(CarbonFootprint).filter(
-            CarbonFootprint.calculation_date >= cutoff_date
-        ).order_by(desc(CarbonFootprint.calculation_date)).offset(skip).limit(limit).all()
+        query = self.db.query(CarbonFootprint).filter(CarbonFootprint.calculation_date >= cutoff_date)
+        return apply_keyset(
+            query, CarbonFootprint.calculation_date, CarbonFootprint.id, cursor, skip, limit
+        ).all()
     
     def get_user_footprint_stats(self, user_id: int) -> Dict[str, Any]:
-        """Get user's carbon footprint statistics"""
+        """Get user's carbon footprint statistics in a single pass over the user's rows"""
+        thirty_days_ago = datetime.combine(stats_window_start(30), datetime.min.time())
+        seven_days_ago = datetime.combine(stats_window_start(7), datetime.min.time())
+        emissions = CarbonFootprint.total_emissions
+        
+        # SQLite has no STDDEV; derive it from the mean of squares instead
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ('mysql', 'postgresql'):
+            spread = func.stddev_pop(emissions).label('emissions_stddev')
+        else:
+            spread = func.avg(emissions * emissions).label('mean_square')
+        
         stats = self.db.query(
             func.count(CarbonFootprint.id).label('total_calculations'),
-            func.avg(CarbonFootprint.total_emissions).label('average_emissions'),
-            func.min(CarbonFootprint.total_emissions).label('min_emissions'),
-            func.max(CarbonFootprint.total_emissions).label('max_emissions'),
-            func.stddev(CarbonFootprint.total_emissions).label('emissions_stddev'),
-            func.max(CarbonFootprint.calculation_date).label('last_calculation_date')
-        ).filter(CarbonFootprint.user_id == user_id).first()
-        
-        # Get calculations in last 30 and 7 days
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        
-        last_30_days = self.db.query(func.count(CarbonFootprint.id)).filter(
-            and_(
-                CarbonFootprint.user_id == user_id,
-                CarbonFootprint.calculation_date >= thirty_days_ago
-            )
-        ).scalar()
+            func.avg(emissions).label('average_emissions'),
+            func.min(emissions).label('min_emissions'),
+            func.max(emissions).label('max_emissions'),
+            spread,
+            func.max(CarbonFootprint.calculation_date).label('last_calculation_date'),
+            func.sum(case((CarbonFootprint.calculation_date >= thirty_days_ago, 1), else_=0)).label('last_30_days'),
+            func.sum(case((CarbonFootprint.calculation_date >= seven_days_ago, 1), else_=0)).label('last_7_days')
+        ).filter(personal_footprints(user_id)).one()
         
-        last_7_days = self.db.query(func.count(CarbonFootprint.id)).filter(
-            and_(
-                CarbonFootprint.user_id == user_id,
-                CarbonFootprint.calculation_date >= seven_days_ago
-            )
-        ).scalar()
+        average = float(stats.average_emissions) if stats.average_emissions else 0
+        if dialect in ('mysql', 'postgresql'):
+            stddev = float(stats.emissions_stddev) if stats.emissions_stddev else 0
+        else:
+            mean_square = float(stats.mean_square) if stats.mean_square else 0
+            stddev = math.sqrt(max(0.0, mean_square - average * average))
         
         return {
             'total_calculations': stats.total_calculations or 0,
-            'average_emissions': float(stats.average_emissions) if stats.average_emissions else 0,
+            'average_emissions': average,
             'min_emissions': float(stats.min_emissions) if stats.min_emissions else 0,
             'max_emissions': float(stats.max_emissions) if stats.max_emissions else 0,
-            'emissions_stddev': float(stats.emissions_stddev) if stats.emissions_stddev else 0,
+            'emissions_stddev': stddev,
             'last_calculation_date': stats.last_calculation_date,
-            'calculations_last_30_days': last_30_days or 0,
-            'calculations_last_7_days': last_7_days or 0
+            'calculations_last_30_days': int(stats.last_30_days or 0),
+            'calculations_last_7_days': int(stats.last_7_days or 0)
         }
     
-    def get_footprint_trends(self, user_id: int, days: int = 30) -> List[Dict[str, Any]]:
-        """Get user's emission trends over time"""
+    def get_footprint_trends(self, user_id: int, days: int = 30, bucket: Optional[str] = None,
+                             max_points: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get user's emission trends over time.
+        Without a bucket, returns one point per calculation; with 'day', 'week' or 'month',
+        aggregates avg/min/max per category in SQL. max_points downsamples with LTTB.
+        """
         cutoff_date = datetime.utcnow() - timedelta(days=days)
+        window = and_(
+            personal_footprints(user_id),
+            CarbonFootprint.calculation_date >= cutoff_date
+        )
         
-        footprints = self.db.query(CarbonFootprint).filter(
-            and_(
-                CarbonFootprint.user_id == user_id,
-                CarbonFootprint.calculation_date >= cutoff_date
-            )
-        ).order_by(CarbonFootprint.calculation_date).all()
+        if bucket is None:
+            # Only the plotted columns - never load the input_data JSON
+            rows = self.db.query(
+                CarbonFootprint.calculation_date,
+                *[getattr(CarbonFootprint, category) for category in TREND_CATEGORIES]
+            ).filter(window).order_by(CarbonFootprint.calculation_date, CarbonFootprint.id).all()
+            
+            points = [
+                {
+                    'date': row.calculation_date.isoformat(),
+                    **{category: float(getattr(row, category) or 0) for category in TREND_CATEGORIES}
+                }
+                for row in rows
+            ]
+        else:
+            bucket_col = bucket_expression(
+                self.db.get_bind().dialect.name, CarbonFootprint.calculation_date, bucket
+            ).label('bucket')
+            aggregates = []
+            for category in TREND_CATEGORIES:
+                column = getattr(CarbonFootprint, category)
+                aggregates += [
+                    func.avg(column).label(f'{category}_avg'),
+                    func.min(column).label(f'{category}_min'),
+                    func.max(column).label(f'{category}_max')
+                ]
+            rows = self.db.query(
+                bucket_col,
+                func.count(CarbonFootprint.id).label('count'),
+                *aggregates
+            ).filter(window).group_by(text('bucket')).order_by(text('bucket')).all()
+            
+            points = [
+                {
+                    'date': bucket_label(row.bucket),
+                    'count': row.count,
+                    **{category: float(getattr(row, f'{category}_avg') or 0) for category in TREND_CATEGORIES},
+                    'min': {category: float(getattr(row, f'{category}_min') or 0) for category in TREND_CATEGORIES},
+                    'max': {category: float(getattr(row, f'{category}_max') or 0) for category in TREND_CATEGORIES}
+                }
+                for row in rows
+            ]
         
-        return [
-            {
-                'date': footprint.calculation_date.isoformat(),
-                'total_emissions': float(footprint.total_emissions),
-                'electricity_emissions': float(footprint.electricity_emissions),
-                'transportation_emissions': float(footprint.transportation_emissions),
-                'heating_emissions': float(footprint.heating_emissions),
-                'waste_emissions': float(footprint.waste_emissions),
-                'lifestyle_emissions': float(footprint.lifestyle_emissions)
-            }
-            for footprint in footprints
-        ]
+        if max_points:
+            points = lttb(
+                points, max_points,
+                x=lambda p: datetime.fromisoformat(p['date']).timestamp(),
+                y=lambda p: p['total_emissions']
+            )
+        return points
+    
+    EXPORT_COLUMNS = (
+        CarbonFootprint.calculation_uuid, CarbonFootprint.calculation_date,
+        CarbonFootprint.total_emissions, CarbonFootprint.confidence_score,
+        CarbonFootprint.model_name, CarbonFootprint.model_version,
+        CarbonFootprint.electricity_emissions, CarbonFootprint.transportation_emissions,
+        CarbonFootprint.heating_emissions, CarbonFootprint.waste_emissions,
+        CarbonFootprint.lifestyle_emissions, CarbonFootprint.other_emissions,
+        CarbonFootprint.input_data
+    )
+    
+    def iter_user_footprint_rows(self, user_id: int, batch_size: int = 1000) -> Iterator[Row]:
+        """
+        Stream a user's full history, oldest first, as plain rows of EXPORT_COLUMNS.
+        Rows come from a server-side cursor `batch_size` at a time, so memory use doesn't
+        grow with the history and no ORM objects are built.
+        """
+        statement = (
+            select(*self.EXPORT_COLUMNS)
+            .where(personal_footprints(user_id))
+            .order_by(CarbonFootprint.calculation_date, CarbonFootprint.id)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+        result = self.db.execute(statement)
+        try:
+            yield from result
+        finally:
+            result.close()
     
     def delete_footprint(self, footprint_id: int) -> bool:
         """Delete carbon footprint calculation"""
@@ -129,9 +281,299 @@ class CarbonFootprintRepository:
             return False
         
         self.db.delete(footprint)
+        if footprint.user_id is not None and footprint.import_id is None:
+            self.db.flush()
+            self.rollup_repo.remove_footprint(footprint)
         self.db.commit()
         return True
 
+class UserFootprintRollupRepository:
+    """Maintains user_footprint_rollups so stats reads don't scan a user's full history"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    @staticmethod
+    def _bucket_starts(calculation_date: datetime) -> Dict[str, date]:
+        day = calculation_date.date()
+        return {'day': day, 'week': day - timedelta(days=day.weekday())}
+    
+    def get_rollup(self, user_id: int, for_update: bool = False) -> Optional[UserFootprintRollup]:
+        """Get rollup row by user ID (primary key lookup)"""
+        query = self.db.query(UserFootprintRollup).filter(UserFootprintRollup.user_id == user_id)
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
+    
+    def _insert_empty_rollup(self, user_id: int):
+        """Insert a zeroed rollup row unless one exists, without failing when another transaction races us"""
+        values = {
+            'user_id': user_id,
+            'calculation_count': 0,
+            'emissions_sum': Decimal("0"),
+            'emissions_sum_squares': Decimal("0")
+        }
+        dialect = self.db.get_bind().dialect.name
+        if dialect == 'mysql':
+            statement = mysql_insert(UserFootprintRollup).values(**values)
+            statement = statement.on_duplicate_key_update(user_id=statement.inserted.user_id)
+        elif dialect == 'postgresql':
+            statement = postgresql_insert(UserFootprintRollup).values(**values).on_conflict_do_nothing()
+        else:
+            statement = sqlite_insert(UserFootprintRollup).values(**values).on_conflict_do_nothing()
+        self.db.execute(statement)
+    
+    def _get_or_create_rollup(self, user_id: int) -> Tuple[UserFootprintRollup, bool]:
+        """
+        Lock the user's rollup row, creating it if needed. A new row is built from the user's
+        footprints, including any the caller has already flushed; the second value is True
+        when that happened, so the caller must not add its footprints again.
+        """
+        rollup = self.get_rollup(user_id, for_update=True)
+        if rollup is None:
+            self._insert_empty_rollup(user_id)
+            rollup = self.get_rollup(user_id, for_update=True)
+        # Rollups are deleted when their count drops to zero, so a zero count is a row nobody has built yet
+        if rollup.calculation_count == 0:
+            self._fill_rollup(rollup)
+            return rollup, True
+        return rollup, False
+    
+    def _adjust_buckets(self, user_id: int, calculation_date: datetime, emissions: Decimal, sign: int,
+                        count: int = 1):
+        for bucket_type, bucket_start in self._bucket_starts(calculation_date).items():
+            bucket = self.db.query(UserFootprintRollupBucket).filter(
+                and_(
+                    UserFootprintRollupBucket.user_id == user_id,
+                    UserFootprintRollupBucket.bucket_type == bucket_type,
+                    UserFootprintRollupBucket.bucket_start == bucket_start
+                )
+            ).with_for_update().first()
+            if bucket is None:
+                if sign < 0:
+                    continue
+                bucket = UserFootprintRollupBucket(
+                    user_id=user_id,
+                    bucket_type=bucket_type,
+                    bucket_start=bucket_start,
+                    calculation_count=0,
+                    emissions_sum=Decimal("0")
+                )
+                self.db.add(bucket)
+            bucket.calculation_count += sign * count
+            bucket.emissions_sum = Decimal(bucket.emissions_sum) + sign * emissions
+            if bucket.calculation_count <= 0:
+                self.db.delete(bucket)
+    
+    def add_footprint(self, footprint: CarbonFootprint):
+        """Fold a new footprint into the user's rollup (caller commits)"""
+        emissions = Decimal(str(footprint.total_emissions))
+        rollup, built = self._get_or_create_rollup(footprint.user_id)
+        if built:
+            return
+        
+        rollup.calculation_count += 1
+        rollup.emissions_sum = Decimal(rollup.emissions_sum) + emissions
+        rollup.emissions_sum_squares = Decimal(rollup.emissions_sum_squares) + emissions * emissions
+        if rollup.min_emissions is None or emissions < rollup.min_emissions:
+            rollup.min_emissions = emissions
+        if rollup.max_emissions is None or emissions > rollup.max_emissions:
+            rollup.max_emissions = emissions
+        if rollup.latest_calculation_date is None or footprint.calculation_date >= rollup.latest_calculation_date:
+            rollup.latest_footprint_id = footprint.id
+            rollup.latest_calculation_date = footprint.calculation_date
+            rollup.latest_emissions = emissions
+        
+        self._adjust_buckets(footprint.user_id, footprint.calculation_date, emissions, 1)
+    
+    def add_footprints_batch(self, user_id: int, calculation_date: datetime, emissions: List[Decimal],
+                             latest_footprint_id: int):
+        """
+        Fold footprints inserted together (one calculation date, the last one being
+        `latest_footprint_id`) into the user's rollup with one update per row (caller commits)
+        """
+        if not emissions:
+            return
+        rollup, built = self._get_or_create_rollup(user_id)
+        if built:
+            return
+        
+        rollup.calculation_count += len(emissions)
+        rollup.emissions_sum = Decimal(rollup.emissions_sum) + sum(emissions)
+        rollup.emissions_sum_squares = Decimal(rollup.emissions_sum_squares) + sum(e * e for e in emissions)
+        if rollup.min_emissions is None or min(emissions) < rollup.min_emissions:
+            rollup.min_emissions = min(emissions)
+        if rollup.max_emissions is None or max(emissions) > rollup.max_emissions:
+            rollup.max_emissions = max(emissions)
+        if rollup.latest_calculation_date is None or calculation_date >= rollup.latest_calculation_date:
+            rollup.latest_footprint_id = latest_footprint_id
+            rollup.latest_calculation_date = calculation_date
+            rollup.latest_emissions = emissions[-1]
+        
+        self._adjust_buckets(user_id, calculation_date, sum(emissions), 1, count=len(emissions))
+    
+    def remove_footprint(self, footprint: CarbonFootprint):
+        """Take a deleted footprint out of the user's rollup (caller commits, row already flushed)"""
+        rollup = self.get_rollup(footprint.user_id, for_update=True)
+        if rollup is None:
+            return
+        
+        emissions = Decimal(str(footprint.total_emissions))
+        rollup.calculation_count -= 1
+        if rollup.calculation_count <= 0:
+            self.db.delete(rollup)
+            self.db.query(UserFootprintRollupBucket).filter(
+                UserFootprintRollupBucket.user_id == footprint.user_id
+            ).delete(synchronize_session=False)
+            return
+        
+        rollup.emissions_sum = Decimal(rollup.emissions_sum) - emissions
+        rollup.emissions_sum_squares = Decimal(rollup.emissions_sum_squares) - emissions * emissions
+        
+        # Min/max and latest can't be decremented; re-read them only when the removed row held them
+        if emissions <= rollup.min_emissions or emissions >= rollup.max_emissions:
+            extremes = self.db.query(
+                func.min(CarbonFootprint.total_emissions),
+                func.max(CarbonFootprint.total_emissions)
+            ).filter(personal_footprints(footprint.user_id)).one()
+            rollup.min_emissions, rollup.max_emissions = extremes
+        if rollup.latest_footprint_id == footprint.id:
+            latest = self.db.query(
+                CarbonFootprint.id, CarbonFootprint.calculation_date, CarbonFootprint.total_emissions
+            ).filter(
+                personal_footprints(footprint.user_id)
+            ).order_by(desc(CarbonFootprint.calculation_date), desc(CarbonFootprint.id)).first()
+            rollup.latest_footprint_id, rollup.latest_calculation_date, rollup.latest_emissions = latest
+        
+        self._adjust_buckets(footprint.user_id, footprint.calculation_date, emissions, -1)
+    
+    def get_stats(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get footprint statistics from the rollup; None when the user has no rollup row.
+        Windowed counts are summed from daily buckets (see stats_window_start).
+        """
+        return self.rollup_stats(self.get_rollup(user_id))
+    
+    def rollup_stats(self, rollup: Optional[UserFootprintRollup]) -> Optional[Dict[str, Any]]:
+        """get_stats for a rollup row the caller has already loaded"""
+        if rollup is None or rollup.calculation_count <= 0:
+            return None
+        user_id = rollup.user_id
+        
+        thirty_days_ago = stats_window_start(30)
+        seven_days_ago = stats_window_start(7)
+        windows = self.db.query(
+            func.sum(UserFootprintRollupBucket.calculation_count).label('last_30_days'),
+            func.sum(case(
+                (UserFootprintRollupBucket.bucket_start >= seven_days_ago, UserFootprintRollupBucket.calculation_count),
+                else_=0
+            )).label('last_7_days')
+        ).filter(
+            and_(
+                UserFootprintRollupBucket.user_id == user_id,
+                UserFootprintRollupBucket.bucket_type == 'day',
+                UserFootprintRollupBucket.bucket_start >= thirty_days_ago
+            )
+        ).one()
+        
+        count = rollup.calculation_count
+        average = float(rollup.emissions_sum) / count
+        mean_square = float(rollup.emissions_sum_squares) / count
+        
+        return {
+            'total_calculations': count,
+            'average_emissions': average,
+            'min_emissions': float(rollup.min_emissions) if rollup.min_emissions else 0,
+            'max_emissions': float(rollup.max_emissions) if rollup.max_emissions else 0,
+            'emissions_stddev': math.sqrt(max(0.0, mean_square - average * average)),
+            'last_calculation_date': rollup.latest_calculation_date,
+            'calculations_last_30_days': int(windows.last_30_days or 0),
+            'calculations_last_7_days': int(windows.last_7_days or 0)
+        }
+    
+    def _fill_rollup(self, rollup: UserFootprintRollup):
+        """Recompute a rollup row and the user's buckets from carbon_footprints (caller commits)"""
+        user_id = rollup.user_id
+        self.db.query(UserFootprintRollupBucket).filter(
+            UserFootprintRollupBucket.user_id == user_id
+        ).delete(synchronize_session=False)
+        
+        rollup.calculation_count = 0
+        rollup.emissions_sum = Decimal("0")
+        rollup.emissions_sum_squares = Decimal("0")
+        rollup.min_emissions = rollup.max_emissions = None
+        rollup.latest_footprint_id = rollup.latest_calculation_date = rollup.latest_emissions = None
+        
+        rows = self.db.query(
+            CarbonFootprint.id, CarbonFootprint.calculation_date, CarbonFootprint.total_emissions
+        ).filter(
+            personal_footprints(user_id)
+        ).order_by(CarbonFootprint.calculation_date, CarbonFootprint.id).yield_per(1000)
+        
+        buckets: Dict[tuple, UserFootprintRollupBucket] = {}
+        for footprint_id, calculation_date, total_emissions in rows:
+            emissions = Decimal(str(total_emissions))
+            rollup.calculation_count += 1
+            rollup.emissions_sum += emissions
+            rollup.emissions_sum_squares += emissions * emissions
+            rollup.min_emissions = emissions if rollup.min_emissions is None else min(rollup.min_emissions, emissions)
+            rollup.max_emissions = emissions if rollup.max_emissions is None else max(rollup.max_emissions, emissions)
+            rollup.latest_footprint_id = footprint_id
+            rollup.latest_calculation_date = calculation_date
+            rollup.latest_emissions = emissions
+            
+            for bucket_type, bucket_start in self._bucket_starts(calculation_date).items():
+                bucket = buckets.get((bucket_type, bucket_start))
+                if bucket is None:
+                    bucket = UserFootprintRollupBucket(
+                        user_id=user_id,
+                        bucket_type=bucket_type,
+                        bucket_start=bucket_start,
+                        calculation_count=0,
+                        emissions_sum=Decimal("0")
+                    )
+                    buckets[(bucket_type, bucket_start)] = bucket
+                bucket.calculation_count += 1
+                bucket.emissions_sum += emissions
+        self.db.add_all(buckets.values())
+    
+    def rebuild_user_rollup(self, user_id: int) -> Optional[UserFootprintRollup]:
+        """Recompute a user's rollup and buckets from carbon_footprints to repair drift"""
+        self.db.query(UserFootprintRollup).filter(
+            UserFootprintRollup.user_id == user_id
+        ).delete(synchronize_session=False)
+        
+        rollup = UserFootprintRollup(user_id=user_id)
+        self._fill_rollup(rollup)
+        if rollup.calculation_count:
+            self.db.add(rollup)
+        else:
+            rollup = None
+        self.db.commit()
+        return rollup
+    
+    def rebuild_all_rollups(self) -> int:
+        """Rebuild rollups for every user with footprints; returns the number of users rebuilt"""
+        user_ids = [
+            row[0] for row in self.db.query(CarbonFootprint.user_id).filter(
+                CarbonFootprint.user_id.isnot(None),
+                CarbonFootprint.import_id.is_(None)
+            ).distinct().all()
+        ]
+        
+        # Drop rollups for users whose footprints are all gone
+        self.db.query(UserFootprintRollupBucket).filter(
+            UserFootprintRollupBucket.user_id.notin_(user_ids)
+        ).delete(synchronize_session=False)
+        self.db.query(UserFootprintRollup).filter(
+            UserFootprintRollup.user_id.notin_(user_ids)
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        
+        for user_id in user_ids:
+            self.rebuild_user_rollup(user_id)
+        return len(user_ids)
+
 class RecommendationRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -154,41 +596,81 @@ class RecommendationRepository:
         self.db.refresh(db_recommendation)
         return db_recommendation
     
-    def create_recommendations_batch(self, recommendations_data: List[RecommendationCreate]) -> List[Recommendation]:
-        """Create multiple recommendations in batch"""
-        db_recommendations = []
-        for rec_data in recommendations_data:
-            db_rec = Recommendation(
-                carbon_footprint_id=rec_data.carbon_footprint_id,
-                category=rec_data.category,
-                title=rec_data.title,
-                description=rec_data.description,
-                action_required=rec_data.action_required,
-                potential_savings=rec_data.potential_savings,
-                priority=rec_data.priority,
-                estimated_impact=rec_data.estimated_impact
-            )
-            db_recommendations.append(db_rec)
+    def create_recommendations_batch(self, recommendations_data: List[RecommendationCreate],
+                                     commit: bool = True) -> List[Recommendation]:
+        """
+        Create multiple recommendations with a single multi-row INSERT.
+        IDs come back through RETURNING where the dialect supports it; otherwise
+        (MySQL/TiDB) the inserted rows are read back with one SELECT.
+        """
+        if not recommendations_data:
+            return []
         
-        self.db.add_all(db_recommendations)
-        self.db.commit()
+        rows = [
+            {
+                "carbon_footprint_id": rec_data.carbon_footprint_id,
+                "category": rec_data.category,
+                "title": rec_data.title,
+                "description": rec_data.description,
+                "action_required": rec_data.action_required,
+                "potential_savings": rec_data.potential_savings,
+                "priority": rec_data.priority,
+                "estimated_impact": rec_data.estimated_impact
+            }
+            for rec_data in recommendations_data
+        ]
         
-        for rec in db_recommendations:
-            self.db.refresh(rec)
+        # Every path returns the rows in input order
+        dialect = self.db.get_bind().dialect
+        if dialect.name == "sqlite":
+            # SQLAlchemy can only order executemany RETURNING on SQLite by inserting row by row;
+            # one multi-row INSERT numbers its rows in VALUES order, so sort by id instead
+            statement = insert(Recommendation).values(rows).returning(Recommendation)
+            db_recommendations = sorted(self.db.scalars(statement), key=lambda rec: rec.id)
+        elif dialect.insert_executemany_returning:
+            statement = insert(Recommendation).returning(Recommendation, sort_by_parameter_order=True)
+            db_recommendations = list(self.db.scalars(statement, rows))
+        else:
+            # lastrowid is the first id of a multi-row INSERT; the footprint filter skips rows
+            # other sessions inserted concurrently
+            result = self.db.execute(insert(Recommendation).values(rows))
+            footprint_ids = {row["carbon_footprint_id"] for row in rows}
+            db_recommendations = self.db.query(Recommendation).filter(
+                and_(
+                    Recommendation.carbon_footprint_id.in_(footprint_ids),
+                    Recommendation.id >= result.lastrowid
+                )
+            ).order_by(Recommendation.id).limit(len(rows)).all()
+        
+        if commit:
+            # Detach first so the loaded rows aren't expired and re-selected one by one
+            for rec in db_recommendations:
+                self.db.expunge(rec)
+            self.db.commit()
         
         return db_recommendations
     
+    def has_recommendations(self, carbon_footprint_id: int) -> bool:
+        """Whether any recommendations were saved for the footprint"""
+        return self.db.query(Recommendation.id).filter(
+            Recommendation.carbon_footprint_id == carbon_footprint_id
+        ).first() is not None
+    
     def get_recommendations_by_footprint(self, carbon_footprint_id: int) -> List[Recommendation]:
         """Get recommendations for a specific carbon footprint"""
         return self.db.query(Recommendation).filter(
             Recommendation.carbon_footprint_id == carbon_footprint_id
         ).order_by(Recommendation.priority, Recommendation.created_at).all()
     
-    def get_user_recommendations(self, user_id: int, skip: int = 0, limit: int = 50) -> List[Recommendation]:
-        """Get all recommendations for a user"""
-        return self.db.query(Recommendation).join(CarbonFootprint).filter(
+    def get_user_recommendations(self, user_id: int, skip: int = 0, limit: int = 50,
+                                 cursor: Optional[str] = None) -> List[Recommendation]:
+        """Get all recommendations for a user (keyset-paged when a cursor is given)"""
+        query = self.db.query(Recommendation).join(CarbonFootprint).filter(
             CarbonFootprint.user_id == user_id
-        ).order_by(desc(Recommendation.created_at)).offset(skip).limit(limit).all()
+        )
+        return apply_keyset(
+            query, Recommendation.created_at, Recommendation.id, cursor, skip, limit
+        ).all()
     
     def get_recommendations_by_priority(self, priority: str, skip: int = 0, limit: int = 50) -> List[Recommendation]:
         """Get recommendations by priority level"""
@@ -212,20 +694,19 @@ class RecommendationRepository:
     
     def get_implementation_stats(self, user_id: int) -> Dict[str, Any]:
         """Get recommendation implementation statistics for user"""
-        total_recs = self.db.query(func.count(Recommendation.id)).join(CarbonFootprint).filter(
+        counts = self.db.query(
+            func.count(Recommendation.id).label('total'),
+            func.sum(case((Recommendation.is_implemented == True, 1), else_=0)).label('implemented')
+        ).join(CarbonFootprint).filter(
             CarbonFootprint.user_id == user_id
-        ).scalar()
+        ).one()
         
-        implemented_recs = self.db.query(func.count(Recommendation.id)).join(CarbonFootprint).filter(
-            and_(
-                CarbonFootprint.user_id == user_id,
-                Recommendation.is_implemented == True
-            )
-        ).scalar()
+        total_recs = counts.total or 0
+        implemented_recs = int(counts.implemented or 0)
         
         return {
-            'total_recommendations': total_recs or 0,
-            'implemented_recommendations': implemented_recs or 0,
+            'total_recommendations': total_recs,
+            'implemented_recommendations': implemented_recs,
             'implementation_rate': (implemented_recs / total_recs * 100) if total_recs else 0
         }
 
@@ -253,11 +734,11 @@ class UserGoalRepository:
         """Get goal by ID"""
         return self.db.query(UserGoal).filter(UserGoal.id == goal_id).first()
     
-    def get_user_goals(self, user_id: int, skip: int = 0, limit: int = 50) -> List[UserGoal]:
-        """Get user's goals"""
-        return self.db.query(UserGoal).filter(
-            UserGoal.user_id == user_id
-        ).order_by(desc(UserGoal.target_date)).offset(skip).limit(limit).all()
+    def get_user_goals(self, user_id: int, skip: int = 0, limit: int = 50,
+                       cursor: Optional[str] = None) -> List[UserGoal]:
+        """Get user's goals (keyset-paged when a cursor is given)"""
+        query = self.db.query(UserGoal).filter(UserGoal.user_id == user_id)
+        return apply_keyset(query, UserGoal.target_date, UserGoal.id, cursor, skip, limit).all()
     
     def get_active_goals(self, user_id: int) -> List[UserGoal]:
         """Get user's active (not achieved) goals"""
@@ -310,24 +791,29 @@ class UserGoalRepository:
         if not goal or goal.user_id != user_id:
             return None
         
-        # Get user's latest carbon footprint
-        latest_footprint = self.db.query(CarbonFootprint).filter(
-            CarbonFootprint.user_id == user_id
-        ).order_by(desc(CarbonFootprint.calculation_date)).first()
-        
-        if not latest_footprint:
-            return None
+        # Latest emissions and baseline come from the user's rollup row, or the live rows before it exists
+        rollup = UserFootprintRollupRepository(self.db).get_rollup(user_id)
+        if rollup is not None and rollup.calculation_count:
+            latest_emissions = rollup.latest_emissions
+            average_emissions = rollup.emissions_sum / rollup.calculation_count
+        else:
+            latest_emissions = self.db.query(CarbonFootprint.total_emissions).filter(
+                personal_footprints(user_id)
+            ).order_by(desc(CarbonFootprint.calculation_date), desc(CarbonFootprint.id)).limit(1).scalar()
+            if latest_emissions is None:
+                return None
+            average_emissions = Decimal(str(self.db.query(func.avg(CarbonFootprint.total_emissions)).filter(
+                personal_footprints(user_id)
+            ).scalar()))
         
-        current_emissions = float(latest_footprint.total_emissions)
+        current_emissions = float(latest_emissions)
         
         if goal.target_emissions:
             progress = max(0, (goal.target_emissions - current_emissions) / goal.target_emissions * 100)
             remaining = max(0, current_emissions - goal.target_emissions)
         elif goal.reduction_percentage:
-            # Calculate baseline from average of last 10 calculations
-            baseline = self.db.query(func.avg(CarbonFootprint.total_emissions)).filter(
-                CarbonFootprint.user_id == user_id
-            ).scalar() or current_emissions
+            # Baseline is the user's average emissions
+            baseline = average_emissions or current_emissions
             
             target_emissions = baseline * (1 - goal.reduction_percentage / 100)
             progress = max(0, (target_emissions - current_emissions) / target_emissions * 100)
@@ -345,3 +831,27 @@ class UserGoalRepository:
             'is_achieved': progress >= 100,
             'days_remaining': (goal.target_date - datetime.utcnow().date()).days if goal.target_date > datetime.utcnow().date() else 0
         }
+
+class FootprintImportRepository:
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def create_import(self, user_id: int, filename: Optional[str], file_path: str) -> FootprintImport:
+        """Record a new pending import"""
+        db_import = FootprintImport(user_id=user_id, filename=filename, file_path=file_path, errors=[])
+        self.db.add(db_import)
+        self.db.commit()
+        self.db.refresh(db_import)
+        return db_import
+    
+    def get_import(self, import_id: int, for_update: bool = False) -> Optional[FootprintImport]:
+        query = self.db.query(FootprintImport).filter(FootprintImport.id == import_id)
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
+    
+    def get_user_import(self, user_id: int, import_uuid: str) -> Optional[FootprintImport]:
+        """Get one of the user's imports by its UUID"""
+        return self.db.query(FootprintImport).filter(
+            and_(FootprintImport.import_uuid == import_uuid, FootprintImport.user_id == user_id)
+        ).first()
@@ -0,0 +1,56 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque token encoding the (sort timestamp, id) of the last row
+of a page; the next page seeks past it through the composite index instead of
+skipping rows with OFFSET.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(sort_value: Union[datetime, str], row_id: int) -> str:
+    """Encode the last row's sort key into an opaque cursor token"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor token; raises ValueError when it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+
+def apply_keyset(query, sort_column, id_column, cursor: Optional[str], skip: int, limit: int):
+    """
+    Order newest first by (sort_column, id) and page the query.
+    An empty cursor starts from the first page; None falls back to skip/limit.
+    """
+    query = query.order_by(sort_column.desc(), id_column.desc())
+    if cursor is None:
+        return query.offset(skip).limit(limit)
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < last_id)
+            )
+        )
+    return query.limit(limit)
+
+
+def cursor_page(items: List[Any], limit: int, key: Callable[[Any], Tuple[Any, int]]) -> Dict[str, Any]:
+    """Wrap a page of items with the cursor for the next page (None on the last page)"""
+    next_cursor = encode_cursor(*key(items[-1])) if items and len(items) >= limit else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,90 @@
+"""
+Emission trend helpers: SQL time bucketing per dialect and LTTB downsampling.
+"""
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import func
+
+TREND_BUCKETS = ("day", "week", "month")
+
+TREND_CATEGORIES = (
+    "total_emissions",
+    "electricity_emissions",
+    "transportation_emissions",
+    "heating_emissions",
+    "waste_emissions",
+    "lifestyle_emissions",
+)
+
+
+def bucket_expression(dialect_name: str, column, bucket: str):
+    """SQL expression truncating `column` to the start of its day, ISO week (Monday) or month"""
+    if bucket not in TREND_BUCKETS:
+        raise ValueError(f"Bucket must be one of: {', '.join(TREND_BUCKETS)}")
+
+    if dialect_name == "postgresql":
+        return func.date_trunc(bucket, column)
+    if dialect_name == "mysql":
+        if bucket == "day":
+            return func.date(column)
+        if bucket == "week":
+            return func.subdate(func.date(column), func.weekday(column))
+        return func.date_format(column, "%Y-%m-01")
+    # SQLite
+    if bucket == "day":
+        return func.date(column)
+    if bucket == "week":
+        return func.date(column, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m-01", column)
+
+
+def bucket_label(value: Any) -> str:
+    """Normalize a bucket value (date, datetime or string depending on the driver) to YYYY-MM-DD"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)[:10]
+
+
+def lttb(points: List[Dict[str, Any]], threshold: int,
+         x: Callable[[Dict[str, Any]], float], y: Callable[[Dict[str, Any]], float]) -> List[Dict[str, Any]]:
+    """
+    Largest-Triangle-Three-Buckets downsampling: keep `threshold` points that
+    preserve the visual shape of the series (first and last points always kept).
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return points
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    previous = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_points = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(x(p) for p in next_points) / len(next_points)
+        avg_y = sum(y(p) for p in next_points) / len(next_points)
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        prev_x, prev_y = x(points[previous]), y(points[previous])
+
+        best_index, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs(
+                (prev_x - avg_x) * (y(points[j]) - prev_y)
+                - (prev_x - x(points[j])) * (avg_y - prev_y)
+            )
+            if area > best_area:
+                best_index, best_area = j, area
+
+        sampled.append(points[best_index])
+        previous = best_index
+
+    sampled.append(points[-1])
+    return sampled
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime, timedelta
 import secrets
 
@@ -90,10 +90,61 @@ class UserSessionRepository:
         return self.db.query(UserSession).filter(
             and_(
                 UserSession.session_token == session_token,
-                UserSession.expires_at > datetime.utcnow()
+                UserSession.expires_at > datetime.utcnow(),
+                UserSession.revoked_at.is_(None)
             )
         ).first()
     
+    def get_session_user(self, session_token: str) -> Optional[Tuple[User, datetime]]:
+        """Resolve an unexpired session token to (user, session expiry) with one joined query"""
+        row = self.db.query(User, UserSession.expires_at).join(
+            UserSession, UserSession.user_id == User.id
+        ).filter(
+            and_(
+                UserSession.session_token == session_token,
+                UserSession.expires_at > datetime.utcnow(),
+                UserSession.revoked_at.is_(None)
+            )
+        ).first()
+        return (row[0], row[1]) if row else None
+    
+    def get_user_session_tokens(self, user_id: int) -> List[str]:
+        """Get the tokens of all of a user's sessions"""
+        return [
+            row[0] for row in self.db.query(UserSession.session_token).filter(
+                UserSession.user_id == user_id
+            ).all()
+        ]
+    
+    def revoke_session(self, session_id: int) -> bool:
+        """Mark a session revoked (signed tokens); returns False if it was unknown or already revoked"""
+        count = self.db.query(UserSession).filter(
+            and_(UserSession.id == session_id, UserSession.revoked_at.is_(None))
+        ).update({UserSession.revoked_at: datetime.utcnow()}, synchronize_session=False)
+        self.db.commit()
+        return count > 0
+    
+    def revoke_user_sessions(self, user_id: int) -> List[Tuple[int, datetime]]:
+        """Mark all of a user's live sessions revoked; returns their (id, expires_at)"""
+        sessions = self.db.query(UserSession.id, UserSession.expires_at).filter(
+            and_(UserSession.user_id == user_id, UserSession.revoked_at.is_(None))
+        ).all()
+        if sessions:
+            self.db.query(UserSession).filter(
+                UserSession.id.in_([session_id for session_id, _ in sessions])
+            ).update({UserSession.revoked_at: datetime.utcnow()}, synchronize_session=False)
+            self.db.commit()
+        return [(session_id, expires_at) for session_id, expires_at in sessions]
+    
+    def get_revoked_sessions(self, since: Optional[datetime] = None) -> List[Tuple[int, datetime]]:
+        """Unexpired revoked sessions as (id, expires_at), optionally only those revoked since `since`"""
+        query = self.db.query(UserSession.id, UserSession.expires_at).filter(
+            and_(UserSession.revoked_at.isnot(None), UserSession.expires_at > datetime.utcnow())
+        )
+        if since is not None:
+            query = query.filter(UserSession.revoked_at >= since)
+        return [(session_id, expires_at) for session_id, expires_at in query.all()]
+    
     def invalidate_session(self, session_token: str) -> bool:
         """Invalidate user session"""
         session = self.get_session_by_token(session_token)
@@ -106,26 +157,34 @@ class UserSessionRepository:
     
     def invalidate_user_sessions(self, user_id: int) -> int:
         """Invalidate all user sessions"""
-        sessions = self.db.query(UserSession).filter(UserSession.user_id == user_id).all()
-        
-        count = 0
-        for session in sessions:
-            self.db.delete(session)
-            count += 1
-        
+        count = self.db.query(UserSession).filter(
+            UserSession.user_id == user_id
+        ).delete(synchronize_session=False)
         self.db.commit()
         return count
     
-    def cleanup_expired_sessions(self) -> int:
-        """Clean up expired sessions"""
-        expired_sessions = self.db.query(UserSession).filter(
-            UserSession.expires_at < datetime.utcnow()
-        ).all()
-        
-        count = 0
-        for session in expired_sessions:
-            self.db.delete(session)
-            count += 1
-        
-        self.db.commit()
-        return count
+    def cleanup_expired_sessions(self, batch_size: int = 5000) -> int:
+        """
+        Clean up expired sessions with set-based DELETEs of at most `batch_size` rows,
+        committing between batches so a large backlog never holds long locks
+        """
+        now = datetime.utcnow()
+        total = 0
+        while True:
+            # Select ids first: MySQL can't DELETE ... WHERE id IN (subquery with LIMIT)
+            expired_ids = [
+                row[0] for row in self.db.query(UserSession.id).filter(
+                    UserSession.expires_at < now
+                ).limit(batch_size).all()
+            ]
+            if not expired_ids:
+                break
+            
+            total += self.db.query(UserSession).filter(
+                UserSession.id.in_(expired_ids)
+            ).delete(synchronize_session=False)
+            self.db.commit()
+            
+            if len(expired_ids) < batch_size:
+                break
+        return total
@@ -145,6 +145,12 @@ class EmissionTrend(BaseModel):
     waste_emissions: float
     lifestyle_emissions: float
 
+class EmissionTrendBucket(EmissionTrend):
+    """Aggregated trend point: category fields hold the bucket average"""
+    count: int
+    min: Dict[str, float]
+    max: Dict[str, float]
+
 class RecommendationStats(BaseModel):
     total_recommendations: int
     implemented_recommendations: int
@@ -235,11 +241,38 @@ class CarbonFootprintCalculationResponse(BaseModel):
     model_name: str
     model_version: str
     breakdown: Optional[Dict[str, float]] = None
+    degraded: bool = False  # True when served by the fallback model
+
+# Bulk import schemas
+class FootprintImportRowError(BaseModel):
+    row: int  # row number in the CSV, the header being row 1
+    errors: List[str]
+
+class FootprintImportStatus(BaseModel):
+    import_uuid: str
+    filename: Optional[str]
+    status: str  # pending, running, completed or failed
+    processed_rows: int
+    imported_rows: int
+    failed_rows: int
+    errors: List[FootprintImportRowError] = []
+    error_message: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    @validator('errors', pre=True)
+    def default_errors(cls, v):
+        return v or []
+
+    class Config:
+        from_attributes = True
 
 # Pagination schemas
 class PaginationParams(BaseModel):
     skip: int = 0
     limit: int = 50
+    cursor: Optional[str] = None  # keyset pagination; pass an empty cursor for the first page
     
     @validator('skip')
     def validate_skip(cls, v):
@@ -261,6 +294,10 @@ class PaginatedResponse(BaseModel):
     has_next: bool
     has_prev: bool
 
+class CarbonFootprintPage(BaseModel):
+    items: List[CarbonFootprintResponse]
+    next_cursor: Optional[str] = None
+
 # Search schemas
 class CarbonFootprintSearchRequest(BaseModel):
     user_id: Optional[int] = None
@@ -0,0 +1,110 @@
+"""
+Admission control for model inference.
+
+An AdmissionController allows `concurrency` predictions to run at once and
+tracks an exponentially weighted average of their service time. A request is
+rejected up front when its estimated completion time (queue wait plus one
+service time) is beyond its deadline, and rejected again if it is still
+waiting for a slot when the deadline passes, so callers fail fast with a
+Retry-After instead of timing out.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from ..config import settings
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot finish within its deadline"""
+
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class AdmissionController:
+    """Bounded concurrency with deadline-aware load shedding"""
+
+    def __init__(self, concurrency: int, initial_service_time: float = 0.1, smoothing: float = 0.2):
+        self.concurrency = max(1, concurrency)
+        self.smoothing = smoothing
+        self.service_time = initial_service_time
+        self._slots = threading.Semaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def queue_depth(self) -> int:
+        """Requests admitted but still waiting for a slot"""
+        return max(0, self.in_flight - self.concurrency)
+
+    def estimated_wait(self) -> float:
+        """Seconds a new request would wait for a slot at the current service time"""
+        return (self.queue_depth() + 1) / self.concurrency * self.service_time if self.in_flight >= self.concurrency else 0.0
+
+    def _reject(self, retry_after: float, reason: str) -> AdmissionRejected:
+        with self._lock:
+            self.rejected += 1
+        return AdmissionRejected(retry_after, reason)
+
+    @contextmanager
+    def admit(self, deadline: float) -> Iterator[None]:
+        """Run the block within `deadline` seconds or raise AdmissionRejected"""
+        arrived = time.monotonic()
+        with self._lock:
+            wait = self.estimated_wait()
+            if wait + self.service_time > deadline:
+                self.rejected += 1
+                raise AdmissionRejected(wait, "Estimated queue wait exceeds the request deadline")
+            self.in_flight += 1
+            self.admitted += 1
+
+        try:
+            # Wait only as long as still leaves one service time before the deadline
+            remaining = deadline - (time.monotonic() - arrived) - self.service_time
+            if not self._slots.acquire(timeout=max(0.0, remaining)):
+                raise self._reject(self.estimated_wait(), "Deadline passed while queued")
+            started = time.monotonic()
+            try:
+                yield
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self.service_time += self.smoothing * (elapsed - self.service_time)
+                self._slots.release()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queue_depth(),
+            "service_time_ms": round(self.service_time * 1000, 2),
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+
+def effective_deadline(route_deadline_ms: int, client_deadline_ms: Optional[str]) -> float:
+    """Route deadline in seconds, shortened by a client-supplied deadline header when valid"""
+    deadline_ms = float(route_deadline_ms)
+    if client_deadline_ms:
+        try:
+            client_value = float(client_deadline_ms)
+            if client_value > 0:
+                deadline_ms = min(deadline_ms, client_value)
+        except ValueError:
+            pass
+    return deadline_ms / 1000
+
+
+# Shared by every route that runs the emission model in this process
+inference_admission = AdmissionController(settings.INFERENCE_CONCURRENCY or os.cpu_count() or 1)
@@ -0,0 +1,286 @@
+"""
+Buffered audit trail writer.
+
+Request handlers call `audit_log.record(...)`, which only appends the event to
+an in-memory buffer. A flusher task in each process writes the buffer to
+audit_logs with multi-row INSERTs every AUDIT_FLUSH_INTERVAL_MS, or sooner
+once AUDIT_BATCH_SIZE events are waiting.
+
+When the buffer is full (the database is slow or down), callers wait up to
+AUDIT_BLOCK_TIMEOUT_MS for room and then append the event to a local spill
+file instead; batches whose INSERT fails are spilled too. Spill writes are
+flushed and fsynced, and the file is replayed into the table on startup and
+after every successful flush, so events survive restarts and crashes once
+spilled. Events still in the buffer are flushed (or spilled) on shutdown.
+
+Every worker shares the spill file, so appends and the hand-over to replay
+hold an fcntl lock on `<spill>.lock`, and only one process replays at a time
+(`<spill>.replay.lock`). Lines that don't parse, such as one cut short by a
+crash mid-append, are moved to `<spill>.corrupt` instead of blocking replay.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the per-process lock is all there is
+    fcntl = None
+
+import anyio.to_thread
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database.connection import SessionLocal
+from ..models.carbon_footprint import AuditLog
+
+
+@contextmanager
+def _file_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    """Hold an exclusive lock on `path` across processes; yields False if non-blocking and taken"""
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class AuditLogWriter:
+    """Bounded in-memory buffer of audit events flushed to the database in batches"""
+
+    def __init__(self, session_factory: Callable[[], Session], capacity: int = 10000,
+                 batch_size: int = 500, block_timeout: float = 0.02, spill_path: Optional[str] = None,
+                 enabled: bool = True):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.written = 0
+        self.spilled = 0
+        self.dropped = 0
+
+    def record(self, action: str, table_name: str, record_id: Optional[int] = None,
+               user_id: Optional[int] = None, new_values: Optional[Dict[str, Any]] = None,
+               old_values: Optional[Dict[str, Any]] = None, ip_address: Optional[str] = None,
+               user_agent: Optional[str] = None) -> None:
+        """Buffer an audit event; never raises into the request"""
+        if not self.enabled:
+            return
+        event = {
+            "user_id": user_id,
+            "action": action,
+            "table_name": table_name,
+            "record_id": record_id,
+            "old_values": jsonable_encoder(old_values) if old_values is not None else None,
+            "new_values": jsonable_encoder(new_values) if new_values is not None else None,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "created_at": datetime.utcnow()
+        }
+        with self._cond:
+            if len(self._buffer) >= self.capacity:
+                # Backpressure: give the flusher a moment to make room before spilling
+                self._cond.wait_for(lambda: len(self._buffer) < self.capacity, timeout=self.block_timeout)
+            if len(self._buffer) < self.capacity:
+                self._buffer.append(event)
+                if len(self._buffer) >= self.batch_size:
+                    self._wake_flusher()
+                return
+        self._spill([event])
+
+    def _wake_flusher(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            self._cond.notify_all()
+        return batch
+
+    def _insert(self, batch: List[Dict[str, Any]], session_factory: Callable[[], Session]) -> None:
+        db = session_factory()
+        try:
+            db.execute(insert(AuditLog), batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def flush(self, session_factory: Optional[Callable[[], Session]] = None) -> int:
+        """Write everything buffered (then any spilled events) to the database; returns rows written"""
+        session_factory = session_factory or self.session_factory
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                try:
+                    self._insert(batch, session_factory)
+                except Exception as e:
+                    # Leave the rest buffered for the next flush
+                    print(f"⚠️  Audit log flush failed, spilling {len(batch)} events: {e}")
+                    self._spill(batch)
+                    break
+                written += len(batch)
+                self.written += len(batch)
+            if not self._buffer:
+                written += self._replay_spill(session_factory)
+        return written
+
+    def _spill(self, events: List[Dict[str, Any]]) -> None:
+        if not self.spill_path:
+            self.dropped += len(events)
+            return
+        lines = "".join(json.dumps(jsonable_encoder(event)) + "\n" for event in events).encode("utf-8")
+        with self._spill_lock:
+            try:
+                directory = os.path.dirname(self.spill_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with _file_lock(self.spill_path + ".lock"), open(self.spill_path, "ab+") as f:
+                    # Start on a fresh line if a crash left the last one unfinished
+                    if f.seek(0, os.SEEK_END) > 0:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            lines = b"\n" + lines
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.spilled += len(events)
+            except OSError as e:
+                print(f"❌ Could not spill {len(events)} audit events: {e}")
+                self.dropped += len(events)
+
+    def _replay_spill(self, session_factory: Callable[[], Session]) -> int:
+        """Insert spilled events, keeping whatever could not be written for the next attempt"""
+        if not self.spill_path:
+            return 0
+        replaying = self.spill_path + ".replay"
+        if not os.path.exists(self.spill_path) and not os.path.exists(replaying):
+            return 0
+        with _file_lock(replaying + ".lock", blocking=False) as acquired:
+            if not acquired:
+                # Another worker is replaying
+                return 0
+            with self._spill_lock, _file_lock(self.spill_path + ".lock"):
+                # A leftover .replay file means an earlier replay stopped part way; finish it first
+                if not os.path.exists(replaying):
+                    if not os.path.exists(self.spill_path):
+                        return 0
+                    os.replace(self.spill_path, replaying)
+            events = self._read_spilled(replaying)
+
+            written = 0
+            try:
+                for start in range(0, len(events), self.batch_size):
+                    self._insert(events[start:start + self.batch_size], session_factory)
+                    written = min(start + self.batch_size, len(events))
+            except Exception as e:
+                print(f"⚠️  Audit spill replay failed, will retry: {e}")
+                with open(replaying, "w", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(jsonable_encoder(event)) + "\n" for event in events[written:]))
+                    f.flush()
+                    os.fsync(f.fileno())
+            else:
+                os.remove(replaying)
+        self.written += written
+        return written
+
+    def _read_spilled(self, path: str) -> List[Dict[str, Any]]:
+        """Parse a spill file, moving lines that aren't valid events aside to `<spill>.corrupt`"""
+        events, corrupt = [], []
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    event = json.loads(line)
+                    event["created_at"] = datetime.fromisoformat(event["created_at"])
+                except (ValueError, TypeError, KeyError):
+                    corrupt.append(line if line.endswith("\n") else line + "\n")
+                    continue
+                events.append(event)
+        if corrupt:
+            print(f"⚠️  Skipping {len(corrupt)} unreadable audit spill lines (kept in {self.spill_path}.corrupt)")
+            with open(self.spill_path + ".corrupt", "a", encoding="utf-8") as f:
+                f.write("".join(corrupt))
+        return events
+
+    async def run(self, interval: float) -> None:
+        """Flush every `interval` seconds or when a batch is ready, forever; cancel to stop"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await anyio.to_thread.run_sync(self.flush)
+            except Exception as e:
+                print(f"⚠️  Audit log flusher failed: {e}")
+
+    def close(self) -> None:
+        """Flush what is left at shutdown, spilling it if the database is unavailable"""
+        self._loop = None
+        self._wakeup = None
+        self.flush()
+        with self._cond:
+            remaining = list(self._buffer)
+            self._buffer.clear()
+        if remaining:
+            self._spill(remaining)
+
+    def clear(self) -> None:
+        with self._cond:
+            self._buffer.clear()
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "spilled": self.spilled,
+            "dropped": self.dropped
+        }
+
+
+audit_log = AuditLogWriter(
+    SessionLocal,
+    capacity=settings.AUDIT_BUFFER_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    block_timeout=settings.AUDIT_BLOCK_TIMEOUT_MS / 1000,
+    spill_path=settings.AUDIT_SPILL_PATH,
+    enabled=settings.AUDIT_LOG_ENABLED
+)
@@ -2,58 +2,85 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
 import secrets
-import bcrypt
-from concurrent.futures import ThreadPoolExecutor
-import asyncio
+import math
 
 from ..repositories.user_repository import UserRepository, UserSessionRepository
 from ..schemas.user import LoginRequest, LoginResponse, UserCreate, UserResponse
+from ..config import settings
+from .cache import create_cache
+from .password_hasher import password_hasher, PasswordHasherBusy
+from .rate_limit import login_throttle
+from .audit_log import audit_log
+from .session_tokens import (
+    is_signed_token, sign_session_token, verify_session_token, revocation_filter, utc_timestamp
+)
+from fastapi.encoders import jsonable_encoder
+import hashlib
+
+# Resolved session token -> user; entries never outlive the session and are dropped on logout.
+# A per-process ("memory") cache is only cleared in the worker that handled the logout, so the
+# others may serve a revoked token for up to SESSION_CACHE_TTL_SECONDS (see config)
+session_cache = create_cache(
+    "sessions",
+    settings.SESSION_CACHE_BACKEND,
+    settings.SESSION_CACHE_MAX_ENTRIES,
+    settings.SESSION_CACHE_TTL_SECONDS
+)
+
+def _session_cache_key(session_token: str) -> str:
+    # Hash so raw tokens are never held in (or written to) the cache
+    return hashlib.sha256(session_token.encode("utf-8")).hexdigest()
 
 class AuthService:
     def __init__(self, db_session):
         self.db = db_session
         self.user_repo = UserRepository(db_session)
         self.session_repo = UserSessionRepository(db_session)
-        # Thread pool for CPU-intensive bcrypt operations
-        self._executor = ThreadPoolExecutor(max_workers=2)
     
     def create_session_token(self) -> str:
         """Create a simple session token"""
         return secrets.token_urlsafe(32)
     
     def hash_password(self, password: str) -> str:
-        """Hash password using bcrypt with optimized rounds"""
-        # Use 10 rounds instead of default 12 for faster hashing (still secure)
-        salt = bcrypt.gensalt(rounds=10)
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        """Hash password using bcrypt (10 rounds) on the shared hashing pool"""
+        try:
+            return password_hasher.hash(password)
+        except PasswordHasherBusy:
+            raise self._overloaded()
     
     def verify_password(self, password: str, hashed: str) -> bool:
-        """Verify password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-    
-    async def verify_password_async(self, password: str, hashed: str) -> bool:
-        """Verify password asynchronously to avoid blocking event loop"""
+        """Verify password against hash on the shared hashing pool"""
         try:
-            # Try to get running loop first (for async context)
-            loop = asyncio.get_running_loop()
-        except RuntimeError:
-            # Fallback to get_event_loop if no running loop
-            loop = asyncio.get_event_loop()
-        
-        return await loop.run_in_executor(
-            self._executor,
-            self.verify_password,
-            password,
-            hashed
+            return password_hasher.verify(password, hashed)
+        except PasswordHasherBusy:
+            raise self._overloaded()
+    
+    @staticmethod
+    def _overloaded() -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, please retry shortly.",
+            headers={"Retry-After": "1"}
         )
     
-    def login(self, login_data: LoginRequest) -> LoginResponse:
+    def login(self, login_data: LoginRequest, ip_address: Optional[str] = None) -> LoginResponse:
         """User login with password authentication - ONLY for registered users"""
+        # Reject attempt bursts before any DB lookup or bcrypt work
+        retry_after = login_throttle.check(login_data.email, ip_address)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts. Please try again later.",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+        
         # Check if user exists
         user = self.user_repo.get_user_by_email(login_data.email)
         
         # Reject login if user doesn't exist - specific error message
         if not user:
+            audit_log.record("LOGIN_FAILED", "users", new_values={"email": login_data.email, "reason": "unknown_email"},
+                             ip_address=ip_address)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Email not found. Please register first or check your email address."
@@ -61,80 +88,44 @@ class AuthService:
         
         # Verify password for existing user - specific error message
         if not self.verify_password(login_data.password, user.password_hash):
+            audit_log.record("LOGIN_FAILED", "users", user.id, user.id, new_values={"reason": "incorrect_password"},
+                             ip_address=ip_address)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect password. Please try again."
             )
         
-        # Create session token
-        session_token = self.create_session_token()
-        expires_at = datetime.utcnow() + timedelta(days=7)  # 7 days session
-        
-        # Create session
-        self.session_repo.create_session(
-            user_id=user.id,
-            session_token=session_token,
-            expires_at=expires_at
-        )
-        
-        return LoginResponse(
-            session_token=session_token,
-            user=UserResponse.from_orm(user),
-            expires_at=expires_at
-        )
+        login_throttle.succeeded(login_data.email)
+        return self._start_session(user, ip_address)
     
-    async def login_async(self, login_data: LoginRequest) -> LoginResponse:
-        """Async version of login - uses thread pool for bcrypt to avoid blocking"""
-        try:
-            # Check if user exists
-            user = self.user_repo.get_user_by_email(login_data.email)
-            
-            # Reject login if user doesn't exist - specific error message
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Email not found. Please register first or check your email address."
-                )
-            
-            # Verify password asynchronously to avoid blocking event loop
-            try:
-                is_valid = await self.verify_password_async(login_data.password, user.password_hash)
-            except Exception as e:
-                # Fallback to synchronous verification if async fails
-                print(f"Async password verification failed, using sync fallback: {e}")
-                is_valid = self.verify_password(login_data.password, user.password_hash)
-            
-            if not is_valid:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Incorrect password. Please try again."
-                )
-            
-            # Create session token
-            session_token = self.create_session_token()
-            expires_at = datetime.utcnow() + timedelta(days=7)  # 7 days session
-            
-            # Create session (database operations are fast, no need to async)
-            self.session_repo.create_session(
+    def _start_session(self, user, ip_address: Optional[str] = None) -> LoginResponse:
+        """Create the user_sessions row and the token handed to the client"""
+        user_response = UserResponse.from_orm(user)
+        
+        if settings.SESSION_TOKEN_MODE == "signed":
+            # The row's token column holds a random nonce; the client gets a signed token naming the row
+            expires_at = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+            session = self.session_repo.create_session(
                 user_id=user.id,
-                session_token=session_token,
+                session_token=self.create_session_token(),
                 expires_at=expires_at
             )
-            
-            return LoginResponse(
+            session_token = sign_session_token(session.id, jsonable_encoder(user_response), expires_at)
+        else:
+            session_token = self.create_session_token()
+            expires_at = datetime.utcnow() + timedelta(days=7)  # 7 days session
+            session = self.session_repo.create_session(
+                user_id=user.id,
                 session_token=session_token,
-                user=UserResponse.from_orm(user),
                 expires_at=expires_at
             )
-        except HTTPException:
-            raise
-        except Exception as e:
-            # Log the error for debugging
-            print(f"Login error: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Login failed: {str(e)}"
-            )
+        
+        audit_log.record("LOGIN", "user_sessions", session.id, user.id, ip_address=ip_address)
+        return LoginResponse(
+            session_token=session_token,
+            user=user_response,
+            expires_at=expires_at
+        )
     
     def register(self, user_data: UserCreate) -> UserResponse:
         """User registration"""
@@ -157,36 +148,82 @@ class AuthService:
         
         # Create user
         user = self.user_repo.create_user(hashed_user_data)
+        audit_log.record("REGISTER", "users", user.id, user.id, new_values={"email": user.email, "name": user.name})
         return UserResponse.from_orm(user)
     
     def logout(self, session_token: str) -> bool:
         """User logout"""
+        if is_signed_token(session_token):
+            if settings.SESSION_TOKEN_MODE != "signed":
+                return False
+            claims = verify_session_token(session_token)
+            if not claims:
+                return False
+            revocation_filter.revoke(claims["sid"], claims["exp"])
+            return self.session_repo.revoke_session(claims["sid"])
+        
+        session_cache.delete(_session_cache_key(session_token))
         return self.session_repo.invalidate_session(session_token)
     
     def logout_all_sessions(self, user_id: int) -> int:
         """Logout user from all sessions"""
+        for session_token in self.session_repo.get_user_session_tokens(user_id):
+            session_cache.delete(_session_cache_key(session_token))
+        
+        if settings.SESSION_TOKEN_MODE == "signed":
+            # Keep the rows (marked revoked) so other workers pick the revocations up
+            revoked = self.session_repo.revoke_user_sessions(user_id)
+            for session_id, expires_at in revoked:
+                revocation_filter.revoke(session_id, utc_timestamp(expires_at))
+            return len(revoked)
         return self.session_repo.invalidate_user_sessions(user_id)
     
     def get_current_user(self, session_token: str) -> Optional[UserResponse]:
-        """Get current user from session token"""
-        session = self.session_repo.get_session_by_token(session_token)
-        if not session:
-            return None
+        """Get current user from session token, served from the session cache when possible"""
+        if is_signed_token(session_token):
+            # Opaque tokens never contain a '.'; signed ones are only honoured in signed mode
+            if settings.SESSION_TOKEN_MODE != "signed":
+                return None
+            return self._get_signed_token_user(session_token)
         
-        user = self.user_repo.get_user_by_id(session.user_id)
-        if not user:
+        cache_key = _session_cache_key(session_token)
+        cached = session_cache.get(cache_key)
+        if cached is not None:
+            return UserResponse(**cached)
+        
+        result = self.session_repo.get_session_user(session_token)
+        if not result:
             return None
         
-        return UserResponse.from_orm(user)
+        user, expires_at = result
+        user_response = UserResponse.from_orm(user)
+        ttl = min(settings.SESSION_CACHE_TTL_SECONDS, (expires_at - datetime.utcnow()).total_seconds())
+        if ttl > 0:
+            session_cache.set(cache_key, jsonable_encoder(user_response), ttl=ttl)
+        return user_response
+    
+    def _get_signed_token_user(self, session_token: str) -> Optional[UserResponse]:
+        """Verify a signed token locally; the DB is only read to refresh the revocation filter"""
+        claims = verify_session_token(session_token)
+        if not claims:
+            return None
+        if revocation_filter.needs_sync():
+            revocation_filter.sync(self.session_repo.get_revoked_sessions)
+        if revocation_filter.is_revoked(claims["sid"]):
+            return None
+        return UserResponse(**claims["user"])
     
     def cleanup_expired_sessions(self) -> int:
         """Clean up expired sessions"""
-        return self.session_repo.cleanup_expired_sessions()
+        return self.session_repo.cleanup_expired_sessions(settings.SESSION_CLEANUP_BATCH_SIZE)
     
     def get_user_sessions(self, user_id: int) -> list:
         """Get user's active sessions"""
         from ..models.user import UserSession
-        sessions = self.db.query(UserSession).filter(UserSession.user_id == user_id).all()
+        sessions = self.db.query(UserSession).filter(
+            UserSession.user_id == user_id,
+            UserSession.revoked_at.is_(None)
+        ).all()
         
         return [
             {
@@ -196,8 +233,3 @@ class AuthService:
             }
             for session in sessions
         ]
-    
-    def __del__(self):
-        """Cleanup thread pool executor"""
-        if hasattr(self, '_executor'):
-            self._executor.shutdown(wait=False)
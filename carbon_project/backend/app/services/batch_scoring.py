@@ -0,0 +1,293 @@
+"""
+Offline batch scoring of household files.
+
+score_file() reads a CSV or Parquet file in chunks and fans the chunks out to
+a process pool. Each worker loads the emission model once (in the pool
+initializer) and, per chunk, validates rows against the calculate request
+schema, scores all valid rows with one model call, computes prediction
+intervals and the calculator's per-category breakdown, and writes the chunk
+to its own part file in the output directory. Invalid rows keep their place with an error message instead
+of a prediction.
+
+Completed chunks are recorded in a checkpoint file next to the parts, so an
+interrupted run started again with the same arguments only scores the chunks
+that are missing. The run ends with a throughput report, which is also saved
+in the checkpoint.
+
+Parquet input and output need pyarrow, which is not otherwise a dependency.
+"""
+import io
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+from ..ml.fallback_model import DEFAULT_MODEL_PATH, FallbackEmissionModel
+from ..ml.predict_carbon_fixed import CarbonEmissionPredictorFixed
+from ..schemas.carbon_footprint import CarbonFootprintCalculationRequest
+from .carbon_footprint_service import CarbonFootprintService
+from .model_preload import pin_single_thread
+
+MODELS_DIR = os.path.dirname(DEFAULT_MODEL_PATH)
+DEFAULT_PRIMARY_MODEL_PATH = os.path.join(MODELS_DIR, "v3_carbon_emission_model_minimal.pkl")
+DEFAULT_PREPROCESSOR_PATH = os.path.join(MODELS_DIR, "v3_preprocessor.pkl")
+
+OUTPUT_FORMATS = ("parquet", "csv")
+CHECKPOINT_FILE = "_checkpoint.json"
+BREAKDOWN_CATEGORIES = ["electricity", "transportation", "heating", "waste", "lifestyle", "other"]
+
+INPUT_FIELDS = CarbonFootprintCalculationRequest.model_fields
+
+# The model loaded by this worker process (see _init_worker)
+_model = None
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet files need pyarrow: pip install pyarrow")
+    return pq
+
+
+def read_chunks(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Read a CSV or Parquet file `chunk_size` rows at a time"""
+    if path.lower().endswith((".parquet", ".pq")):
+        parquet_file = _require_pyarrow().ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def load_scoring_model(model: str, model_path: Optional[str] = None,
+                       preprocessor_path: Optional[str] = None) -> Any:
+    """Load the primary ("primary") or fallback ("fallback") emission model"""
+    if model == "fallback":
+        return FallbackEmissionModel.load(model_path or DEFAULT_MODEL_PATH)
+    with redirect_stdout(io.StringIO()):
+        predictor = CarbonEmissionPredictorFixed(
+            model_path=model_path or DEFAULT_PRIMARY_MODEL_PATH,
+            preprocessor_path=preprocessor_path or DEFAULT_PREPROCESSOR_PATH
+        )
+    # The pool already runs one chunk per core
+    pin_single_thread(predictor)
+    return predictor
+
+
+def prepare_inputs(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Validate each row against the calculate request schema. Returns the calculator inputs of the
+    valid rows (blank cells take the schema defaults) and an error message per row ('' if valid).
+    """
+    records, index, errors = [], [], pd.Series("", index=chunk.index, dtype=object)
+    columns = [name for name in chunk.columns if name in INPUT_FIELDS]
+    for row_index, raw in zip(chunk.index, chunk[columns].to_dict("records")):
+        values = {
+            key: value.strip() if isinstance(value, str) else value
+            for key, value in raw.items()
+            if not pd.isna(value) and not (isinstance(value, str) and not value.strip())
+        }
+        try:
+            records.append(CarbonFootprintCalculationRequest(**values).dict())
+            index.append(row_index)
+        except ValidationError as e:
+            errors[row_index] = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            )
+    return pd.DataFrame(records, index=index, columns=list(INPUT_FIELDS)), errors
+
+
+def predict_with_intervals(model: Any, inputs: pd.DataFrame,
+                           coverage: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Predictions for every row with one model call, plus a `coverage` interval from the spread
+    of the trees' predictions when the model is a forest (NaN for other models)
+    """
+    nan = np.full(len(inputs), np.nan)
+    if isinstance(model, FallbackEmissionModel):
+        return np.array(model.predict_batch(inputs.to_dict("records"))), nan, nan
+
+    with redirect_stdout(io.StringIO()):
+        features = model.engineer_features(inputs.copy())
+    predictions = np.asarray(model.model.predict(features), dtype=float)
+
+    trees = getattr(model.model, "estimators_", None)
+    if not isinstance(trees, list) or not trees:
+        return predictions, nan, nan
+    values = features.to_numpy()
+    tree_predictions = np.stack([tree.predict(values) for tree in trees])
+    tail = (1 - coverage) / 2
+    return predictions, np.quantile(tree_predictions, tail, axis=0), np.quantile(tree_predictions, 1 - tail, axis=0)
+
+
+def score_chunk(chunk: pd.DataFrame, first_row: int, coverage: float = 0.9,
+                id_column: Optional[str] = None, model: Any = None) -> pd.DataFrame:
+    """Score one chunk; `first_row` is the 1-based number of its first data row in the file"""
+    model = model or _model
+    inputs, errors = prepare_inputs(chunk)
+    result = pd.DataFrame({"row": np.arange(first_row, first_row + len(chunk))}, index=chunk.index)
+    if id_column:
+        result[id_column] = chunk[id_column] if id_column in chunk.columns else None
+    result["predicted_carbon_footprint"] = np.nan
+    result["prediction_lower"] = np.nan
+    result["prediction_upper"] = np.nan
+    for category in BREAKDOWN_CATEGORIES:
+        result[f"{category}_emissions"] = np.nan
+
+    if len(inputs):
+        predictions, lower, upper = predict_with_intervals(model, inputs, coverage)
+        result.loc[inputs.index, "predicted_carbon_footprint"] = np.round(predictions, 2)
+        result.loc[inputs.index, "prediction_lower"] = np.round(lower, 2)
+        result.loc[inputs.index, "prediction_upper"] = np.round(upper, 2)
+
+        for index, input_data, prediction in zip(inputs.index, inputs.to_dict("records"), predictions):
+            try:
+                breakdown = CarbonFootprintService._calculate_breakdown(input_data, float(prediction))
+            except Exception as e:
+                errors[index] = f"breakdown: {e}"
+                continue
+            for category in BREAKDOWN_CATEGORIES:
+                result.at[index, f"{category}_emissions"] = round(breakdown[category], 2)
+
+    result["model_name"] = model.model_name
+    result["error"] = errors
+    return result
+
+
+def write_part(frame: pd.DataFrame, path: str, output_format: str) -> None:
+    """Write a part file atomically, so a part that exists is always complete"""
+    partial = path + ".partial"
+    if output_format == "parquet":
+        _require_pyarrow()
+        frame.to_parquet(partial, index=False)
+    else:
+        frame.to_csv(partial, index=False)
+    os.replace(partial, path)
+
+
+def _init_worker(model: str, model_path: Optional[str], preprocessor_path: Optional[str]) -> None:
+    global _model
+    _model = load_scoring_model(model, model_path, preprocessor_path)
+
+
+def _score_part(index: int, chunk: pd.DataFrame, first_row: int, output_dir: str, output_format: str,
+                coverage: float, id_column: Optional[str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    result = score_chunk(chunk, first_row, coverage, id_column)
+    write_part(result, os.path.join(output_dir, f"part-{index:05d}.{output_format}"), output_format)
+    failed = int((result["error"] != "").sum())
+    return {
+        "chunk": index,
+        "rows": len(result),
+        "scored": len(result) - failed,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def _load_checkpoint(path: str, run: Dict[str, Any]) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return dict(run, completed={})
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if {key: checkpoint.get(key) for key in run} != run:
+        raise ValueError(
+            f"{path} belongs to a run with different arguments; use another output directory or remove it"
+        )
+    return checkpoint
+
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    partial = path + ".partial"
+    with open(partial, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(partial, path)
+
+
+def score_file(input_path: str, output_dir: str, output_format: str = "parquet", model: str = "primary",
+               model_path: Optional[str] = None, preprocessor_path: Optional[str] = None,
+               chunk_size: int = 10000, workers: Optional[int] = None, coverage: float = 0.9,
+               id_column: Optional[str] = None,
+               progress: Callable[[str], None] = print) -> Dict[str, Any]:
+    """
+    Score `input_path` into part files in `output_dir`, skipping chunks an earlier run of the same
+    arguments completed. `workers` <= 1 scores in this process. Returns the throughput report.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format '{output_format}'")
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    checkpoint = _load_checkpoint(checkpoint_path, {
+        "input": os.path.abspath(input_path),
+        "chunk_size": chunk_size,
+        "output_format": output_format,
+        "model": model,
+        "coverage": coverage,
+        "id_column": id_column
+    })
+    completed = checkpoint["completed"]
+    resumed = len(completed)
+    if resumed:
+        progress(f"🔁 Resuming: {resumed} chunks already scored")
+
+    started = time.perf_counter()
+    totals = {"rows": 0, "scored": 0, "failed": 0, "chunks": 0}
+
+    def record(stats: Dict[str, Any]) -> None:
+        completed[str(stats["chunk"])] = stats
+        _save_checkpoint(checkpoint_path, checkpoint)
+        for key in ("rows", "scored", "failed"):
+            totals[key] += stats[key]
+        totals["chunks"] += 1
+        elapsed = time.perf_counter() - started
+        progress(f"   → chunk {stats['chunk']}: {stats['rows']} rows in {stats['seconds']:.2f}s "
+                 f"({totals['rows'] / elapsed:,.0f} rows/s overall)")
+
+    def pending_chunks() -> Iterator[Tuple[int, pd.DataFrame, int]]:
+        first_row = 1
+        for index, chunk in enumerate(read_chunks(input_path, chunk_size)):
+            if str(index) not in completed:
+                yield index, chunk, first_row
+            first_row += len(chunk)
+
+    part_args = (output_dir, output_format, coverage, id_column)
+    if workers <= 1:
+        _init_worker(model, model_path, preprocessor_path)
+        for index, chunk, first_row in pending_chunks():
+            record(_score_part(index, chunk, first_row, *part_args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model, model_path, preprocessor_path)) as pool:
+            # Keep only a couple of chunks per worker in flight so memory stays bounded
+            in_flight = set()
+            for index, chunk, first_row in pending_chunks():
+                in_flight.add(pool.submit(_score_part, index, chunk, first_row, *part_args))
+                if len(in_flight) >= workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result())
+            for future in in_flight:
+                record(future.result())
+
+    elapsed = time.perf_counter() - started
+    report = dict(
+        totals,
+        resumed_chunks=resumed,
+        workers=max(workers, 1),
+        seconds=round(elapsed, 2),
+        rows_per_second=round(totals["rows"] / elapsed, 1) if elapsed > 0 else None,
+        chunk_seconds_mean=round(
+            float(np.mean([stats["seconds"] for stats in completed.values()])), 3
+        ) if completed else None
+    )
+    checkpoint["report"] = report
+    _save_checkpoint(checkpoint_path, checkpoint)
+    return report
@@ -0,0 +1,210 @@
+"""
+Small key/value caches used by the service layer.
+
+TTLCache is a bounded, thread-safe in-process LRU with per-entry expiry.
+SQLiteCacheStore offers the same interface backed by a local SQLite file so
+several worker processes on one host can share entries and invalidations.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.services.local_sqlite import LocalSQLite
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry time-to-live"""
+
+    def __init__(self, max_entries: int = 10000, default_ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: Any, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set `key` only if it is absent or expired; returns whether it was set"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def _store(self, key: Any, value: Any, ttl: Optional[float]) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Any) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class SQLiteCacheStore:
+    """File-backed cache shared by processes on the same host; values must be JSON-serializable"""
+
+    def __init__(self, path: str, namespace: str, max_entries: int = 10000, default_ttl: float = 300.0):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        # Opened on first use in each process, so workers forked after import get their own
+        self._db = LocalSQLite(path, self._create_schema)
+        # The size is checked every `_trim_every` writes rather than on each one, so a
+        # namespace can briefly run about 1% over max_entries per process
+        self._trim_every = max(1, max_entries // 100)
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                cache_key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (namespace, cache_key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_expiry ON cache_entries (namespace, expires_at)")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._db.connection()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND cache_key = ?",
+                (self.namespace, str(key))
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, cache_key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, str(key), json.dumps(value), expires_at)
+            )
+            self._trim(str(key))
+
+    def add(self, key: Any, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set `key` only if it is absent or expired, atomically across processes; returns whether it was set"""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            # An expired entry is deleted and inserted again rather than updated, so the
+            # claim gets a fresh rowid and counts as the newest entry when trimming
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND cache_key = ? "
+                    "AND expires_at IS NOT NULL AND expires_at <= ?",
+                    (self.namespace, str(key), now)
+                )
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO cache_entries (namespace, cache_key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (self.namespace, str(key), json.dumps(value), now + ttl if ttl else None)
+                )
+                added = cursor.rowcount > 0
+                if added:
+                    self._trim(str(key))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def _trim(self, written_key: str) -> None:
+        # Beyond max_entries, the oldest-written entries go first and entries without an expiry go
+        # last; the entry just written is never evicted, so a claim made by add() always survives it
+        self._writes += 1
+        if self._writes % self._trim_every:
+            return
+        self._conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, time.time())
+        )
+        overflow = self._conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0] - self.max_entries
+        if overflow <= 0:
+            return
+        self._conn.execute("""
+            DELETE FROM cache_entries WHERE rowid IN (
+                SELECT rowid FROM cache_entries WHERE namespace = ? AND cache_key != ?
+                ORDER BY expires_at IS NULL, rowid LIMIT ?
+            )
+        """, (self.namespace, written_key, overflow))
+
+    def delete(self, key: Any) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND cache_key = ?",
+                (self.namespace, str(key))
+            )
+        return cursor.rowcount > 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        return {"backend": "sqlite", "entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+def create_cache(namespace: str, backend: str, max_entries: int, default_ttl: float):
+    """Build a cache for `namespace` using the configured backend ('memory' or 'sqlite')"""
+    if backend == "sqlite":
+        return SQLiteCacheStore(settings.CACHE_SQLITE_PATH, namespace, max_entries, default_ttl)
+    return TTLCache(max_entries, default_ttl)
@@ -1,12 +1,16 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from datetime import datetime, timedelta
 from decimal import Decimal
 import json
+import sqlite3
+
+from sqlalchemy.orm import Session
 
 from ..repositories.carbon_footprint_repository import (
     CarbonFootprintRepository, 
     RecommendationRepository, 
-    UserGoalRepository
+    UserGoalRepository,
+    UserFootprintRollupRepository
 )
 from ..schemas.carbon_footprint import (
     CarbonFootprintCreate, 
@@ -15,11 +19,53 @@ from ..schemas.carbon_footprint import (
     UserGoalCreate,
     CarbonFootprintStats,
     EmissionTrend,
+    EmissionTrendBucket,
     RecommendationStats,
-    UserGoalProgress
+    UserGoalProgress,
+    PriorityEnum
 )
+from ..models.carbon_footprint import CarbonFootprint, Recommendation, UserFootprintRollup
 from ..ml.predict_carbon_fixed import CarbonEmissionPredictorFixed
+from ..config import settings
+from .cache import create_cache
+from .singleflight import SingleFlight
+from .degraded_mode import FALLBACK_MODEL_VERSION, degraded_mode
+from .job_queue import job_handler, job_queue
+from .audit_log import audit_log
+from .footprint_export import export_chunks, gzip_chunks
+from fastapi.encoders import jsonable_encoder
 import os
+import uuid
+
+# Per-user dashboard snapshots; entries are dropped by invalidate_dashboard on every
+# write to a user's footprints, goals or recommendations and expire after the TTL
+dashboard_cache = create_cache(
+    "dashboard",
+    settings.DASHBOARD_CACHE_BACKEND,
+    settings.DASHBOARD_CACHE_MAX_ENTRIES,
+    settings.DASHBOARD_CACHE_TTL_SECONDS
+)
+
+# Concurrent identical reads (e.g. web and mobile clients loading at login) share one computation
+read_flight = SingleFlight(default_timeout=settings.SINGLE_FLIGHT_TIMEOUT_SECONDS)
+
+def invalidate_dashboard(user_id: Optional[int]) -> None:
+    """Drop the user's cached dashboard and bump its generation so in-flight rebuilds aren't stored"""
+    if user_id is None:
+        return
+    # Expires like a snapshot rather than never, so size-based trimming treats it like any other entry
+    dashboard_cache.set(f"generation:{user_id}", uuid.uuid4().hex)
+    dashboard_cache.delete(f"snapshot:{user_id}")
+
+@job_handler("save_recommendations")
+def save_recommendations(db, payload: Dict[str, Any]) -> None:
+    """Insert a footprint's recommendations unless an earlier attempt already did"""
+    recommendation_repo = RecommendationRepository(db)
+    if not recommendation_repo.has_recommendations(payload["footprint_id"]):
+        recommendation_repo.create_recommendations_batch(
+            [RecommendationCreate(**rec) for rec in payload["recommendations"]]
+        )
+    invalidate_dashboard(payload["user_id"])
 
 class CarbonFootprintService:
     def __init__(self, db_session):
@@ -27,24 +73,43 @@ class CarbonFootprintService:
         self.footprint_repo = CarbonFootprintRepository(db_session)
         self.recommendation_repo = RecommendationRepository(db_session)
         self.goal_repo = UserGoalRepository(db_session)
-        
-        # Initialize ML predictor
+        self.rollup_repo = UserFootprintRollupRepository(db_session)
+    
+    @staticmethod
+    def _load_predictor() -> CarbonEmissionPredictorFixed:
         current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         model_path = os.path.join(current_dir, "ml", "models", "v3_carbon_emission_model_minimal.pkl")
         preprocessor_path = os.path.join(current_dir, "ml", "models", "v3_preprocessor.pkl")
-        
-        self.predictor = CarbonEmissionPredictorFixed(
+        return CarbonEmissionPredictorFixed(
             model_path=model_path,
             preprocessor_path=preprocessor_path
         )
     
     def calculate_carbon_footprint(self, user_id: int, input_data: Dict[str, Any], 
-                                 ip_address: str = None, user_agent: str = None) -> CarbonFootprintResponse:
+                                 ip_address: str = None, user_agent: str = None,
+                                 degraded_reason: Optional[str] = None) -> CarbonFootprintResponse:
         """Calculate carbon footprint and save to database"""
+        footprint, _ = self.calculate_with_recommendations(
+            user_id, input_data, ip_address, user_agent, degraded_reason
+        )
+        return footprint
+    
+    def calculate_with_recommendations(self, user_id: int, input_data: Dict[str, Any],
+                                       ip_address: str = None, user_agent: str = None,
+                                       degraded_reason: Optional[str] = None
+                                       ) -> Tuple[CarbonFootprintResponse, List[RecommendationCreate]]:
+        """
+        Calculate and save a carbon footprint, returning it with its generated recommendations.
+        The primary model (loaded once per process) is used unless `degraded_reason` is set or it
+        can't be loaded, in which case the fallback model's estimate is stored with model_version
+        "fallback". Only the footprint row and its rollup are written before returning; the
+        recommendations are saved by a background job.
+        """
         try:
             # Get prediction from ML model
-            prediction_result = self.predictor.predict_from_raw_inputs(input_data)
-            recommendations = self.predictor.get_recommendations(input_data, prediction_result["predicted_carbon_footprint"])
+            predictor, degraded = degraded_mode.select(degraded_reason, self._load_predictor)
+            prediction_result = predictor.predict_from_raw_inputs(input_data)
+            recommendations = predictor.get_recommendations(input_data, prediction_result["predicted_carbon_footprint"])
             
             # Parse confidence score
             confidence_str = prediction_result["model_confidence"]
@@ -58,8 +123,8 @@ class CarbonFootprintService:
                 input_data=input_data,
                 total_emissions=Decimal(str(prediction_result["predicted_carbon_footprint"])),
                 confidence_score=Decimal(str(confidence_score)),
-                model_name=self.predictor.model_name,
-                model_version="v3",
+                model_name=predictor.model_name,
+                model_version=FALLBACK_MODEL_VERSION if degraded else "v3",
                 electricity_emissions=Decimal(str(breakdown.get("electricity", 0))),
                 transportation_emissions=Decimal(str(breakdown.get("transportation", 0))),
                 heating_emissions=Decimal(str(breakdown.get("heating", 0))),
@@ -71,33 +136,57 @@ class CarbonFootprintService:
                 is_anonymous=user_id is None
             )
             
-            # Save to database
             footprint = self.footprint_repo.create_carbon_footprint(user_id, footprint_data)
+            recommendation_data = [
+                RecommendationCreate(
+                    carbon_footprint_id=footprint.id,
+                    category=rec.get("category", "General")[:100],
+                    title=rec.get("action", "Improvement Suggestion")[:255],
+                    description=rec.get("action", ""),
+                    action_required=rec.get("action", ""),
+                    potential_savings=rec.get("potential_savings", "")[:255],
+                    priority=self._normalize_priority(rec.get("priority")),
+                    estimated_impact=Decimal(str(rec.get("estimated_impact"))) if rec.get("estimated_impact") else None
+                )
+                for rec in recommendations
+            ]
+            invalidate_dashboard(user_id)
+            self._save_recommendations_later(user_id, footprint.id, recommendation_data)
+            audit_log.record(
+                "CALCULATE", "carbon_footprints", footprint.id, user_id,
+                new_values={"total_emissions": footprint.total_emissions, "model_version": footprint.model_version},
+                ip_address=ip_address, user_agent=user_agent
+            )
             
-            # Create recommendations (temporarily disabled due to enum issue)
-            # recommendation_data = []
-            # for rec in recommendations:
-            #     rec_data = RecommendationCreate(
-            #         carbon_footprint_id=footprint.id,
-            #         category=rec.get("category", "General"),
-            #         title=rec.get("action", "Improvement Suggestion"),
-            #         description=rec.get("action", ""),
-            #         action_required=rec.get("action", ""),
-            #         potential_savings=rec.get("potential_savings", ""),
-            #         priority=rec.get("priority", "medium").lower(),
-            #         estimated_impact=Decimal(str(rec.get("estimated_impact", 0))) if rec.get("estimated_impact") else None
-            #     )
-            #     recommendation_data.append(rec_data)
-            # 
-            # if recommendation_data:
-            #     self.recommendation_repo.create_recommendations_batch(recommendation_data)
-            
-            return CarbonFootprintResponse.from_orm(footprint)
+            return CarbonFootprintResponse.from_orm(footprint), recommendation_data
             
         except Exception as e:
+            self.db.rollback()
             raise Exception(f"Failed to calculate carbon footprint: {str(e)}")
     
-    def _calculate_breakdown(self, input_data: Dict[str, Any], total_emissions: float) -> Dict[str, float]:
+    def _save_recommendations_later(self, user_id: Optional[int], footprint_id: int,
+                                    recommendation_data: List[RecommendationCreate]) -> None:
+        payload = {
+            "user_id": user_id,
+            "footprint_id": footprint_id,
+            "recommendations": jsonable_encoder(recommendation_data)
+        }
+        try:
+            job_queue.enqueue("save_recommendations", payload)
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not queue recommendations, saving them now: {e}")
+            save_recommendations(self.db, payload)
+    
+    @staticmethod
+    def _normalize_priority(priority: Optional[str]) -> PriorityEnum:
+        """Map the predictor's 'High'/'Medium'/'Low' labels onto the lowercase priority enum"""
+        try:
+            return PriorityEnum((priority or "medium").lower())
+        except ValueError:
+            return PriorityEnum.MEDIUM
+    
+    @staticmethod
+    def _calculate_breakdown(input_data: Dict[str, Any], total_emissions: float) -> Dict[str, float]:
         """Calculate emissions breakdown by category using vehicle parameters"""
         
         electricity_usage = float(input_data.get('electricity_usage_kwh', 0))
@@ -197,11 +286,28 @@ class CarbonFootprintService:
             "other": float(other_emissions)
         }
     
-    def get_user_footprints(self, user_id: int, skip: int = 0, limit: int = 50) -> List[CarbonFootprintResponse]:
+    def get_user_footprints(self, user_id: int, skip: int = 0, limit: int = 50,
+                            cursor: Optional[str] = None) -> List[CarbonFootprintResponse]:
         """Get user's carbon footprint history"""
-        footprints = self.footprint_repo.get_user_footprints(user_id, skip, limit)
+        footprints = self.footprint_repo.get_user_footprints(user_id, skip, limit, cursor)
         return [CarbonFootprintResponse.from_orm(footprint) for footprint in footprints]
     
+    def export_footprints(self, user_id: int, fmt: str, compress: bool = False) -> Iterator[bytes]:
+        """Stream the user's full history as CSV or NDJSON bytes, optionally gzipped"""
+        chunks = export_chunks(self._iter_export_rows(user_id), fmt)
+        return gzip_chunks(chunks) if compress else chunks
+    
+    def _iter_export_rows(self, user_id: int) -> Iterator[Any]:
+        # The response is streamed after the request's session has been closed, so read
+        # through a session of our own that lives exactly as long as the stream
+        db = Session(bind=self.db.get_bind())
+        try:
+            yield from CarbonFootprintRepository(db).iter_user_footprint_rows(
+                user_id, batch_size=settings.EXPORT_BATCH_SIZE
+            )
+        finally:
+            db.close()
+    
     def get_footprint_by_id(self, footprint_id: int, user_id: int = None) -> Optional[CarbonFootprintResponse]:
         """Get carbon footprint by ID"""
         footprint = self.footprint_repo.get_footprint_by_id(footprint_id)
@@ -215,17 +321,33 @@ class CarbonFootprintService:
     
     def get_footprint_stats(self, user_id: int) -> CarbonFootprintStats:
         """Get user's carbon footprint statistics"""
-        stats = self.footprint_repo.get_user_footprint_stats(user_id)
+        return read_flight.do(("stats", user_id), lambda: self._load_footprint_stats(user_id))
+    
+    def _load_footprint_stats(self, user_id: int) -> CarbonFootprintStats:
+        return self._stats_from_rollup(user_id, self.rollup_repo.get_rollup(user_id))
+    
+    def _stats_from_rollup(self, user_id: int, rollup: Optional[UserFootprintRollup]) -> CarbonFootprintStats:
+        stats = self.rollup_repo.rollup_stats(rollup)
+        if stats is None:
+            # No rollup yet (history predating rollups): read the live aggregate. The next write
+            # builds the rollup, or scripts/rebuild_rollups.py backfills it.
+            stats = self.footprint_repo.get_user_footprint_stats(user_id)
         return CarbonFootprintStats(**stats)
     
-    def get_emission_trends(self, user_id: int, days: int = 30) -> List[EmissionTrend]:
-        """Get user's emission trends over time"""
-        trends = self.footprint_repo.get_footprint_trends(user_id, days)
-        return [EmissionTrend(**trend) for trend in trends]
+    def get_emission_trends(self, user_id: int, days: int = 30, bucket: Optional[str] = None,
+                            max_points: Optional[int] = None) -> List[EmissionTrend]:
+        """Get user's emission trends over time, optionally bucketed and downsampled"""
+        def load():
+            trends = self.footprint_repo.get_footprint_trends(user_id, days, bucket, max_points)
+            trend_model = EmissionTrendBucket if bucket else EmissionTrend
+            return [trend_model(**trend) for trend in trends]
+        
+        return read_flight.do(("trends", user_id, days, bucket, max_points), load)
     
-    def get_recommendations(self, user_id: int, skip: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+    def get_recommendations(self, user_id: int, skip: int = 0, limit: int = 50,
+                            cursor: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get user's recommendations"""
-        recommendations = self.recommendation_repo.get_user_recommendations(user_id, skip, limit)
+        recommendations = self.recommendation_repo.get_user_recommendations(user_id, skip, limit, cursor)
         return [
             {
                 "id": rec.id,
@@ -246,15 +368,18 @@ class CarbonFootprintService:
     def mark_recommendation_implemented(self, recommendation_id: int, user_id: int) -> bool:
         """Mark recommendation as implemented"""
         # Verify recommendation belongs to user
-        recommendation = self.recommendation_repo.db.query(self.recommendation_repo.db.query(Recommendation).join(CarbonFootprint).filter(
+        recommendation = self.db.query(Recommendation.id).join(CarbonFootprint).filter(
             Recommendation.id == recommendation_id,
             CarbonFootprint.user_id == user_id
-        ).first())
+        ).first()
         
         if not recommendation:
             return False
         
-        return self.recommendation_repo.mark_recommendation_implemented(recommendation_id)
+        if not self.recommendation_repo.mark_recommendation_implemented(recommendation_id):
+            return False
+        invalidate_dashboard(user_id)
+        return True
     
     def get_recommendation_stats(self, user_id: int) -> RecommendationStats:
         """Get recommendation implementation statistics"""
@@ -264,6 +389,8 @@ class CarbonFootprintService:
     def create_goal(self, user_id: int, goal_data: UserGoalCreate) -> Dict[str, Any]:
         """Create user goal"""
         goal = self.goal_repo.create_goal(user_id, goal_data)
+        invalidate_dashboard(user_id)
+        audit_log.record("CREATE", "user_goals", goal.id, user_id, new_values=goal_data.dict())
         return {
             "id": goal.id,
             "goal_type": goal.goal_type,
@@ -275,9 +402,10 @@ class CarbonFootprintService:
             "created_at": goal.created_at.isoformat()
         }
     
-    def get_user_goals(self, user_id: int, skip: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+    def get_user_goals(self, user_id: int, skip: int = 0, limit: int = 50,
+                       cursor: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get user's goals"""
-        goals = self.goal_repo.get_user_goals(user_id, skip, limit)
+        goals = self.goal_repo.get_user_goals(user_id, skip, limit, cursor)
         return [
             {
                 "id": goal.id,
@@ -308,7 +436,11 @@ class CarbonFootprintService:
         if not goal or goal.user_id != user_id:
             return False
         
-        return self.goal_repo.mark_goal_achieved(goal_id)
+        if not self.goal_repo.mark_goal_achieved(goal_id):
+            return False
+        invalidate_dashboard(user_id)
+        audit_log.record("ACHIEVE", "user_goals", goal_id, user_id, new_values={"is_achieved": True})
+        return True
     
     def delete_goal(self, goal_id: int, user_id: int) -> bool:
         """Delete user goal"""
@@ -317,19 +449,63 @@ class CarbonFootprintService:
         if not goal or goal.user_id != user_id:
             return False
         
-        return self.goal_repo.delete_goal(goal_id)
+        goal_type = goal.goal_type
+        if not self.goal_repo.delete_goal(goal_id):
+            return False
+        invalidate_dashboard(user_id)
+        audit_log.record("DELETE", "user_goals", goal_id, user_id, old_values={"goal_type": goal_type})
+        return True
     
     def get_dashboard_data(self, user_id: int) -> Dict[str, Any]:
-        """Get comprehensive dashboard data for user"""
-        stats = self.get_footprint_stats(user_id)
+        """Get comprehensive dashboard data for user, served from the snapshot cache when fresh"""
+        snapshot = dashboard_cache.get(f"snapshot:{user_id}")
+        if snapshot is not None:
+            return snapshot
+        
+        return read_flight.do(("dashboard", user_id), lambda: self._refresh_dashboard(user_id))
+    
+    def _refresh_dashboard(self, user_id: int) -> Dict[str, Any]:
+        generation = dashboard_cache.get(f"generation:{user_id}")
+        snapshot = jsonable_encoder(self._build_dashboard_snapshot(user_id))
+        
+        # Skip storing if a write invalidated the user while we were reading
+        if dashboard_cache.get(f"generation:{user_id}") == generation:
+            dashboard_cache.set(f"snapshot:{user_id}", snapshot)
+        return snapshot
+    
+    def _build_dashboard_snapshot(self, user_id: int) -> Dict[str, Any]:
+        """
+        Read each dashboard section once. Stats and the latest footprint come from the user's
+        rollup row (the footprint by primary key); users without calculations have no trends
+        or recommendations, so those sections aren't queried for them
+        """
+        rollup = self.rollup_repo.get_rollup(user_id)
+        stats = self._stats_from_rollup(user_id, rollup)
+        goals = self.get_user_goals(user_id, 0, 5)
+        
+        if not stats.total_calculations:
+            return {
+                "stats": stats.dict(),
+                "trends": [],
+                "recommendations": [],
+                "recommendation_stats": RecommendationStats(
+                    total_recommendations=0, implemented_recommendations=0, implementation_rate=0
+                ).dict(),
+                "goals": goals,
+                "latest_footprint": None
+            }
+        
         trends = self.get_emission_trends(user_id, 30)
         recommendations = self.get_recommendations(user_id, 0, 10)
         rec_stats = self.get_recommendation_stats(user_id)
-        goals = self.get_user_goals(user_id, 0, 5)
         
-        # Get latest footprint
-        latest_footprints = self.get_user_footprints(user_id, 0, 1)
-        latest_footprint = latest_footprints[0] if latest_footprints else None
+        latest_footprint = None
+        if rollup is not None and rollup.latest_footprint_id is not None:
+            latest_footprint = self.footprint_repo.get_footprint_by_id(rollup.latest_footprint_id)
+        if latest_footprint is None:
+            # No rollup yet (history predating rollups)
+            latest_footprints = self.footprint_repo.get_user_footprints(user_id, 0, 1)
+            latest_footprint = latest_footprints[0] if latest_footprints else None
         
         return {
             "stats": stats.dict(),
@@ -337,5 +513,5 @@ class CarbonFootprintService:
             "recommendations": recommendations,
             "recommendation_stats": rec_stats.dict(),
             "goals": goals,
-            "latest_footprint": latest_footprint.dict() if latest_footprint else None
+            "latest_footprint": CarbonFootprintResponse.from_orm(latest_footprint).dict() if latest_footprint else None
         }
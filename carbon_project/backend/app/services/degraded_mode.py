@@ -0,0 +1,111 @@
+"""
+Degraded-mode switch between the primary emission model and the fallback.
+
+Requests are served by FallbackEmissionModel, and flagged degraded, when the
+primary model could not be loaded, when `queue_threshold` or more requests are
+already waiting for an inference slot, or when admission control would
+otherwise reject them. The primary model is loaded once per process; a failed
+load is retried every `retry_interval` seconds rather than on every request.
+"""
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..config import settings
+from ..ml.fallback_model import DEFAULT_MODEL_PATH, FallbackEmissionModel
+from .admission import AdmissionController, inference_admission
+
+FALLBACK_MODEL_VERSION = FallbackEmissionModel.model_version
+
+
+class DegradedMode:
+    """Chooses the model for each inference request and counts degraded responses"""
+
+    def __init__(self, admission: AdmissionController, mode: str = "auto", queue_threshold: int = 8,
+                 fallback_path: Optional[str] = None, retry_interval: float = 60):
+        self.admission = admission
+        self.mode = mode
+        self.queue_threshold = queue_threshold
+        self.fallback_path = fallback_path or DEFAULT_MODEL_PATH
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._primary = None
+        self._fallback: Optional[FallbackEmissionModel] = None
+        self._failed_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.degraded_responses: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def fallback(self) -> FallbackEmissionModel:
+        if self._fallback is None:
+            self._fallback = FallbackEmissionModel.load(self.fallback_path)
+        return self._fallback
+
+    def overload_reason(self) -> Optional[str]:
+        """Why a new request should skip the primary model's queue, or None"""
+        if self.mode == "force":
+            return "forced"
+        if self.enabled and self.admission.queue_depth() >= self.queue_threshold:
+            return "queue_depth"
+        return None
+
+    def load_primary(self, loader: Callable[[], Any]) -> Optional[Any]:
+        """The process's primary model, loaded with `loader` on first use; None while it can't be loaded"""
+        with self._lock:
+            if self._primary is None and (
+                self._failed_at is None or time.monotonic() - self._failed_at >= self.retry_interval
+            ):
+                try:
+                    self._primary = loader()
+                    self._failed_at = None
+                    self.last_error = None
+                except Exception as e:
+                    print(f"❌ Failed to load ML model: {e}")
+                    self._failed_at = time.monotonic()
+                    self.last_error = str(e)
+            return self._primary
+
+    def select(self, reason: Optional[str], loader: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (model, degraded): the primary model unless `reason` is set or it is unavailable"""
+        if reason is None:
+            primary = self.load_primary(loader)
+            if primary is not None:
+                return primary, False
+            if not self.enabled:
+                raise RuntimeError(f"ML model is not available: {self.last_error}")
+            reason = "model_unavailable"
+        with self._lock:
+            self.degraded_responses[reason] += 1
+        return self.fallback, True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._primary = None
+            self._failed_at = None
+            self.last_error = None
+            self.degraded_responses.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        primary_loaded = self._primary is not None
+        return {
+            "mode": self.mode,
+            "active": self.overload_reason() is not None or (self.enabled and self._failed_at is not None),
+            "primary_loaded": primary_loaded,
+            "primary_error": self.last_error,
+            "queue_threshold": self.queue_threshold,
+            "degraded_responses": dict(self.degraded_responses)
+        }
+
+
+degraded_mode = DegradedMode(
+    inference_admission,
+    mode=settings.DEGRADED_MODE,
+    queue_threshold=settings.DEGRADED_QUEUE_THRESHOLD,
+    fallback_path=settings.FALLBACK_MODEL_PATH,
+    retry_interval=settings.PRIMARY_MODEL_RETRY_SECONDS
+)
@@ -0,0 +1,86 @@
+"""
+Streaming export of a user's carbon footprint history.
+
+Rows arrive from CarbonFootprintRepository.iter_user_footprint_rows (a
+server-side cursor) and are encoded to CSV or NDJSON text a few hundred rows
+at a time, so a StreamingResponse can send years of history while the server
+holds only one chunk in memory. gzip_chunks compresses the stream on the fly.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, Sequence
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson"
+}
+
+EXPORT_FIELDS = [
+    "calculation_uuid", "calculation_date", "total_emissions", "confidence_score",
+    "model_name", "model_version", "electricity_emissions", "transportation_emissions",
+    "heating_emissions", "waste_emissions", "lifestyle_emissions", "other_emissions",
+    "input_data"
+]
+
+
+def _record(row: Sequence[Any]) -> Dict[str, Any]:
+    record = dict(zip(EXPORT_FIELDS, row))
+    for field, value in record.items():
+        if isinstance(value, Decimal):
+            record[field] = float(value)
+        elif isinstance(value, datetime):
+            record[field] = value.isoformat()
+    return record
+
+
+def _csv_chunks(rows: Iterable[Sequence[Any]], rows_per_chunk: int) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    pending = 0
+    for row in rows:
+        record = _record(row)
+        record["input_data"] = json.dumps(record["input_data"], separators=(",", ":"))
+        writer.writerow(record.values())
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(rows: Iterable[Sequence[Any]], rows_per_chunk: int) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(_record(row), separators=(",", ":")) + "\n")
+        if len(lines) >= rows_per_chunk:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+def export_chunks(rows: Iterable[Sequence[Any]], fmt: str, rows_per_chunk: int = 500) -> Iterator[bytes]:
+    """Encode rows of EXPORT_FIELDS as `fmt` ("csv" or "ndjson"), yielding UTF-8 chunks"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'")
+    encode = _csv_chunks if fmt == "csv" else _ndjson_chunks
+    for chunk in encode(rows, rows_per_chunk):
+        if chunk:
+            yield chunk.encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """gzip-compress a byte stream incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
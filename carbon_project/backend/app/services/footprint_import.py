@@ -0,0 +1,242 @@
+"""
+Bulk import of household calculations from CSV.
+
+An upload is saved under UPLOAD_DIR/imports and a footprint_imports row tracks
+it; an "import_footprints" background job then works through the file. Rows
+are read IMPORT_CHUNK_SIZE at a time and validated against
+CarbonFootprintCalculationRequest; the valid rows of a chunk are scored with
+one batch prediction, get the same per-category breakdown as the calculator,
+and are written with one multi-row INSERT in the same transaction as the
+import's progress. Imported rows carry the import's id and stay out of the
+uploader's own history, stats, goals and dashboard. Invalid rows are counted and reported
+(up to IMPORT_MAX_REPORTED_ERRORS) with their CSV row numbers.
+
+Each job run handles IMPORT_CHUNKS_PER_JOB chunks and queues another run for
+the rest, so a large file doesn't hold a job lease for long. Progress is
+committed per chunk, so a re-delivered or retried job resumes where the last
+commit left off instead of importing rows twice. A job that keeps failing
+(e.g. the model is unavailable) marks the import failed once the queue gives up.
+"""
+import csv
+import os
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from ..config import settings
+from ..models.carbon_footprint import FootprintImport
+from ..repositories.carbon_footprint_repository import CarbonFootprintRepository, FootprintImportRepository
+from ..schemas.carbon_footprint import CarbonFootprintCalculationRequest, CarbonFootprintCreate
+from .audit_log import audit_log
+from .carbon_footprint_service import CarbonFootprintService
+from .degraded_mode import FALLBACK_MODEL_VERSION, degraded_mode
+from .job_queue import job_handler, job_queue
+
+IMPORT_DIR = os.path.join(settings.UPLOAD_DIR, "imports")
+
+# Row numbers as a spreadsheet shows them: the header is row 1
+FIRST_DATA_ROW = 2
+
+
+class ImportFileTooLarge(Exception):
+    """The upload is larger than IMPORT_MAX_FILE_SIZE"""
+
+
+def read_chunks(path: str, skip_rows: int, chunk_size: int) -> Iterator[List[Tuple[int, Dict[str, str]]]]:
+    """Yield lists of (row number, raw row) from a CSV file, skipping the first `skip_rows` rows"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = enumerate(csv.DictReader(f), start=FIRST_DATA_ROW)
+        for _ in islice(rows, skip_rows):
+            pass
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def validate_row(raw: Dict[Optional[str], Any]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """Return (calculator input, []) for a valid row, or (None, errors)"""
+    # Blank cells fall back to the schema defaults; cells past the header (key None) are ignored
+    values = {
+        key.strip(): value.strip()
+        for key, value in raw.items()
+        if key is not None and isinstance(value, str) and value.strip()
+    }
+    try:
+        return CarbonFootprintCalculationRequest(**values).dict(), []
+    except ValidationError as e:
+        return None, [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+
+
+class FootprintImportService:
+    def __init__(self, db_session):
+        self.db = db_session
+        self.import_repo = FootprintImportRepository(db_session)
+        self.footprint_repo = CarbonFootprintRepository(db_session)
+        self.carbon_service = CarbonFootprintService(db_session)
+
+    def start_import(self, user_id: int, filename: Optional[str], upload: BinaryIO) -> FootprintImport:
+        """Save an uploaded CSV and queue its import"""
+        os.makedirs(IMPORT_DIR, exist_ok=True)
+        file_path = os.path.join(IMPORT_DIR, f"{uuid.uuid4().hex}.csv")
+        size = 0
+        try:
+            with open(file_path, "wb") as f:
+                while True:
+                    block = upload.read(1024 * 1024)
+                    if not block:
+                        break
+                    size += len(block)
+                    if size > settings.IMPORT_MAX_FILE_SIZE:
+                        raise ImportFileTooLarge(
+                            f"File is larger than the {settings.IMPORT_MAX_FILE_SIZE // (1024 * 1024)}MB import limit"
+                        )
+                    f.write(block)
+        except Exception:
+            os.remove(file_path)
+            raise
+
+        footprint_import = self.create_import(user_id, filename, file_path)
+        job_queue.enqueue("import_footprints", {"import_id": footprint_import.id})
+        return footprint_import
+
+    def create_import(self, user_id: int, filename: Optional[str], file_path: str) -> FootprintImport:
+        footprint_import = self.import_repo.create_import(user_id, filename, file_path)
+        audit_log.record(
+            "IMPORT_STARTED", "footprint_imports", footprint_import.id, user_id,
+            new_values={"filename": filename}
+        )
+        return footprint_import
+
+    def get_import(self, user_id: int, import_uuid: str) -> Optional[FootprintImport]:
+        return self.import_repo.get_user_import(user_id, import_uuid)
+
+    def process_import(self, import_id: int, max_chunks: Optional[int] = None) -> bool:
+        """
+        Import the next `max_chunks` chunks (all of them by default), committing after each.
+        Returns True once the import has finished, successfully or not.
+        """
+        footprint_import = self.import_repo.get_import(import_id, for_update=True)
+        if footprint_import is None or footprint_import.status in ("completed", "failed"):
+            self.db.rollback()
+            return True
+        if footprint_import.status == "pending":
+            footprint_import.status = "running"
+            footprint_import.started_at = datetime.utcnow()
+
+        try:
+            chunks = read_chunks(footprint_import.file_path, footprint_import.processed_rows, settings.IMPORT_CHUNK_SIZE)
+            for count, chunk in enumerate(chunks):
+                if max_chunks is not None and count >= max_chunks:
+                    chunks.close()
+                    self.db.commit()
+                    return False
+                self._import_chunk(footprint_import, chunk)
+                self.db.commit()
+                # Re-lock the import so a duplicate job run waits and then sees this progress
+                footprint_import = self.import_repo.get_import(import_id, for_update=True)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            # The file itself is unreadable; retrying won't help
+            self.db.rollback()
+            footprint_import = self.import_repo.get_import(import_id, for_update=True)
+            return self._finish(footprint_import, "failed", f"Could not read the CSV file: {e}")
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return self._finish(footprint_import, "completed")
+
+    def _import_chunk(self, footprint_import: FootprintImport, chunk: List[Tuple[int, Dict[str, str]]]) -> None:
+        """Validate, score and insert one chunk, and add it to the import's progress (caller commits)"""
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        errors: List[Dict[str, Any]] = []
+        for row_number, raw in chunk:
+            input_data, row_errors = validate_row(raw)
+            if row_errors:
+                errors.append({"row": row_number, "errors": row_errors})
+            else:
+                valid.append((row_number, input_data))
+
+        footprints = []
+        if valid:
+            predictor, degraded = degraded_mode.select(None, CarbonFootprintService._load_predictor)
+            predictions = predictor.predict_batch([input_data for _, input_data in valid])
+            confidence_score = Decimal(str(round(predictor.score, 4)))
+            for (row_number, input_data), prediction in zip(valid, predictions):
+                try:
+                    breakdown = self.carbon_service._calculate_breakdown(input_data, prediction)
+                except Exception as e:
+                    errors.append({"row": row_number, "errors": [f"Could not compute breakdown: {e}"]})
+                    continue
+                footprints.append(CarbonFootprintCreate(
+                    input_data=input_data,
+                    total_emissions=Decimal(str(prediction)),
+                    confidence_score=confidence_score,
+                    model_name=predictor.model_name,
+                    model_version=FALLBACK_MODEL_VERSION if degraded else "v3",
+                    electricity_emissions=Decimal(str(breakdown.get("electricity", 0))),
+                    transportation_emissions=Decimal(str(breakdown.get("transportation", 0))),
+                    heating_emissions=Decimal(str(breakdown.get("heating", 0))),
+                    waste_emissions=Decimal(str(breakdown.get("waste", 0))),
+                    lifestyle_emissions=Decimal(str(breakdown.get("lifestyle", 0))),
+                    other_emissions=Decimal(str(breakdown.get("other", 0))),
+                    user_agent="bulk-import"
+                ))
+
+        imported = self.footprint_repo.create_footprints_batch(
+            footprint_import.user_id, footprints, import_id=footprint_import.id
+        )
+        footprint_import.processed_rows += len(chunk)
+        footprint_import.imported_rows += imported
+        footprint_import.failed_rows += len(errors)
+        reported = list(footprint_import.errors or [])
+        room = settings.IMPORT_MAX_REPORTED_ERRORS - len(reported)
+        if room > 0 and errors:
+            # Assign a new list so the JSON column is seen as changed
+            footprint_import.errors = reported + sorted(errors, key=lambda error: error["row"])[:room]
+
+    def fail_import(self, import_id: int, error_message: str) -> None:
+        """Mark an unfinished import failed, keeping the rows imported so far"""
+        footprint_import = self.import_repo.get_import(import_id, for_update=True)
+        if footprint_import is None or footprint_import.status in ("completed", "failed"):
+            self.db.rollback()
+            return
+        self._finish(footprint_import, "failed", error_message)
+
+    def _finish(self, footprint_import: FootprintImport, status: str, error_message: Optional[str] = None) -> bool:
+        footprint_import.status = status
+        footprint_import.error_message = error_message
+        footprint_import.completed_at = datetime.utcnow()
+        self.db.commit()
+
+        # Uploads are removed once processed; files imported from elsewhere (the CLI) are left alone
+        file_path = os.path.abspath(footprint_import.file_path)
+        if os.path.dirname(file_path) == os.path.abspath(IMPORT_DIR) and os.path.exists(file_path):
+            os.remove(file_path)
+
+        audit_log.record(
+            "IMPORT_COMPLETED" if status == "completed" else "IMPORT_FAILED",
+            "footprint_imports", footprint_import.id, footprint_import.user_id,
+            new_values={
+                "imported_rows": footprint_import.imported_rows,
+                "failed_rows": footprint_import.failed_rows,
+                "error_message": error_message
+            }
+        )
+        return True
+
+
+def give_up_import_job(db, payload: Dict[str, Any], error: str) -> None:
+    FootprintImportService(db).fail_import(payload["import_id"], f"Import stopped after repeated errors: {error}")
+
+
+@job_handler("import_footprints", on_give_up=give_up_import_job)
+def run_import_job(db, payload: Dict[str, Any]) -> None:
+    """Import the next few chunks of a file, queueing another run until it is done"""
+    if not FootprintImportService(db).process_import(payload["import_id"], max_chunks=settings.IMPORT_CHUNKS_PER_JOB):
+        job_queue.enqueue("import_footprints", payload)
@@ -0,0 +1,114 @@
+"""
+Idempotency keys for requests that create records.
+
+A client sends the same `Idempotency-Key` header on every retry of one
+request. The first request with a key claims it by storing an "in progress"
+marker, runs, and replaces the marker with its response, which is kept for
+IDEMPOTENCY_TTL_SECONDS; retries get that stored response back instead of
+running again. Retries that arrive while the first request is still running
+wait for it, polling the marker, and get its response; if it hasn't finished
+within IDEMPOTENCY_WAIT_TIMEOUT_SECONDS they are refused (the API answers 409
+with Retry-After) rather than run a second time. Keys are scoped to the caller, and reusing a key with a different
+request body is rejected. Failed requests release their key, so they can be
+retried with the same key; a marker left by a worker that died mid-request
+expires after IDEMPOTENCY_IN_PROGRESS_TTL_SECONDS.
+
+Markers and responses live in a cache from create_cache; with the "sqlite"
+backend (the default) the claim is atomic across the workers on one host.
+"""
+import hashlib
+import json
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from ..config import settings
+from .cache import create_cache
+
+MAX_KEY_LENGTH = 255
+
+# Seconds a client is asked to wait before retrying a request that is still in progress
+IN_PROGRESS_RETRY_AFTER = 1
+
+# Seconds between checks of the marker while waiting on the first request
+POLL_INTERVAL = 0.05
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different body"""
+
+
+class IdempotencyKeyInProgress(Exception):
+    """The first request with this key hasn't finished yet"""
+
+    def __init__(self, key: str):
+        super().__init__(f"A request with Idempotency-Key '{key}' is still in progress")
+        self.retry_after = IN_PROGRESS_RETRY_AFTER
+
+
+def request_fingerprint(body: Dict[str, Any]) -> str:
+    """Stable hash of a request body, independent of key order"""
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Stores the response of the first request for each key and replays it to retries"""
+
+    def __init__(self, cache, in_progress_ttl: float, wait_timeout: float = 0.0):
+        self.cache = cache
+        self.in_progress_ttl = in_progress_ttl
+        self.wait_timeout = wait_timeout
+        self.replays = 0
+        self.conflicts = 0
+
+    def run(self, scope: str, key: str, fingerprint: str,
+            fn: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Return (response, replayed): the stored response for `key`, or the result of `fn`,
+        which must be JSON-serializable and is stored for later retries. While another
+        request holds the key this waits up to `wait_timeout` seconds for its response,
+        then raises IdempotencyKeyInProgress.
+        """
+        cache_key = f"{scope}:{key}"
+        marker = {"fingerprint": fingerprint, "status": "in_progress"}
+        deadline = time.monotonic() + self.wait_timeout
+        while not self.cache.add(cache_key, marker, ttl=self.in_progress_ttl):
+            entry = self.cache.get(cache_key)
+            if entry is None:
+                # Released or expired since the claim failed; try to claim it again
+                continue
+            if entry["fingerprint"] != fingerprint:
+                raise IdempotencyKeyReused(f"Idempotency-Key '{key}' was already used with a different request")
+            if entry["status"] != "done":
+                if time.monotonic() >= deadline:
+                    self.conflicts += 1
+                    raise IdempotencyKeyInProgress(key)
+                time.sleep(POLL_INTERVAL)
+                continue
+            self.replays += 1
+            return entry["response"], True
+
+        try:
+            response = fn()
+        except BaseException:
+            self.cache.delete(cache_key)
+            raise
+        self.cache.set(cache_key, {"fingerprint": fingerprint, "status": "done", "response": response})
+        return response, False
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.cache.stats(), replays=self.replays, conflicts=self.conflicts)
+
+
+idempotency_store = IdempotencyStore(
+    create_cache(
+        "idempotency",
+        settings.IDEMPOTENCY_CACHE_BACKEND,
+        settings.IDEMPOTENCY_MAX_ENTRIES,
+        settings.IDEMPOTENCY_TTL_SECONDS
+    ),
+    settings.IDEMPOTENCY_IN_PROGRESS_TTL_SECONDS,
+    settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS
+)
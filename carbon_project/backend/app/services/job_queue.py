@@ -0,0 +1,195 @@
+"""
+Durable local queue for work that doesn't have to finish before the response.
+
+Jobs are rows in a SQLite file (JOB_QUEUE_PATH), so they survive restarts and
+are shared by the worker processes on one host. Every process runs a worker
+task that claims due jobs, runs the handler registered for each job's kind
+with its own DB session, and deletes the job when the handler returns. A
+failing job is retried with exponential backoff and kept with status
+'failed' after JOB_MAX_ATTEMPTS; a handler registered with `on_give_up` is
+then called once, so it can record the failure where its users will see it.
+
+A claim is a lease: the job's available_at moves JOB_LEASE_SECONDS ahead, so
+a job whose worker died is picked up again. Handlers must therefore be
+idempotent.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import anyio.to_thread
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from .local_sqlite import LocalSQLite
+
+JobHandler = Callable[[Session, Dict[str, Any]], None]
+GiveUpHandler = Callable[[Session, Dict[str, Any], str], None]
+
+_handlers: Dict[str, JobHandler] = {}
+_give_up_handlers: Dict[str, GiveUpHandler] = {}
+
+
+def job_handler(kind: str, on_give_up: Optional[GiveUpHandler] = None) -> Callable[[JobHandler], JobHandler]:
+    """
+    Register `fn(db, payload)` as the handler for jobs of `kind`, and optionally
+    `on_give_up(db, payload, error)` to run when a job of that kind has failed for the last time
+    """
+    def register(fn: JobHandler) -> JobHandler:
+        _handlers[kind] = fn
+        if on_give_up is not None:
+            _give_up_handlers[kind] = on_give_up
+        return fn
+    return register
+
+
+class JobQueue:
+    """SQLite-backed job queue with leased claims and retries"""
+
+    def __init__(self, path: str, max_attempts: int = 5, lease_seconds: float = 60,
+                 retry_base_seconds: float = 1.0):
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self._lock = threading.Lock()
+        # Opened on first use in each process, so workers forked after import get their own
+        self._db = LocalSQLite(path, self._create_schema)
+        self.processed = 0
+        self.retried = 0
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (status, available_at)")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._db.connection()
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], delay: float = 0) -> int:
+        """Add a job; `payload` must be JSON-serializable"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, payload, available_at, created_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload), now + delay, now)
+            )
+        return cursor.lastrowid
+
+    def claim(self, limit: int) -> List[Tuple[int, str, Dict[str, Any], int]]:
+        """Lease up to `limit` due jobs; returns (id, kind, payload, attempt number)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, kind, payload, attempts FROM jobs "
+                    "WHERE status = 'pending' AND available_at <= ? ORDER BY id LIMIT ?",
+                    (now, limit)
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE jobs SET attempts = attempts + 1, available_at = ? WHERE id = ?",
+                        [(now + self.lease_seconds, row[0]) for row in rows]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(job_id, kind, json.loads(payload), attempts + 1) for job_id, kind, payload, attempts in rows]
+
+    def complete(self, job_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def fail(self, job_id: int, attempt: int, error: str) -> bool:
+        """Schedule a retry with exponential backoff, or park the job as failed; True if parked"""
+        with self._lock:
+            if attempt >= self.max_attempts:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', last_error = ? WHERE id = ?", (error, job_id)
+                )
+                return True
+            self.retried += 1
+            self._conn.execute(
+                "UPDATE jobs SET available_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + self.retry_base_seconds * 2 ** (attempt - 1), error, job_id)
+            )
+            return False
+
+    def run_pending(self, session_factory: Callable[[], Session], limit: int = 100) -> int:
+        """Run up to `limit` due jobs, each with its own session; returns the number claimed"""
+        jobs = self.claim(limit)
+        for job_id, kind, payload, attempt in jobs:
+            handler = _handlers.get(kind)
+            db = session_factory()
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler registered for job kind '{kind}'")
+                handler(db, payload)
+                self.complete(job_id)
+                self.processed += 1
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️  Job {job_id} ({kind}) failed on attempt {attempt}: {e}")
+                if self.fail(job_id, attempt, str(e)) and kind in _give_up_handlers:
+                    self._give_up(kind, db, payload, str(e))
+            finally:
+                db.close()
+        return len(jobs)
+
+    @staticmethod
+    def _give_up(kind: str, db: Session, payload: Dict[str, Any], error: str) -> None:
+        try:
+            _give_up_handlers[kind](db, payload, error)
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️  Give-up handler for {kind} failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "pending": counts.get("pending", 0),
+            "failed": counts.get("failed", 0),
+            "processed": self.processed,
+            "retried": self.retried
+        }
+
+
+async def run_job_worker(queue: JobQueue, session_factory: Callable[[], Session], interval: float,
+                         batch_size: int = 100) -> None:
+    """Drain due jobs forever, sleeping `interval` seconds whenever the queue is idle; cancel to stop"""
+    while True:
+        try:
+            claimed = await anyio.to_thread.run_sync(queue.run_pending, session_factory, batch_size)
+        except Exception as e:
+            print(f"⚠️  Job worker failed: {e}")
+            claimed = 0
+        if claimed < batch_size:
+            await asyncio.sleep(interval)
+
+
+job_queue = JobQueue(
+    settings.JOB_QUEUE_PATH,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    lease_seconds=settings.JOB_LEASE_SECONDS
+)
@@ -0,0 +1,46 @@
+"""
+Per-process SQLite connections for the host-local stores (caches, job queue).
+
+A SQLite connection must not be carried across fork(), and with gunicorn's
+preload_app the workers are forked from a master that has imported the app.
+LocalSQLite therefore opens its connection lazily, in the process that first
+uses it, and opens a fresh one when it finds itself in a forked child. The
+inherited connection is never touched again, not even closed: closing it could
+checkpoint or remove the WAL files the parent still has open.
+"""
+import os
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+# Connections inherited from a parent process, kept referenced so they are never finalized here
+_inherited: List[sqlite3.Connection] = []
+
+
+class LocalSQLite:
+    """A SQLite connection in WAL mode that is (re)opened in each process that uses it"""
+
+    def __init__(self, path: str, setup: Optional[Callable[[sqlite3.Connection], None]] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.setup = setup
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        if self._conn is not None and self._pid == pid:
+            return self._conn
+        with self._lock:
+            if self._conn is None or self._pid != pid:
+                if self._conn is not None:
+                    _inherited.append(self._conn)
+                conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                if self.setup:
+                    self.setup(conn)
+                self._conn, self._pid = conn, pid
+        return self._conn
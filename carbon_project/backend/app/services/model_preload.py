@@ -0,0 +1,79 @@
+"""
+Loading the emission model once in a pre-fork server's master process.
+
+With gunicorn.conf.py the master imports the app and calls preload_models()
+before spawning workers, so every worker starts with the model already in
+memory and shares its pages copy-on-write instead of loading its own copy;
+a respawned worker is ready as soon as it forks.
+
+Fork only copies the calling thread, so the master must not be running any
+thread pools when it forks: the estimator is pinned to a single thread (the
+workers already get their parallelism from running several requests at once)
+and any background threads left after the warm-up prediction are reported.
+"""
+import gc
+import threading
+from typing import Any, Callable, List
+
+from .degraded_mode import degraded_mode
+
+# Representative calculator input used to exercise the full preprocessing and prediction path
+WARMUP_INPUT = {
+    "household_size": 3,
+    "electricity_usage_kwh": 450.0,
+    "home_size_sqft": 1500.0,
+    "home_type": "Apartment",
+    "heating_energy_source": "Electric",
+    "cooling_energy_source": "Electric",
+    "vehicle_type": "petrol_sedan",
+    "fuel_type": "Petrol",
+    "climate_zone": "Moderate",
+    "meat_consumption": "Medium",
+    "cooking_method": "Gas",
+    "recycling_practice": "Sometimes",
+    "income_level": "Medium",
+    "location_type": "Urban",
+    "vehicle_monthly_distance_km": 500.0,
+    "vehicles_per_household": 1,
+    "monthly_grocery_bill": 15000.0,
+    "waste_per_person": 2.0,
+    "air_travel_hours": 10.0
+}
+
+
+def pin_single_thread(predictor: Any) -> None:
+    """Stop the estimator from starting OpenMP/joblib pools, which don't survive fork"""
+    estimator = getattr(predictor, "model", predictor)
+    if hasattr(estimator, "n_jobs") and hasattr(estimator, "set_params"):
+        estimator.set_params(n_jobs=1)
+
+
+def background_threads() -> List[str]:
+    """Names of threads other than the main thread; these would be missing in forked workers"""
+    return [thread.name for thread in threading.enumerate() if thread is not threading.main_thread()]
+
+
+def preload_models(loader: Callable[[], Any]) -> bool:
+    """Load, pin and warm the primary model in this process before workers are forked"""
+    predictor = degraded_mode.load_primary(loader)
+    degraded_mode.fallback  # Tiny, but saves every worker reading the JSON artifact
+    if predictor is None:
+        print("⚠️  ML model not loaded in the master; workers serve the fallback and retry periodically")
+        return False
+
+    pin_single_thread(predictor)
+    try:
+        predictor.predict_from_raw_inputs(dict(WARMUP_INPUT))
+    except Exception as e:
+        print(f"⚠️  Model warm-up prediction failed: {e}")
+
+    threads = background_threads()
+    if threads:
+        print(f"⚠️  Threads running before fork will not exist in workers: {', '.join(threads)}")
+
+    # Move everything loaded so far out of the collector's reach, so GC passes in the
+    # workers don't write to (and un-share) the model's pages
+    gc.collect()
+    gc.freeze()
+    print("✅ ML model preloaded for forked workers")
+    return True
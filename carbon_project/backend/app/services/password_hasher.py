@@ -0,0 +1,101 @@
+"""
+Process-wide bcrypt pool.
+
+All password hashing and verification runs on one executor per process,
+sized to the available cores (threads by default, or processes with
+PASSWORD_HASH_MODE=process). Admission is bounded: at most
+`workers + max_pending` calls may be running or queued, and a caller that
+cannot get a slot within `queue_timeout` seconds gets PasswordHasherBusy
+instead of piling more work onto an overloaded worker.
+"""
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import bcrypt
+
+from ..config import settings
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full; callers should shed the request"""
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+class PasswordHasher:
+    """Bounded bcrypt executor shared by every AuthService in the process"""
+
+    def __init__(self, workers: int, mode: str = "thread", max_pending: int = 0,
+                 queue_timeout: float = 0.0, rounds: int = 10):
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.max_pending = max(0, max_pending)
+        self.queue_timeout = queue_timeout
+        self.rounds = rounds
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        # Created on first use so importing the module (or forking workers) doesn't start pools
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._executor
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` on the pool, waiting for a queue slot for at most queue_timeout seconds"""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+        with self._lock:
+            self._active += 1
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self.run(_hash, password, self.rounds)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self.run(_verify, password, hashed)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._active,
+            "rejected": self.rejected
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1,
+    mode=settings.PASSWORD_HASH_MODE,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS
+)
@@ -0,0 +1,208 @@
+"""
+Rate limiting primitives.
+
+TokenBucketStore holds per-client token buckets for the request rate limiter,
+split into independently locked shards that each evict least recently used
+buckets, so memory stays bounded however many clients are seen.
+
+SlidingWindowStore is the interface for attempt counters keyed by e.g. email or
+client IP; InMemorySlidingWindowStore is the default, a bounded LRU of sliding
+window counters (two fixed windows weighted by overlap, so each key costs a
+few numbers regardless of how many attempts it sees). A store shared between
+workers only needs to implement `hit` and `reset`.
+
+resolve_client_ip() gives the address both limiters key clients by: the
+connecting peer, or the X-Forwarded-For client when the peer is one of
+TRUSTED_PROXIES.
+"""
+import ipaddress
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from ..config import settings
+
+_Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+@lru_cache(maxsize=8)
+def _proxy_networks(proxies: Tuple[str, ...]) -> Tuple[_Network, ...]:
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def _is_trusted(address: str, networks: Tuple[_Network, ...]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def resolve_client_ip(peer: Optional[str], forwarded_for: Optional[str],
+                      trusted_proxies: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    The client's address: the connecting peer, unless it is a trusted proxy, in which case the
+    right-most X-Forwarded-For entry that isn't one (entries further left are client-supplied)
+    """
+    networks = _proxy_networks(tuple(settings.TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies))
+    if not peer or not forwarded_for or not _is_trusted(peer, networks):
+        return peer
+    for address in reversed([entry.strip() for entry in forwarded_for.split(",") if entry.strip()]):
+        if not _is_trusted(address, networks):
+            return address
+    return peer
+
+
+class SlidingWindowStore(ABC):
+    """Interface for sliding-window attempt counters"""
+
+    @abstractmethod
+    def hit(self, key: str, limit: int, window: float) -> float:
+        """Record an attempt; return 0 if allowed, else seconds until the next attempt may succeed"""
+
+    @abstractmethod
+    def reset(self, key: str) -> None:
+        """Forget all attempts recorded for `key`"""
+
+
+class InMemorySlidingWindowStore(SlidingWindowStore):
+    """Process-local sliding window counters with LRU eviction beyond max_keys"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> [current window start, current count, previous window count]
+        self._counters: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, window: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = [now, 0, 0]
+                self._counters[key] = counter
+                while len(self._counters) > self.max_keys:
+                    self._counters.popitem(last=False)
+            else:
+                self._counters.move_to_end(key)
+
+            start, current, previous = counter
+            elapsed_windows = int((now - start) // window)
+            if elapsed_windows:
+                previous = current if elapsed_windows == 1 else 0
+                current = 0
+                start += elapsed_windows * window
+
+            overlap = 1 - (now - start) / window
+            estimate = previous * overlap + current
+            if estimate >= limit:
+                counter[:] = [start, current, previous]
+                # Earliest moment the weighted previous window has decayed enough, or the window rolls over
+                if previous and current < limit:
+                    wait = (1 - (limit - current) / previous) * window - (now - start)
+                else:
+                    wait = window - (now - start)
+                return max(wait, 0.001)
+
+            counter[:] = [start, current + 1, previous]
+            return 0.0
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+
+class TokenBucketStore:
+    """Sharded token buckets with per-shard LRU eviction"""
+
+    def __init__(self, shards: int = 16, max_keys: int = 100000):
+        self._shards = [OrderedDict() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._max_keys_per_shard = max(1, max_keys // shards)
+        self.rejected = 0
+
+    def take(self, key: str, cost: float, rate_per_second: float, capacity: float) -> float:
+        """Spend `cost` tokens from the key's bucket; return 0 if allowed, else seconds until it can be"""
+        index = hash(key) % len(self._shards)
+        buckets = self._shards[index]
+        now = time.monotonic()
+        with self._locks[index]:
+            bucket = buckets.get(key)
+            if bucket is None:
+                # bucket = [tokens, last refill]
+                bucket = [capacity, now]
+                buckets[key] = bucket
+                while len(buckets) > self._max_keys_per_shard:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate_per_second)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            self.rejected += 1
+            return (cost - bucket[0]) / rate_per_second
+
+    def clear(self) -> None:
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                shard.clear()
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+class LoginThrottle:
+    """Limits login attempts per email and per client IP before any lookup or hashing"""
+
+    def __init__(self, store: SlidingWindowStore, email_limit: int, ip_limit: int, window: float):
+        self.store = store
+        self.email_limit = email_limit
+        self.ip_limit = ip_limit
+        self.window = window
+        self.rejected = 0
+
+    @staticmethod
+    def _email_key(email: str) -> str:
+        return f"login:email:{email.strip().lower()}"
+
+    def check(self, email: str, ip_address: Optional[str]) -> float:
+        """Count an attempt; return 0 if allowed, else the Retry-After in seconds"""
+        keys: List[Tuple[str, int]] = [(self._email_key(email), self.email_limit)]
+        if ip_address:
+            keys.append((f"login:ip:{ip_address}", self.ip_limit))
+
+        retry_after = max(self.store.hit(key, limit, self.window) for key, limit in keys)
+        if retry_after:
+            self.rejected += 1
+        return retry_after
+
+    def succeeded(self, email: str) -> None:
+        """A successful login clears the email's counter (the IP counter keeps running)"""
+        self.store.reset(self._email_key(email))
+
+    def stats(self) -> Dict[str, int]:
+        return {"rejected": self.rejected}
+
+
+login_throttle = LoginThrottle(
+    InMemorySlidingWindowStore(settings.LOGIN_THROTTLE_MAX_KEYS),
+    email_limit=settings.LOGIN_ATTEMPTS_PER_EMAIL,
+    ip_limit=settings.LOGIN_ATTEMPTS_PER_IP,
+    window=settings.LOGIN_THROTTLE_WINDOW_SECONDS
+)
+
+# Buckets used by RateLimitMiddleware for every HTTP request
+request_buckets = TokenBucketStore(max_keys=settings.RATE_LIMIT_MAX_CLIENTS)
@@ -0,0 +1,35 @@
+"""
+Background sweeper that deletes expired user sessions on an interval.
+
+Every worker process runs one; the random jitter added to each sleep keeps
+workers started together from sweeping at the same moment.
+"""
+import asyncio
+import random
+
+import anyio.to_thread
+
+from ..config import settings
+from ..database.connection import SessionLocal
+from ..repositories.user_repository import UserSessionRepository
+
+
+def sweep_expired_sessions() -> int:
+    """Delete expired sessions in batches using a dedicated DB session"""
+    db = SessionLocal()
+    try:
+        return UserSessionRepository(db).cleanup_expired_sessions(settings.SESSION_CLEANUP_BATCH_SIZE)
+    finally:
+        db.close()
+
+
+async def run_session_sweeper(interval: float, jitter: float) -> None:
+    """Sweep forever, sleeping interval ± jitter seconds between sweeps; cancel to stop"""
+    while True:
+        await asyncio.sleep(max(1.0, interval + random.uniform(-jitter, jitter)))
+        try:
+            count = await anyio.to_thread.run_sync(sweep_expired_sessions)
+            if count:
+                print(f"🧹 Removed {count} expired sessions")
+        except Exception as e:
+            print(f"⚠️  Session sweep failed: {e}")
@@ -0,0 +1,159 @@
+"""
+Stateless signed session tokens.
+
+In SESSION_TOKEN_MODE=signed a session token is `<payload>.<signature>`: a
+base64url JSON payload (session id, user, expiry) and an HMAC of it keyed by
+SECRET_KEY, so it can be verified without touching the database. Logouts are
+recorded by setting user_sessions.revoked_at; each process keeps a small
+revocation filter of revoked, unexpired session ids that it refreshes from
+that column every SESSION_REVOCATION_SYNC_SECONDS.
+
+Because signed claims are trusted without a lookup, the app refuses to start
+in signed mode while SECRET_KEY is the shipped default or shorter than
+MIN_SIGNING_KEY_LENGTH (see check_signing_key), and tokens are neither issued
+nor accepted outside signed mode or with such a key.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from ..config import settings
+
+_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+DEFAULT_SECRET_KEY = "your-super-secret-jwt-key-change-in-production"
+MIN_SIGNING_KEY_LENGTH = 32
+
+# Revocations are re-read with this much overlap to cover clock skew between workers
+_SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def utc_timestamp(value: datetime) -> float:
+    """Epoch seconds for a naive UTC datetime (as stored in user_sessions)"""
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+def _signature(payload: str) -> str:
+    digest = _DIGESTS.get(settings.ALGORITHM.upper(), hashlib.sha256)
+    return _b64encode(hmac.new(settings.SECRET_KEY.encode("utf-8"), payload.encode("ascii"), digest).digest())
+
+
+def signing_key_is_weak() -> bool:
+    """True if SECRET_KEY is the shipped default or short enough to brute-force"""
+    return settings.SECRET_KEY == DEFAULT_SECRET_KEY or len(settings.SECRET_KEY) < MIN_SIGNING_KEY_LENGTH
+
+
+def _require_signing_key() -> None:
+    if signing_key_is_weak():
+        raise RuntimeError(
+            "SESSION_TOKEN_MODE=signed needs a private SECRET_KEY of at least "
+            f"{MIN_SIGNING_KEY_LENGTH} characters; set one or use SESSION_TOKEN_MODE=opaque"
+        )
+
+
+def check_signing_key() -> None:
+    """Raise if signed mode is enabled with a key anyone could know or brute-force"""
+    if settings.SESSION_TOKEN_MODE == "signed":
+        _require_signing_key()
+
+
+def is_signed_token(token: str) -> bool:
+    """Opaque tokens are URL-safe random strings without a '.'"""
+    return "." in token
+
+
+def sign_session_token(session_id: int, user: Dict[str, Any], expires_at: datetime) -> str:
+    """Issue a signed token for a user_sessions row; `user` is the JSON-encoded UserResponse"""
+    _require_signing_key()
+    claims = {"sid": session_id, "exp": int(utc_timestamp(expires_at)), "user": user}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_signature(payload)}"
+
+
+def verify_session_token(token: str, verify_expiry: bool = True) -> Optional[Dict[str, Any]]:
+    """Return the token's claims if the signature is valid (and it hasn't expired), else None"""
+    if settings.SESSION_TOKEN_MODE != "signed" or signing_key_is_weak():
+        # Fail closed: never trust a signature made with a key that may be public
+        return None
+    try:
+        payload, signature = token.split(".", 1)
+        if not hmac.compare_digest(signature, _signature(payload)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, UnicodeError):
+        return None
+    if verify_expiry and claims.get("exp", 0) <= time.time():
+        return None
+    return claims
+
+
+class RevocationFilter:
+    """Revoked, not yet expired session ids, kept in sync with user_sessions.revoked_at"""
+
+    def __init__(self, sync_interval: float):
+        self.sync_interval = sync_interval
+        self._revoked: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at: Optional[float] = None
+        self._watermark: Optional[datetime] = None
+
+    def revoke(self, session_id: int, expires_at: float) -> None:
+        with self._lock:
+            self._revoked[session_id] = expires_at
+
+    def is_revoked(self, session_id: int) -> bool:
+        return session_id in self._revoked
+
+    def needs_sync(self) -> bool:
+        return self._synced_at is None or time.monotonic() - self._synced_at >= self.sync_interval
+
+    def sync(self, load_revocations) -> None:
+        """
+        Pull revocations recorded since the last sync. `load_revocations(since)` returns
+        (session id, expires_at) pairs; only one thread syncs at a time, others keep serving.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            started = datetime.utcnow()
+            rows: Iterable[Tuple[int, datetime]] = load_revocations(self._watermark)
+            now = time.time()
+            with self._lock:
+                for session_id, expires_at in rows:
+                    self._revoked[session_id] = utc_timestamp(expires_at)
+                for session_id in [sid for sid, exp in self._revoked.items() if exp <= now]:
+                    del self._revoked[session_id]
+            self._watermark = started - _SYNC_OVERLAP
+            self._synced_at = time.monotonic()
+        finally:
+            self._sync_lock.release()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._revoked.clear()
+            self._synced_at = None
+            self._watermark = None
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+
+revocation_filter = RevocationFilter(settings.SESSION_REVOCATION_SYNC_SECONDS)
@@ -0,0 +1,85 @@
+"""
+Single-flight coalescing for identical concurrent reads.
+
+The first caller for a key (the leader) runs the computation; callers that
+arrive with the same key while it is in flight wait for the leader and
+receive the same result or exception instead of repeating the work.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """An in-flight computation shared by every caller with the same key"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution"""
+
+    def __init__(self, default_timeout: Optional[float] = None):
+        self.default_timeout = default_timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run `fn` once for all concurrent callers of `key`.
+        Followers that wait longer than `timeout` seconds stop waiting and run `fn` themselves.
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+                self.executions += 1
+            else:
+                call.waiters += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self.timeouts += 1
+                    self.executions += 1
+                print(f"⚠️ Single-flight wait timed out for {key!r}, computing independently")
+                return fn()
+            with self._lock:
+                self.coalesced += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "errors": self.errors
+            }
@@ -44,12 +44,14 @@ CREATE TABLE carbon_footprints (
     ip_address VARCHAR(45),
     user_agent TEXT,
     is_anonymous BOOLEAN DEFAULT FALSE,
+    import_id INT NULL, -- footprint_imports.id for households scored by a bulk import
     
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     INDEX idx_user_id (user_id),
+    INDEX idx_import_id (import_id),
     INDEX idx_calculation_date (calculation_date),
     INDEX idx_total_emissions (total_emissions),
     INDEX idx_calculation_uuid (calculation_uuid)
@@ -103,16 +105,22 @@ CREATE TABLE user_sessions (
     session_token VARCHAR(255) UNIQUE NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMP NULL,
     
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     INDEX idx_user_id (user_id),
     INDEX idx_session_token (session_token),
-    INDEX idx_expires_at (expires_at)
+    INDEX idx_expires_at (expires_at),
+    INDEX idx_revoked_at (revoked_at)
 );
 
 -- Audit log for tracking changes
+-- Written in batches by the application (app/services/audit_log.py), except user updates
+-- (users_audit_update below), and partitioned by month so old months can be dropped instead
+-- of deleted row by row; partitioned tables can't have foreign keys, so user_id is not constrained.
+-- scripts/migrate_database.py --audit-partitions adds the partitions for upcoming months.
 CREATE TABLE audit_logs (
-    id INT PRIMARY KEY AUTO_INCREMENT,
+    id INT NOT NULL AUTO_INCREMENT,
     user_id INT,
     action VARCHAR(100) NOT NULL,
     table_name VARCHAR(100) NOT NULL,
@@ -121,13 +129,19 @@ CREATE TABLE audit_logs (
     new_values JSON,
     ip_address VARCHAR(45),
     user_agent TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     
-    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+    PRIMARY KEY (id, created_at),
     INDEX idx_user_id (user_id),
     INDEX idx_action (action),
     INDEX idx_table_name (table_name),
     INDEX idx_created_at (created_at)
+)
+PARTITION BY RANGE COLUMNS(created_at) (
+    PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+    PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
 );
 
 -- System configuration
@@ -144,6 +158,51 @@ CREATE TABLE system_config (
     INDEX idx_is_active (is_active)
 );
 
+-- Per-user emission rollups (maintained with carbon_footprints writes)
+CREATE TABLE user_footprint_rollups (
+    user_id INT PRIMARY KEY,
+    calculation_count INT NOT NULL DEFAULT 0,
+    emissions_sum DECIMAL(18,2) NOT NULL DEFAULT 0,
+    emissions_sum_squares DECIMAL(30,4) NOT NULL DEFAULT 0,
+    min_emissions DECIMAL(10,2),
+    max_emissions DECIMAL(10,2),
+    latest_footprint_id INT,
+    latest_calculation_date TIMESTAMP NULL,
+    latest_emissions DECIMAL(10,2),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE user_footprint_rollup_buckets (
+    user_id INT NOT NULL,
+    bucket_type VARCHAR(10) NOT NULL,
+    bucket_start DATE NOT NULL,
+    calculation_count INT NOT NULL DEFAULT 0,
+    emissions_sum DECIMAL(18,2) NOT NULL DEFAULT 0,
+    
+    PRIMARY KEY (user_id, bucket_type, bucket_start)
+);
+
+-- Bulk CSV imports of household calculations (app/services/footprint_import.py)
+CREATE TABLE footprint_imports (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    import_uuid VARCHAR(36) UNIQUE NOT NULL,
+    user_id INT NOT NULL,
+    filename VARCHAR(255),
+    file_path VARCHAR(500) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    processed_rows INT NOT NULL DEFAULT 0,
+    imported_rows INT NOT NULL DEFAULT 0,
+    failed_rows INT NOT NULL DEFAULT 0,
+    errors JSON,
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP NULL,
+    completed_at TIMESTAMP NULL,
+    
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_user_id (user_id)
+);
+
 -- Insert default system configuration
 INSERT INTO system_config (config_key, config_value, description) VALUES
 ('app_version', '1.0.0', 'Current application version'),
@@ -240,17 +299,10 @@ END //
 
 DELIMITER ;
 
--- Create triggers for audit logging
+-- Audit trigger for user updates (profile or is_active changes); the app records
+-- registrations, logins and calculations itself
 DELIMITER //
 
-CREATE TRIGGER users_audit_insert
-AFTER INSERT ON users
-FOR EACH ROW
-BEGIN
-    INSERT INTO audit_logs (user_id, action, table_name, record_id, new_values, created_at)
-    VALUES (NEW.id, 'INSERT', 'users', NEW.id, JSON_OBJECT('email', NEW.email, 'name', NEW.name), NOW());
-END //
-
 CREATE TRIGGER users_audit_update
 AFTER UPDATE ON users
 FOR EACH ROW
@@ -262,15 +314,6 @@ BEGIN
             NOW());
 END //
 
-CREATE TRIGGER carbon_footprints_audit_insert
-AFTER INSERT ON carbon_footprints
-FOR EACH ROW
-BEGIN
-    INSERT INTO audit_logs (user_id, action, table_name, record_id, new_values, created_at)
-    VALUES (NEW.user_id, 'INSERT', 'carbon_footprints', NEW.id, 
-            JSON_OBJECT('total_emissions', NEW.total_emissions, 'calculation_date', NEW.calculation_date), NOW());
-END //
-
 DELIMITER ;
 
 -- Create indexes for performance optimization
@@ -279,6 +322,10 @@ CREATE INDEX idx_carbon_footprints_emissions ON carbon_footprints(total_emission
 CREATE INDEX idx_recommendations_priority ON recommendations(priority, category);
 CREATE INDEX idx_user_goals_target_date ON user_goals(user_id, target_date, is_achieved);
 CREATE INDEX idx_audit_logs_user_action ON audit_logs(user_id, action, created_at);
+CREATE INDEX ix_carbon_footprints_user_date ON carbon_footprints(user_id, calculation_date DESC, id DESC);
+CREATE INDEX ix_recommendations_footprint_priority_created ON recommendations(carbon_footprint_id, priority, created_at);
+CREATE INDEX ix_user_goals_user_achieved_target ON user_goals(user_id, is_achieved, target_date);
+CREATE INDEX ix_user_goals_user_target ON user_goals(user_id, target_date DESC, id DESC);
 
 -- Grant permissions (adjust as needed for your setup)
 -- GRANT ALL PRIVILEGES ON carbon_footprint_db.* TO 'carbon_app_user'@'localhost' IDENTIFIED BY 'secure_password';
@@ -0,0 +1,36 @@
+"""
+gunicorn configuration for multi-worker deployments:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported and the ML model loaded and warmed once in the master
+(preload_app), then workers are forked and share the model's memory
+copy-on-write. Worker count comes from WEB_CONCURRENCY (default: one per core).
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported and before the first worker is forked"""
+    from app.main import load_predictor
+    from app.services.model_preload import preload_models
+    
+    preload_models(load_predictor)
+
+
+def post_fork(server, worker):
+    """
+    Drop database connections inherited from the master; each worker opens its own.
+    The SQLite-backed job queue and caches reopen theirs by themselves (see local_sqlite).
+    """
+    from app.database.connection import engine
+    
+    engine.dispose(close=False)
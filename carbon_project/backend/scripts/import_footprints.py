@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Import a CSV of households for a user, the same way POST /carbon-footprint/import does,
+but in this process and with progress printed as chunks are committed
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.connection import SessionLocal, create_tables
+from app.services.footprint_import import FootprintImportService
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import household calculations from CSV")
+    parser.add_argument("csv_path", nargs="?", help="CSV file with one household per row (calculate request columns)")
+    parser.add_argument("--user-id", type=int, required=True, help="User the calculations are saved for")
+    parser.add_argument("--resume", metavar="IMPORT_UUID", help="Continue an import that was interrupted")
+    args = parser.parse_args()
+    if not args.csv_path and not args.resume:
+        parser.error("a CSV file or --resume is required")
+
+    print("📥 Importing household calculations")
+    print("=" * 50)
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        import_service = FootprintImportService(db)
+        if args.resume:
+            footprint_import = import_service.get_import(args.user_id, args.resume)
+            if footprint_import is None:
+                print(f"❌ Import {args.resume} not found for user {args.user_id}")
+                return False
+        else:
+            footprint_import = import_service.create_import(
+                args.user_id, os.path.basename(args.csv_path), os.path.abspath(args.csv_path)
+            )
+        print(f"🆔 Import {footprint_import.import_uuid}")
+
+        import_id = footprint_import.id
+        while not import_service.process_import(import_id, max_chunks=1):
+            footprint_import = import_service.import_repo.get_import(import_id)
+            print(f"   → {footprint_import.processed_rows} rows processed "
+                  f"({footprint_import.imported_rows} imported, {footprint_import.failed_rows} failed)")
+
+        footprint_import = import_service.import_repo.get_import(import_id)
+        for error in footprint_import.errors or []:
+            print(f"   ⚠️  Row {error['row']}: {'; '.join(error['errors'])}")
+        if footprint_import.failed_rows > len(footprint_import.errors or []):
+            print(f"   ⚠️  ... {footprint_import.failed_rows - len(footprint_import.errors)} more rows failed")
+
+        if footprint_import.status != "completed":
+            print(f"❌ Import failed: {footprint_import.error_message}")
+            return False
+        print(f"✅ Imported {footprint_import.imported_rows} of {footprint_import.processed_rows} rows")
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error importing calculations: {e}")
+        return False
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
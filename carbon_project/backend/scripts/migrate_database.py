@@ -5,6 +5,7 @@ Database migration script for Carbon Footprint Application
 
 import os
 import sys
+import time
 import pymysql
 from datetime import datetime
 
@@ -234,6 +235,277 @@ def backup_database():
     except Exception as e:
         print(f"❌ Error creating backup: {e}")
 
+def get_composite_indexes():
+    """Composite indexes declared on the models, as (table, index name, CREATE INDEX statement)"""
+    from sqlalchemy.dialects import mysql
+    from sqlalchemy.schema import CreateIndex
+    from app.models.carbon_footprint import CarbonFootprint, Recommendation, UserGoal
+    
+    indexes = []
+    for model in (CarbonFootprint, Recommendation, UserGoal):
+        for index in sorted(model.__table__.indexes, key=lambda i: i.name):
+            if len(index.expressions) > 1:
+                ddl = str(CreateIndex(index).compile(dialect=mysql.dialect()))
+                indexes.append((model.__tablename__, index.name, ddl))
+    return indexes
+
+def create_composite_indexes(lock_wait_timeout=5, max_attempts=5, pause_seconds=10):
+    """
+    Build the models' composite indexes online, one index per DDL statement.
+    
+    MySQL builds them with ALGORITHM=INPLACE, LOCK=NONE so reads and writes continue
+    during the build; TiDB's ADD INDEX is online by default. The short lock_wait_timeout
+    keeps the brief metadata lock from queueing behind long transactions (which would
+    block every other query on the table); on timeout the statement is retried with
+    backoff. pause_seconds between indexes lets replicas catch up.
+    """
+    try:
+        connection = get_database_connection()
+        
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT VERSION()")
+            is_tidb = "tidb" in cursor.fetchone()[0].lower()
+            cursor.execute("SET SESSION lock_wait_timeout = %s", (lock_wait_timeout,))
+            
+            pending = []
+            for table_name, index_name, ddl in get_composite_indexes():
+                cursor.execute("""
+                    SELECT COUNT(*) FROM information_schema.statistics
+                    WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+                """, (table_name, index_name))
+                if cursor.fetchone()[0]:
+                    print(f"✅ {index_name} already exists")
+                else:
+                    pending.append((index_name, ddl))
+            
+            for position, (index_name, ddl) in enumerate(pending):
+                statement = ddl if is_tidb else f"{ddl} ALGORITHM=INPLACE LOCK=NONE"
+                for attempt in range(1, max_attempts + 1):
+                    try:
+                        print(f"🔨 Building {index_name} (attempt {attempt})...")
+                        started = time.time()
+                        cursor.execute(statement)
+                        print(f"✅ {index_name} built in {time.time() - started:.1f}s")
+                        break
+                    except pymysql.err.OperationalError as e:
+                        # 1205: lock wait timeout - another transaction holds the metadata lock
+                        if e.args[0] != 1205 or attempt == max_attempts:
+                            raise
+                        backoff = 2 ** attempt
+                        print(f"⏳ Metadata lock busy, retrying {index_name} in {backoff}s")
+                        time.sleep(backoff)
+                
+                if position < len(pending) - 1:
+                    time.sleep(pause_seconds)
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error creating indexes: {e}")
+        return False
+    finally:
+        if 'connection' in locals():
+            connection.close()
+
+def add_session_revocation_column():
+    """Add user_sessions.revoked_at (used by signed session tokens) if it is missing"""
+    try:
+        connection = get_database_connection()
+        
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT COUNT(*) FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'user_sessions' AND column_name = 'revoked_at'
+            """)
+            if cursor.fetchone()[0]:
+                print("✅ user_sessions.revoked_at already exists")
+                return True
+            
+            print("🔨 Adding user_sessions.revoked_at...")
+            cursor.execute("ALTER TABLE user_sessions ADD COLUMN revoked_at TIMESTAMP NULL")
+            cursor.execute("CREATE INDEX idx_revoked_at ON user_sessions (revoked_at)")
+            print("✅ user_sessions.revoked_at added")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error adding revoked_at column: {e}")
+        return False
+    finally:
+        if 'connection' in locals():
+            connection.close()
+
+def add_session_expiry_index():
+    """Index user_sessions.expires_at (used by the expired-session sweep) online if it isn't indexed"""
+    try:
+        connection = get_database_connection()
+        
+        with connection.cursor() as cursor:
+            # schema.sql names it idx_expires_at, tables created from the models ix_user_sessions_expires_at
+            cursor.execute("""
+                SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE() AND table_name = 'user_sessions'
+                AND column_name = 'expires_at' AND seq_in_index = 1
+            """)
+            if cursor.fetchone()[0]:
+                print("✅ user_sessions.expires_at is already indexed")
+                return True
+            
+            cursor.execute("SELECT VERSION()")
+            is_tidb = "tidb" in cursor.fetchone()[0].lower()
+            print("🔨 Indexing user_sessions.expires_at...")
+            statement = "CREATE INDEX ix_user_sessions_expires_at ON user_sessions (expires_at)"
+            cursor.execute(statement if is_tidb else f"{statement} ALGORITHM=INPLACE LOCK=NONE")
+            print("✅ user_sessions.expires_at indexed")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error indexing expires_at: {e}")
+        return False
+    finally:
+        if 'connection' in locals():
+            connection.close()
+
+def add_footprint_import_column():
+    """Add carbon_footprints.import_id (marks bulk-imported households) if it is missing"""
+    try:
+        connection = get_database_connection()
+        
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT COUNT(*) FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'carbon_footprints' AND column_name = 'import_id'
+            """)
+            if cursor.fetchone()[0]:
+                print("✅ carbon_footprints.import_id already exists")
+                return True
+            
+            print("🔨 Adding carbon_footprints.import_id...")
+            cursor.execute("ALTER TABLE carbon_footprints ADD COLUMN import_id INT NULL")
+            cursor.execute("CREATE INDEX idx_import_id ON carbon_footprints (import_id)")
+            print("✅ carbon_footprints.import_id added")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error adding import_id column: {e}")
+        return False
+    finally:
+        if 'connection' in locals():
+            connection.close()
+
+def update_audit_triggers():
+    """
+    Drop the per-row audit triggers for events the app now records in batches (registrations
+    and calculations), and keep users_audit_update, as no app code audits user updates
+    """
+    try:
+        connection = get_database_connection()
+        
+        with connection.cursor() as cursor:
+            for trigger in ("users_audit_insert", "carbon_footprints_audit_insert"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            print("✅ Insert audit triggers removed")
+            
+            cursor.execute("""
+                SELECT COUNT(*) FROM information_schema.triggers
+                WHERE trigger_schema = DATABASE() AND trigger_name = 'users_audit_update'
+            """)
+            if not cursor.fetchone()[0]:
+                cursor.execute("""
+                    CREATE TRIGGER users_audit_update
+                    AFTER UPDATE ON users
+                    FOR EACH ROW
+                    INSERT INTO audit_logs (user_id, action, table_name, record_id, old_values, new_values, created_at)
+                    VALUES (NEW.id, 'UPDATE', 'users', NEW.id,
+                            JSON_OBJECT('email', OLD.email, 'name', OLD.name),
+                            JSON_OBJECT('email', NEW.email, 'name', NEW.name),
+                            NOW())
+                """)
+                print("✅ users_audit_update trigger restored")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error updating audit triggers: {e}")
+        return False
+    finally:
+        if 'connection' in locals():
+            connection.close()
+
+def _month_start(year, month):
+    """First day of a month, with month allowed to run past 12"""
+    return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+def _audit_partition_clauses(first, months):
+    """PARTITION clauses for `months` monthly partitions starting at the month of `first`"""
+    clauses = []
+    for offset in range(months):
+        start = _month_start(first.year, first.month + offset)
+        end = _month_start(start.year, start.month + 1)
+        clauses.append(f"PARTITION p{start:%Y%m} VALUES LESS THAN ('{end:%Y-%m-%d}')")
+    return clauses
+
+def ensure_audit_partitions(months_ahead=3):
+    """Partition audit_logs by month, and keep partitions for the next `months_ahead` months"""
+    try:
+        connection = get_database_connection()
+        
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT partition_name FROM information_schema.partitions
+                WHERE table_schema = DATABASE() AND table_name = 'audit_logs' AND partition_name IS NOT NULL
+                ORDER BY partition_ordinal_position
+            """)
+            partitions = [row[0] for row in cursor.fetchall()]
+            today = datetime.now()
+            
+            if not partitions:
+                print("🔨 Partitioning audit_logs by month (this rebuilds the table)...")
+                cursor.execute("""
+                    SELECT constraint_name FROM information_schema.referential_constraints
+                    WHERE constraint_schema = DATABASE() AND table_name = 'audit_logs'
+                """)
+                for (constraint_name,) in cursor.fetchall():
+                    cursor.execute(f"ALTER TABLE audit_logs DROP FOREIGN KEY {constraint_name}")
+                cursor.execute("UPDATE audit_logs SET created_at = NOW() WHERE created_at IS NULL")
+                cursor.execute("ALTER TABLE audit_logs MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP")
+                cursor.execute("ALTER TABLE audit_logs DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+                
+                cursor.execute("SELECT MIN(created_at) FROM audit_logs")
+                oldest = cursor.fetchone()[0] or today
+                months = (today.year - oldest.year) * 12 + today.month - oldest.month + months_ahead + 1
+                clauses = _audit_partition_clauses(oldest, months)
+                clauses.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+                cursor.execute(f"ALTER TABLE audit_logs PARTITION BY RANGE COLUMNS(created_at) ({', '.join(clauses)})")
+                connection.commit()
+                print(f"✅ audit_logs partitioned into {len(clauses)} partitions")
+                return True
+            
+            # Split the catch-all partition to add the months that don't have one yet
+            missing = [
+                clause for clause in _audit_partition_clauses(today, months_ahead + 1)
+                if clause.split()[1] not in partitions
+            ]
+            if not missing:
+                print("✅ audit_logs partitions are up to date")
+                return True
+            
+            missing.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+            cursor.execute(f"ALTER TABLE audit_logs REORGANIZE PARTITION pmax INTO ({', '.join(missing)})")
+            connection.commit()
+            print(f"✅ Added {len(missing) - 1} audit_logs partitions")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error partitioning audit_logs: {e}")
+        return False
+    finally:
+        if 'connection' in locals():
+            connection.close()
+
 def main():
     """Main migration function"""
     print("🔧 Carbon Footprint Database Migration Tool")
@@ -259,14 +531,32 @@ def main():
     print("\n4. Getting user statistics...")
     get_user_stats()
     
+    # Add columns the current models expect
+    print("\n5. Schema updates...")
+    if not add_session_revocation_column() or not add_session_expiry_index() or not add_footprint_import_column():
+        return False
+    
+    # Ask for audit log migration (rebuilds audit_logs and drops its foreign keys)
+    print("\n6. Audit log options...")
+    audit_choice = input("Do you want to partition audit_logs by month and drop the insert audit triggers? (y/n): ").lower()
+    if audit_choice == 'y':
+        if not update_audit_triggers() or not ensure_audit_partitions():
+            return False
+    
+    # Ask for index migration
+    print("\n7. Index options...")
+    index_choice = input("Do you want to build missing composite indexes online? (y/n): ").lower()
+    if index_choice == 'y':
+        create_composite_indexes()
+    
     # Ask for cleanup
-    print("\n5. Cleanup options...")
+    print("\n8. Cleanup options...")
     cleanup_choice = input("Do you want to clean up old data? (y/n): ").lower()
     if cleanup_choice == 'y':
         cleanup_old_data()
     
     # Ask for backup
-    print("\n6. Backup options...")
+    print("\n9. Backup options...")
     backup_choice = input("Do you want to create a backup? (y/n): ").lower()
     if backup_choice == 'y':
         backup_database()
@@ -277,5 +567,16 @@ def main():
     return True
 
 if __name__ == "__main__":
-    success = main()
+    if "--add-indexes" in sys.argv:
+        success = create_composite_indexes()
+    elif "--add-session-revocation" in sys.argv:
+        success = add_session_revocation_column()
+    elif "--add-session-expiry-index" in sys.argv:
+        success = add_session_expiry_index()
+    elif "--add-footprint-import" in sys.argv:
+        success = add_footprint_import_column()
+    elif "--audit-partitions" in sys.argv:
+        success = update_audit_triggers() and ensure_audit_partitions()
+    else:
+        success = main()
     sys.exit(0 if success else 1)
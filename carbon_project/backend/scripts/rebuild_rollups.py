@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Rebuild user_footprint_rollups from carbon_footprints to repair drift
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.connection import SessionLocal, create_tables
+from app.repositories.carbon_footprint_repository import UserFootprintRollupRepository
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild per-user emission rollups")
+    parser.add_argument("--user-id", type=int, help="Rebuild a single user instead of all users")
+    args = parser.parse_args()
+
+    print("🔧 Rebuilding emission rollups")
+    print("=" * 50)
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        rollup_repo = UserFootprintRollupRepository(db)
+        if args.user_id is not None:
+            rollup = rollup_repo.rebuild_user_rollup(args.user_id)
+            count = rollup.calculation_count if rollup else 0
+            print(f"✅ Rebuilt rollup for user {args.user_id} ({count} calculations)")
+        else:
+            users = rollup_repo.rebuild_all_rollups()
+            print(f"✅ Rebuilt rollups for {users} users")
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error rebuilding rollups: {e}")
+        return False
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
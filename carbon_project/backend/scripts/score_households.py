@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Score a CSV or Parquet file of households offline, writing predictions, intervals and
+per-category breakdowns to part files. Run it again with the same arguments to resume.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.batch_scoring import OUTPUT_FORMATS, score_file
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch score household files with the emission model")
+    parser.add_argument("input_path", help="CSV or Parquet file with one household per row (calculate request columns)")
+    parser.add_argument("output_dir", help="Directory for the part files and the checkpoint")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="parquet", help="Output file format")
+    parser.add_argument("--model", choices=("primary", "fallback"), default="primary", help="Model to score with")
+    parser.add_argument("--model-path", help="Model artifact (defaults to the one in app/ml/models)")
+    parser.add_argument("--preprocessor-path", help="Preprocessor artifact for the primary model")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--coverage", type=float, default=0.9, help="Prediction interval coverage")
+    parser.add_argument("--id-column", help="Input column copied to the output to identify rows")
+    args = parser.parse_args()
+
+    print("🧮 Batch scoring households")
+    print("=" * 50)
+
+    try:
+        report = score_file(
+            args.input_path, args.output_dir,
+            output_format=args.format,
+            model=args.model,
+            model_path=args.model_path,
+            preprocessor_path=args.preprocessor_path,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            coverage=args.coverage,
+            id_column=args.id_column
+        )
+    except Exception as e:
+        print(f"❌ Error scoring households: {e}")
+        return False
+
+    print(f"✅ Scored {report['scored']} of {report['rows']} rows in {report['chunks']} chunks "
+          f"({report['failed']} failed, {report['resumed_chunks']} chunks resumed)")
+    print(f"⏱️  {report['seconds']}s with {report['workers']} workers: {report['rows_per_second']} rows/s")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
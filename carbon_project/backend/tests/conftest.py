@@ -13,11 +13,26 @@ from datetime import datetime, timedelta
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Keep background jobs and audit events in memory; tests run them explicitly
+# with job_queue.run_pending and audit_log.flush
+os.environ.setdefault("JOB_QUEUE_PATH", ":memory:")
+os.environ.setdefault("JOB_WORKER_INTERVAL_SECONDS", "0")
+os.environ.setdefault("AUDIT_FLUSH_INTERVAL_MS", "0")
+# Caches on the "sqlite" backend (dashboards and idempotency keys by default) use a private in-memory database
+os.environ.setdefault("CACHE_SQLITE_PATH", ":memory:")
+
 from app.database.connection import Base, get_db
 from app.main import app
 from app.models.user import User
 from app.models.carbon_footprint import CarbonFootprint
-from app.services.auth_service import AuthService
+from app.services.auth_service import AuthService, session_cache
+from app.services.carbon_footprint_service import dashboard_cache
+from app.services.idempotency import idempotency_store
+from app.services.session_tokens import revocation_filter
+from app.services.rate_limit import login_throttle, request_buckets
+from app.services.degraded_mode import degraded_mode
+from app.services.job_queue import job_queue
+from app.services.audit_log import audit_log
 from app.schemas.user import UserCreate
 
 # Test database URL (SQLite in-memory for fast tests)
@@ -35,6 +50,16 @@ def test_db():
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     
     db = TestingSessionLocal()
+    # Each test gets a fresh database, so cached rows from earlier tests must go too
+    session_cache.clear()
+    dashboard_cache.clear()
+    idempotency_store.clear()
+    revocation_filter.clear()
+    login_throttle.store.clear()
+    request_buckets.clear()
+    degraded_mode.reset()
+    job_queue.clear()
+    audit_log.clear()
     try:
         yield db
     finally:
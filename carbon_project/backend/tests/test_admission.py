@@ -0,0 +1,98 @@
+"""
+Tests for deadline-aware admission control on inference routes
+"""
+import threading
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+import app.api.dependencies as dependencies
+from app.services.admission import AdmissionController, AdmissionRejected, effective_deadline
+from app.services.degraded_mode import DegradedMode
+
+@pytest.mark.unit
+class TestAdmissionController:
+    """Test suite for AdmissionController"""
+    
+    def test_rejects_when_estimated_wait_exceeds_deadline(self):
+        """Test a request that cannot finish in time is rejected up front"""
+        controller = AdmissionController(concurrency=1, initial_service_time=0.5)
+        release = threading.Event()
+        entered = threading.Event()
+        
+        def hold_slot():
+            with controller.admit(deadline=5):
+                entered.set()
+                release.wait(5)
+        
+        worker = threading.Thread(target=hold_slot)
+        worker.start()
+        entered.wait(5)
+        try:
+            with pytest.raises(AdmissionRejected) as exc_info:
+                with controller.admit(deadline=0.6):
+                    pass
+            assert exc_info.value.retry_after >= 1
+            assert controller.stats()["rejected"] == 1
+        finally:
+            release.set()
+            worker.join()
+        
+        with controller.admit(deadline=0.6):
+            pass
+        assert controller.stats()["in_flight"] == 0
+    
+    def test_queued_request_gives_up_before_its_deadline(self):
+        """Test a request waiting for a slot is rejected with one service time of its deadline left"""
+        controller = AdmissionController(concurrency=1, initial_service_time=0.1)
+        release = threading.Event()
+        entered = threading.Event()
+        
+        def hold_slot():
+            with controller.admit(deadline=5):
+                entered.set()
+                release.wait(5)
+        
+        worker = threading.Thread(target=hold_slot)
+        worker.start()
+        entered.wait(5)
+        try:
+            started = time.monotonic()
+            with pytest.raises(AdmissionRejected, match="Deadline passed while queued"):
+                with controller.admit(deadline=0.5):
+                    pass
+            assert 0.3 <= time.monotonic() - started < 0.5
+        finally:
+            release.set()
+            worker.join()
+    
+    def test_client_deadline_only_shortens_route_deadline(self):
+        """Test X-Deadline-Ms can tighten but never extend the route deadline"""
+        assert effective_deadline(2000, None) == 2.0
+        assert effective_deadline(2000, "500") == 0.5
+        assert effective_deadline(2000, "10000") == 2.0
+        assert effective_deadline(2000, "not-a-number") == 2.0
+
+@pytest.mark.unit
+@pytest.mark.api
+class TestAdmissionDependency:
+    """Test suite for the admit_inference dependency"""
+    
+    def test_returns_503_with_retry_after(self, monkeypatch):
+        """Test a client deadline shorter than the service time is shed with 503 when degraded mode is off"""
+        monkeypatch.setattr(dependencies, "inference_admission", AdmissionController(concurrency=1, initial_service_time=0.2))
+        monkeypatch.setattr(dependencies, "degraded_mode", DegradedMode(dependencies.inference_admission, mode="off"))
+        app = FastAPI()
+        
+        @app.post("/predict", dependencies=[Depends(dependencies.admit_inference(2000))])
+        def predict():
+            return {"status": "ok"}
+        
+        client = TestClient(app)
+        assert client.post("/predict").status_code == 200
+        
+        response = client.post("/predict", headers={"X-Deadline-Ms": "50"})
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,95 @@
+"""
+Tests for the buffered audit log writer
+"""
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.main import app
+
+from app.models.carbon_footprint import AuditLog
+from app.services.audit_log import AuditLogWriter, _file_lock, audit_log
+
+def failing_session():
+    raise RuntimeError("database unavailable")
+
+@pytest.mark.database
+class TestAuditLogWriter:
+    """Test suite for AuditLogWriter"""
+
+    def test_flush_writes_buffered_events(self, test_db):
+        """Test recorded events stay buffered until a flush writes them"""
+        writer = AuditLogWriter(sessionmaker(bind=test_db.get_bind()), batch_size=2)
+        for record_id in range(3):
+            writer.record("CALCULATE", "carbon_footprints", record_id=record_id, user_id=1,
+                          new_values={"total_emissions": 1.5})
+
+        assert test_db.query(AuditLog).count() == 0
+        assert writer.flush() == 3
+        assert len(writer) == 0
+        assert test_db.query(AuditLog).filter(AuditLog.action == "CALCULATE").count() == 3
+
+    def test_full_buffer_spills_and_replays(self, test_db, tmp_path):
+        """Test events that don't fit, or fail to insert, are spilled and replayed later"""
+        spill_path = str(tmp_path / "audit_spill.jsonl")
+        writer = AuditLogWriter(failing_session, capacity=1, block_timeout=0, spill_path=spill_path)
+        writer.record("LOGIN", "users", record_id=1, user_id=1)
+        writer.record("LOGIN", "users", record_id=2, user_id=2)
+        assert writer.stats()["spilled"] == 1
+
+        assert writer.flush() == 0
+        assert writer.stats()["spilled"] == 2
+
+        assert writer.flush(sessionmaker(bind=test_db.get_bind())) == 2
+        assert sorted(row.record_id for row in test_db.query(AuditLog)) == [1, 2]
+        assert writer.stats()["dropped"] == 0
+
+    def test_spill_replay_survives_torn_lines_and_other_workers(self, test_db, tmp_path):
+        """Test a line cut short by a crash is quarantined and a replay already running elsewhere is left alone"""
+        spill_path = str(tmp_path / "audit_spill.jsonl")
+        writer = AuditLogWriter(failing_session, capacity=1, block_timeout=0, spill_path=spill_path)
+        for record_id in (1, 2):
+            writer.record("LOGIN", "users", record_id=record_id, user_id=1)
+        with open(spill_path, "a", encoding="utf-8") as f:
+            f.write('{"action": "LOG')
+        writer.record("LOGIN", "users", record_id=3, user_id=1)
+
+        session_factory = sessionmaker(bind=test_db.get_bind())
+        with _file_lock(spill_path + ".replay.lock"):
+            assert writer.flush(session_factory) == 1
+        assert os.path.exists(spill_path)
+
+        assert writer.flush(session_factory) == 2
+        assert sorted(row.record_id for row in test_db.query(AuditLog)) == [1, 2, 3]
+        with open(spill_path + ".corrupt", encoding="utf-8") as f:
+            assert f.read() == '{"action": "LOG\n'
+        assert writer.flush(session_factory) == 0
+
+@pytest.mark.api
+@pytest.mark.auth
+class TestAuditEvents:
+    """Test suite for audit events recorded by the API"""
+
+    def test_login_records_events(self, client, test_user):
+        """Test failed and successful logins are audited without touching the database"""
+        client.post("/auth/login", json={"email": test_user.email, "password": "WrongPassword123!"})
+        response = client.post("/auth/login", json={"email": test_user.email, "password": "TestPassword123!"})
+        assert response.status_code == 200
+
+        actions = [event["action"] for event in audit_log._buffer]
+        assert actions[-2:] == ["LOGIN_FAILED", "LOGIN"]
+
+    def test_purchase_records_client_ip_behind_proxy(self, client, monkeypatch):
+        """Test purchases are audited with the client's address, not the load balancer's"""
+        monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["10.0.0.0/8"])
+        behind_proxy = TestClient(app, client=("10.0.0.2", 50000))
+        response = behind_proxy.post(
+            "/marketplace/purchase", json={"item_id": "offset_1"}, headers={"X-Forwarded-For": "198.51.100.7"}
+        )
+        assert response.status_code == 200
+
+        event = audit_log._buffer[-1]
+        assert (event["action"], event["ip_address"]) == ("PURCHASE", "198.51.100.7")
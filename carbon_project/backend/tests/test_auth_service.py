@@ -208,3 +208,87 @@ class TestAuthService:
         assert token1 != token2  # Should be unique
         assert len(token1) > 20  # Should be reasonably long
 
+    
+    def test_get_current_user_cached(self, test_db, test_user):
+        """Test repeated token lookups are served from the session cache"""
+        from app.database.query_monitor import install_query_monitor, start_request_tracking, stop_request_tracking
+        
+        auth_service = AuthService(test_db)
+        login_response = auth_service.login(LoginRequest(
+            email="test@example.com",
+            name="Test User",
+            password="TestPassword123!"
+        ))
+        
+        install_query_monitor(test_db.get_bind())
+        query_stats, token = start_request_tracking()
+        try:
+            first = auth_service.get_current_user(login_response.session_token)
+            second = auth_service.get_current_user(login_response.session_token)
+        finally:
+            stop_request_tracking(token)
+        
+        assert query_stats.query_count == 1
+        assert first == second
+        assert second.id == test_user.id
+    
+    def test_logout_clears_shared_session_cache(self, test_db, test_user, tmp_path, monkeypatch):
+        """Test a logout handled by one worker evicts the token from a cache the other workers share"""
+        from app.services import auth_service as auth_module
+        from app.services.cache import SQLiteCacheStore
+        
+        path = str(tmp_path / "cache.sqlite3")
+        worker_a = SQLiteCacheStore(path, "sessions")
+        worker_b = SQLiteCacheStore(path, "sessions")
+        auth_service = AuthService(test_db)
+        session_token = auth_service.login(LoginRequest(
+            email="test@example.com",
+            name="Test User",
+            password="TestPassword123!"
+        )).session_token
+        
+        monkeypatch.setattr(auth_module, "session_cache", worker_a)
+        assert auth_service.get_current_user(session_token) is not None
+        assert worker_a.get(auth_module._session_cache_key(session_token)) is not None
+        
+        monkeypatch.setattr(auth_module, "session_cache", worker_b)
+        assert auth_service.logout(session_token) is True
+        
+        monkeypatch.setattr(auth_module, "session_cache", worker_a)
+        assert auth_service.get_current_user(session_token) is None
+    
+    def test_password_hasher_sheds_when_queue_full(self):
+        """Test the shared hashing pool rejects work beyond workers + max_pending"""
+        import threading
+        import time
+        from app.services.password_hasher import PasswordHasher, PasswordHasherBusy
+        
+        hasher = PasswordHasher(workers=1, max_pending=0, queue_timeout=0)
+        busy = threading.Thread(target=hasher.run, args=(time.sleep, 0.3))
+        busy.start()
+        time.sleep(0.05)
+        try:
+            with pytest.raises(PasswordHasherBusy):
+                hasher.verify("password", "hash")
+            assert hasher.stats()["rejected"] == 1
+        finally:
+            busy.join()
+            hasher.shutdown()
+    
+    def test_login_throttled_per_email(self, test_db, test_user, monkeypatch):
+        """Test repeated failed logins for one email are rejected before verification"""
+        from app.services.rate_limit import login_throttle
+        
+        monkeypatch.setattr(login_throttle, "email_limit", 3)
+        auth_service = AuthService(test_db)
+        wrong = LoginRequest(email="test@example.com", name="Test User", password="WrongPassword123!")
+        
+        for _ in range(3):
+            with pytest.raises(HTTPException) as exc_info:
+                auth_service.login(wrong, "10.0.0.1")
+            assert exc_info.value.status_code == 401
+        
+        with pytest.raises(HTTPException) as exc_info:
+            auth_service.login(wrong, "10.0.0.2")
+        assert exc_info.value.status_code == 429
+        assert int(exc_info.value.headers["Retry-After"]) > 0
@@ -0,0 +1,80 @@
+"""
+Tests for offline batch scoring
+"""
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from app.services.batch_scoring import CHECKPOINT_FILE, prepare_inputs, score_file
+from app.services.model_preload import WARMUP_INPUT
+
+HOUSEHOLDS = pd.DataFrame(
+    [dict(WARMUP_INPUT, household_id=f"h{i}", household_size=(i % 5) + 1) for i in range(10)]
+)
+HOUSEHOLDS.loc[3, "household_size"] = 0  # out of range
+HOUSEHOLDS.loc[6, "air_travel_hours"] = None  # blank cell uses the default
+
+def read_parts(output_dir):
+    parts = sorted(name for name in os.listdir(output_dir) if name.startswith("part-"))
+    return pd.concat([pd.read_csv(os.path.join(output_dir, name)) for name in parts], ignore_index=True)
+
+@pytest.mark.unit
+class TestPrepareInputs:
+    """Test suite for row validation"""
+
+    def test_invalid_rows_are_reported(self):
+        """Test valid rows get schema defaults and invalid rows an error message"""
+        inputs, errors = prepare_inputs(HOUSEHOLDS)
+        assert list(inputs.index) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+        assert inputs.loc[6, "air_travel_hours"] == 10.0
+        assert errors[3].startswith("household_size")
+        assert (errors.drop(3) == "").all()
+
+@pytest.mark.ml
+@pytest.mark.slow
+class TestScoreFile:
+    """Test suite for score_file"""
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_scores_every_row(self, tmp_path, workers):
+        """Test every row is written once, in order, with a breakdown"""
+        input_path = tmp_path / "households.csv"
+        HOUSEHOLDS.to_csv(input_path, index=False)
+
+        report = score_file(str(input_path), str(tmp_path / "out"), output_format="csv", model="fallback",
+                            chunk_size=4, workers=workers, id_column="household_id", progress=lambda _: None)
+        assert (report["rows"], report["scored"], report["failed"], report["chunks"]) == (10, 9, 1, 3)
+
+        scored = read_parts(tmp_path / "out")
+        assert list(scored["row"]) == list(range(1, 11))
+        assert list(scored["household_id"]) == list(HOUSEHOLDS["household_id"])
+        assert scored.loc[3, "predicted_carbon_footprint"] != scored.loc[3, "predicted_carbon_footprint"]  # NaN
+        valid = scored.drop(3)
+        assert (valid["predicted_carbon_footprint"] > 0).all()
+        assert (valid["electricity_emissions"] > 0).all()
+        assert (valid["model_name"] == "Fallback Linear").all()
+
+    def test_resume_scores_only_missing_chunks(self, tmp_path):
+        """Test a rerun skips checkpointed chunks and rejects different arguments"""
+        input_path = tmp_path / "households.csv"
+        output_dir = tmp_path / "out"
+        HOUSEHOLDS.to_csv(input_path, index=False)
+        options = dict(output_format="csv", model="fallback", chunk_size=4, workers=1, progress=lambda _: None)
+        score_file(str(input_path), str(output_dir), **options)
+        first_run = read_parts(output_dir)
+
+        # Simulate a run interrupted before the last chunk was recorded
+        checkpoint_path = output_dir / CHECKPOINT_FILE
+        checkpoint = json.loads(checkpoint_path.read_text())
+        del checkpoint["completed"]["2"]
+        checkpoint_path.write_text(json.dumps(checkpoint))
+        os.remove(output_dir / "part-00002.csv")
+
+        report = score_file(str(input_path), str(output_dir), **options)
+        assert (report["resumed_chunks"], report["chunks"], report["rows"]) == (2, 1, 2)
+        pd.testing.assert_frame_equal(read_parts(output_dir), first_run)
+
+        with pytest.raises(ValueError):
+            score_file(str(input_path), str(output_dir), **dict(options, chunk_size=5))
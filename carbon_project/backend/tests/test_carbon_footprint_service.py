@@ -4,7 +4,9 @@ Unit tests for CarbonFootprintService
 import pytest
 from decimal import Decimal
 
-from app.services.carbon_footprint_service import CarbonFootprintService
+from app.repositories.carbon_footprint_repository import CarbonFootprintRepository
+from app.schemas.carbon_footprint import CarbonFootprintCreate
+from app.services.carbon_footprint_service import CarbonFootprintService, dashboard_cache, invalidate_dashboard
 
 @pytest.mark.unit
 @pytest.mark.carbon
@@ -173,3 +175,98 @@ class TestCarbonFootprintService:
         assert footprint.waste_emissions is not None
         assert footprint.lifestyle_emissions is not None
 
+
+
+@pytest.mark.unit
+@pytest.mark.carbon
+class TestDashboardCache:
+    """Test suite for the cached dashboard snapshot"""
+    
+    def test_dashboard_served_from_cache(self, test_db, test_user):
+        """Test a second dashboard read comes from the cache"""
+        service = CarbonFootprintService(test_db)
+        
+        first = service.get_dashboard_data(test_user.id)
+        hits = dashboard_cache.hits
+        second = service.get_dashboard_data(test_user.id)
+        
+        assert second == first
+        assert dashboard_cache.hits == hits + 1
+    
+    def test_invalidate_dashboard_after_write(self, test_db, test_user):
+        """Test invalidation makes the next read see new footprints"""
+        service = CarbonFootprintService(test_db)
+        assert service.get_dashboard_data(test_user.id)["stats"]["total_calculations"] == 0
+        
+        CarbonFootprintRepository(test_db).create_carbon_footprint(test_user.id, CarbonFootprintCreate(
+            input_data={},
+            total_emissions=Decimal("1500"),
+            confidence_score=Decimal("0.9"),
+            model_name="test_model"
+        ))
+        assert service.get_dashboard_data(test_user.id)["stats"]["total_calculations"] == 0
+        
+        invalidate_dashboard(test_user.id)
+        dashboard = service.get_dashboard_data(test_user.id)
+        
+        assert dashboard["stats"]["total_calculations"] == 1
+        assert dashboard["latest_footprint"]["total_emissions"] == 1500.0
+
+    def test_dashboard_snapshot_queries(self, test_db, test_user):
+        """Test a user without calculations skips the footprint sections and the latest footprint comes from the rollup"""
+        from app.database.query_monitor import install_query_monitor, start_request_tracking, stop_request_tracking
+
+        service = CarbonFootprintService(test_db)
+        install_query_monitor(test_db.get_bind())
+        query_stats, token = start_request_tracking()
+        try:
+            dashboard = service._build_dashboard_snapshot(test_user.id)
+        finally:
+            stop_request_tracking(token)
+
+        # Rollup lookup, live stats fallback and goals
+        assert query_stats.query_count == 3
+        assert dashboard["recommendations"] == []
+        assert dashboard["recommendation_stats"]["total_recommendations"] == 0
+        assert dashboard["latest_footprint"] is None
+
+        footprint_repo = CarbonFootprintRepository(test_db)
+        for emissions in ("1500", "1600"):
+            latest = footprint_repo.create_carbon_footprint(test_user.id, CarbonFootprintCreate(
+                input_data={},
+                total_emissions=Decimal(emissions),
+                confidence_score=Decimal("0.9"),
+                model_name="test_model"
+            ))
+        dashboard = service._build_dashboard_snapshot(test_user.id)
+
+        assert dashboard["stats"]["total_calculations"] == 2
+        assert dashboard["latest_footprint"]["id"] == latest.id
+        assert dashboard["latest_footprint"]["total_emissions"] == 1600.0
+
+    def test_sqlite_cache_trim_keeps_entries_without_expiry(self, tmp_path):
+        """Test trimming a full SQLite cache evicts the oldest entries, never non-expiring ones"""
+        from app.services.cache import SQLiteCacheStore
+        
+        cache = SQLiteCacheStore(str(tmp_path / "cache.sqlite3"), "dashboard", max_entries=2)
+        cache.set("generation:1", "g1", ttl=0)
+        cache.set("snapshot:1", {"a": 1}, ttl=60)
+        cache.set("snapshot:2", {"a": 2}, ttl=600)
+        
+        assert cache.get("generation:1") == "g1"
+        assert cache.get("snapshot:1") is None
+        assert cache.get("snapshot:2") == {"a": 2}
+
+    def test_sqlite_cache_trims_in_batches(self, tmp_path):
+        """Test a large SQLite cache checks its size every max_entries/100 writes and then evicts the oldest"""
+        from app.services.cache import SQLiteCacheStore
+
+        cache = SQLiteCacheStore(str(tmp_path / "cache.sqlite3"), "dashboard", max_entries=500)
+        for i in range(504):
+            cache.set(f"snapshot:{i}", i, ttl=600)
+        assert cache.stats()["entries"] == 504
+
+        cache.set("snapshot:504", 504, ttl=600)
+        assert cache.stats()["entries"] == 500
+        assert cache.get("snapshot:4") is None
+        assert cache.get("snapshot:5") == 5
@@ -134,6 +134,29 @@ class TestDatabase:
         assert retrieved.session_token == token
         assert retrieved.user_id == test_user.id
     
+    def test_expired_session_cleanup_in_batches(self, test_db, test_user):
+        """Test expired sessions are bulk-deleted in batches and live ones are kept"""
+        from app.repositories.user_repository import UserSessionRepository
+        from app.models.user import UserSession
+        from datetime import datetime, timedelta
+        
+        session_repo = UserSessionRepository(test_db)
+        for i in range(7):
+            session_repo.create_session(
+                user_id=test_user.id,
+                session_token=f"expired_{i}",
+                expires_at=datetime.utcnow() - timedelta(hours=1)
+            )
+        session_repo.create_session(
+            user_id=test_user.id,
+            session_token="live_token",
+            expires_at=datetime.utcnow() + timedelta(days=7)
+        )
+        
+        assert session_repo.cleanup_expired_sessions(batch_size=3) == 7
+        assert [s.session_token for s in test_db.query(UserSession).all()] == ["live_token"]
+        assert session_repo.invalidate_user_sessions(test_user.id) == 1
+    
     def test_carbon_footprint_creation(self, test_db, test_user):
         """Test carbon footprint record creation"""
         from app.repositories.carbon_footprint_repository import CarbonFootprintRepository
@@ -181,3 +204,222 @@ class TestDatabase:
         assert len(footprints) == 3
         assert all(f.user_id == test_user.id for f in footprints)
 
+    
+    def test_carbon_footprint_stats_single_query(self, test_db, test_user):
+        """Test footprint statistics are computed in one round trip"""
+        from app.repositories.carbon_footprint_repository import CarbonFootprintRepository
+        from app.schemas.carbon_footprint import CarbonFootprintCreate
+        from app.database.query_monitor import install_query_monitor, start_request_tracking, stop_request_tracking
+        from decimal import Decimal
+        
+        footprint_repo = CarbonFootprintRepository(test_db)
+        for i in range(3):
+            footprint_data = CarbonFootprintCreate(
+                input_data={"test": f"data{i}"},
+                total_emissions=Decimal(f"{5000 + i * 100}"),
+                confidence_score=Decimal("0.95"),
+                model_name="test_model",
+                model_version="v1"
+            )
+            footprint_repo.create_carbon_footprint(test_user.id, footprint_data)
+        
+        install_query_monitor(test_db.get_bind())
+        query_stats, token = start_request_tracking()
+        try:
+            stats = footprint_repo.get_user_footprint_stats(test_user.id)
+        finally:
+            stop_request_tracking(token)
+        
+        assert query_stats.query_count == 1
+        assert stats['total_calculations'] == 3
+        assert stats['average_emissions'] == pytest.approx(5100.0)
+        assert stats['min_emissions'] == 5000.0
+        assert stats['max_emissions'] == 5200.0
+        assert stats['emissions_stddev'] == pytest.approx(81.65, abs=0.01)
+        assert stats['calculations_last_7_days'] == 3
+        assert stats['calculations_last_30_days'] == 3
+    
+    def test_footprint_rollup_maintained_on_create_and_delete(self, test_db, test_user):
+        """Test the per-user rollup tracks inserts and deletes"""
+        from app.repositories.carbon_footprint_repository import (
+            CarbonFootprintRepository, UserFootprintRollupRepository
+        )
+        from app.schemas.carbon_footprint import CarbonFootprintCreate
+        from decimal import Decimal
+        
+        footprint_repo = CarbonFootprintRepository(test_db)
+        rollup_repo = UserFootprintRollupRepository(test_db)
+        footprints = []
+        for i in range(3):
+            footprint_data = CarbonFootprintCreate(
+                input_data={"test": f"data{i}"},
+                total_emissions=Decimal(f"{5000 + i * 100}"),
+                confidence_score=Decimal("0.95"),
+                model_name="test_model",
+                model_version="v1"
+            )
+            footprints.append(footprint_repo.create_carbon_footprint(test_user.id, footprint_data))
+        
+        def assert_matches_aggregate(stats):
+            expected = footprint_repo.get_user_footprint_stats(test_user.id)
+            assert stats['last_calculation_date'] == expected.pop('last_calculation_date')
+            assert {k: v for k, v in stats.items() if k != 'last_calculation_date'} == pytest.approx(expected)
+        
+        stats = rollup_repo.get_stats(test_user.id)
+        assert_matches_aggregate(stats)
+        
+        # Removing the max/latest row forces min/max and latest to be re-read
+        assert footprint_repo.delete_footprint(footprints[2].id) is True
+        stats = rollup_repo.get_stats(test_user.id)
+        assert stats['total_calculations'] == 2
+        assert stats['max_emissions'] == 5100.0
+        assert rollup_repo.get_rollup(test_user.id).latest_footprint_id == footprints[1].id
+        assert_matches_aggregate(stats)
+        
+        rebuilt = rollup_repo.rebuild_user_rollup(test_user.id)
+        assert rebuilt.calculation_count == 2
+        assert_matches_aggregate(rollup_repo.get_stats(test_user.id))
+
+        # History without a rollup row (written before rollups existed) is folded in by the next write
+        test_db.delete(rollup_repo.get_rollup(test_user.id))
+        test_db.commit()
+        footprint_repo.create_carbon_footprint(test_user.id, CarbonFootprintCreate(
+            input_data={"test": "data3"},
+            total_emissions=Decimal("4800"),
+            confidence_score=Decimal("0.95"),
+            model_name="test_model",
+            model_version="v1"
+        ))
+        stats = rollup_repo.get_stats(test_user.id)
+        assert stats['total_calculations'] == 3
+        assert_matches_aggregate(stats)
+
+    def test_rollup_and_live_windows_agree_at_the_edges(self, test_db, test_user):
+        """Test the 30/7 day counts from the rollup match the live query around the window boundaries"""
+        from app.repositories.carbon_footprint_repository import (
+            CarbonFootprintRepository, UserFootprintRollupRepository
+        )
+        from datetime import datetime, time, timedelta
+        from decimal import Decimal
+
+        today = datetime.utcnow().date()
+        edges = [
+            datetime.combine(today - timedelta(days=30), time(23, 59, 59)),  # outside both windows
+            datetime.combine(today - timedelta(days=29), time(0, 0, 1)),     # first day of the 30 day window
+            datetime.combine(today - timedelta(days=7), time(23, 59, 59)),   # last day before the 7 day window
+            datetime.combine(today - timedelta(days=6), time(0, 0, 1)),      # first day of the 7 day window
+        ]
+        for i, calculation_date in enumerate(edges):
+            test_db.add(CarbonFootprint(
+                user_id=test_user.id,
+                input_data={"test": f"edge{i}"},
+                total_emissions=Decimal("5000"),
+                confidence_score=Decimal("0.95"),
+                model_name="test_model",
+                calculation_date=calculation_date
+            ))
+        test_db.commit()
+
+        rollup_repo = UserFootprintRollupRepository(test_db)
+        rollup_repo.rebuild_user_rollup(test_user.id)
+        rollup_stats = rollup_repo.get_stats(test_user.id)
+        live_stats = CarbonFootprintRepository(test_db).get_user_footprint_stats(test_user.id)
+
+        for window in ('calculations_last_30_days', 'calculations_last_7_days'):
+            assert rollup_stats[window] == live_stats[window]
+        assert live_stats['calculations_last_30_days'] == 3
+        assert live_stats['calculations_last_7_days'] == 1
+
+    def test_carbon_footprint_keyset_pagination(self, test_db, test_user):
+        """Test cursor pages cover the history once, newest first"""
+        from app.repositories.carbon_footprint_repository import CarbonFootprintRepository
+        from app.repositories.pagination import cursor_page, decode_cursor
+        from app.schemas.carbon_footprint import CarbonFootprintCreate
+        from decimal import Decimal
+        
+        footprint_repo = CarbonFootprintRepository(test_db)
+        for i in range(5):
+            footprint_data = CarbonFootprintCreate(
+                input_data={"test": f"data{i}"},
+                total_emissions=Decimal(f"{5000 + i * 100}"),
+                confidence_score=Decimal("0.95"),
+                model_name="test_model",
+                model_version="v1"
+            )
+            footprint_repo.create_carbon_footprint(test_user.id, footprint_data)
+        
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            rows = footprint_repo.get_user_footprints(test_user.id, limit=2, cursor=cursor)
+            page = cursor_page(rows, 2, lambda f: (f.calculation_date, f.id))
+            seen.extend(f.id for f in page["items"])
+            cursor = page["next_cursor"]
+        
+        offset_ids = [f.id for f in footprint_repo.get_user_footprints(test_user.id, skip=0, limit=10)]
+        assert seen == offset_ids
+        assert len(seen) == 5
+        
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+    
+    def test_recommendations_batch_single_insert(self, test_db, test_user):
+        """Test batch recommendations are written with one INSERT and returned with ids"""
+        from app.repositories.carbon_footprint_repository import CarbonFootprintRepository, RecommendationRepository
+        from app.schemas.carbon_footprint import CarbonFootprintCreate, RecommendationCreate
+        from app.database.query_monitor import install_query_monitor, start_request_tracking, stop_request_tracking
+        from decimal import Decimal
+        
+        footprint = CarbonFootprintRepository(test_db).create_carbon_footprint(test_user.id, CarbonFootprintCreate(
+            input_data={"test": "data"},
+            total_emissions=Decimal("5000.0"),
+            confidence_score=Decimal("0.95"),
+            model_name="test_model"
+        ))
+        recommendation_repo = RecommendationRepository(test_db)
+        recommendation_data = [
+            RecommendationCreate(
+                carbon_footprint_id=footprint.id,
+                category="Electricity",
+                title=f"Action {i}",
+                description=f"Action {i}",
+                action_required=f"Action {i}",
+                potential_savings="10%",
+                priority=priority
+            )
+            for i, priority in enumerate(["high", "medium", "low"])
+        ]
+        
+        install_query_monitor(test_db.get_bind())
+        query_stats, token = start_request_tracking()
+        try:
+            recommendations = recommendation_repo.create_recommendations_batch(recommendation_data)
+            titles = [rec.title for rec in recommendations]
+        finally:
+            stop_request_tracking(token)
+        
+        inserts = [sql for sql in query_stats.statement_counts if sql.startswith("INSERT")]
+        assert len(inserts) == 1
+        assert query_stats.statement_counts[inserts[0]] == 1
+        # Returned in input order, the order the rows were inserted in
+        assert titles == ["Action 0", "Action 1", "Action 2"]
+        assert all(rec.id for rec in recommendations)
+        assert [rec.id for rec in recommendations] == sorted(rec.id for rec in recommendations)
+        assert recommendation_repo.get_implementation_stats(test_user.id)['total_recommendations'] == 3
+        stored = test_db.execute(text("SELECT priority FROM recommendations ORDER BY id")).scalars().all()
+        assert stored == ["high", "medium", "low"]
+    
+    def test_create_tables_adds_missing_columns(self):
+        """Test tables created before revoked_at and import_id get the columns at startup"""
+        from sqlalchemy import create_engine, inspect
+        from app.database.connection import add_missing_columns
+        
+        engine = create_engine("sqlite://")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE user_sessions (id INTEGER PRIMARY KEY, user_id INTEGER)"))
+            connection.execute(text("CREATE TABLE carbon_footprints (id INTEGER PRIMARY KEY, user_id INTEGER)"))
+        
+        add_missing_columns(engine)
+        add_missing_columns(engine)  # no-op once the columns exist
+        assert "revoked_at" in {column["name"] for column in inspect(engine).get_columns("user_sessions")}
+        assert "import_id" in {column["name"] for column in inspect(engine).get_columns("carbon_footprints")}
@@ -0,0 +1,124 @@
+"""
+Tests for the fallback emission model and the degraded-mode switch
+"""
+import pytest
+
+from app.ml.fallback_model import DEFAULT_COEFFICIENTS, FallbackEmissionModel, fallback_features
+from app.services.admission import AdmissionController
+from app.services.degraded_mode import DegradedMode
+
+SAMPLE_INPUT = {
+    "household_size": 3,
+    "electricity_usage_kwh": 400,
+    "home_size_sqft": 1500,
+    "vehicle_type": "diesel",
+    "vehicle_monthly_distance_km": 600,
+    "vehicles_per_household": 1,
+    "fuel_usage_liters": 0,
+    "fuel_efficiency": 15,
+    "air_travel_hours": 10
+}
+
+def failing_loader():
+    raise FileNotFoundError("Model not found")
+
+@pytest.mark.unit
+@pytest.mark.ml
+class TestFallbackModel:
+    """Test suite for FallbackEmissionModel"""
+    
+    def test_default_factors(self):
+        """Test the default model applies the published emission factors"""
+        result = FallbackEmissionModel().predict_from_raw_inputs(SAMPLE_INPUT)
+        
+        expected = 400 * 12 * 0.4 + 600 * 12 / 15 * 2.68 + 1500 * 0.1 + 3 * 300 + 10 * 90
+        assert result["predicted_carbon_footprint"] == pytest.approx(expected, abs=0.01)
+        assert result["model_name"] == FallbackEmissionModel.model_name
+    
+    def test_fit_and_round_trip(self, tmp_path):
+        """Test fitting recovers linear coefficients and survives save/load"""
+        rows = [dict(SAMPLE_INPUT, household_size=size, electricity_usage_kwh=kwh, air_travel_hours=hours)
+                for size in (1, 2, 4) for kwh in (100, 300, 900) for hours in (0, 5, 20)]
+        targets = [sum(2 * DEFAULT_COEFFICIENTS[name] * value for name, value in fallback_features(row).items()) + 50
+                   for row in rows]
+        
+        model = FallbackEmissionModel.fit(rows, targets)
+        assert model.coefficients["household_size"] == pytest.approx(600, rel=1e-3)
+        assert model.score == pytest.approx(1.0)
+        
+        loaded = FallbackEmissionModel.load(model.save(str(tmp_path / "fallback.json")))
+        assert loaded.predict_from_raw_inputs(rows[0]) == model.predict_from_raw_inputs(rows[0])
+
+@pytest.mark.unit
+@pytest.mark.ml
+class TestDegradedMode:
+    """Test suite for the DegradedMode switch"""
+    
+    def test_fallback_when_primary_fails_to_load(self):
+        """Test a failed model load is served by the fallback and retried only after the interval"""
+        calls = []
+        def loader():
+            calls.append(1)
+            failing_loader()
+        switch = DegradedMode(AdmissionController(concurrency=1), retry_interval=60)
+        
+        model, degraded = switch.select(None, loader)
+        switch.select(None, loader)
+        
+        assert degraded is True
+        assert isinstance(model, FallbackEmissionModel)
+        assert len(calls) == 1
+        assert switch.stats()["degraded_responses"] == {"model_unavailable": 2}
+        assert switch.stats()["active"] is True
+    
+    def test_queue_depth_switch(self):
+        """Test the switch trips when the inference queue reaches the threshold"""
+        admission = AdmissionController(concurrency=1)
+        switch = DegradedMode(admission, queue_threshold=2)
+        assert switch.overload_reason() is None
+        
+        admission.in_flight = 3
+        assert switch.overload_reason() == "queue_depth"
+        
+        primary = object()
+        assert switch.select(None, lambda: primary) == (primary, False)
+        model, degraded = switch.select(switch.overload_reason(), lambda: primary)
+        assert degraded is True and model is not primary
+    
+    def test_off_mode_raises_when_model_unavailable(self):
+        """Test degraded mode can be disabled"""
+        switch = DegradedMode(AdmissionController(concurrency=1), mode="off")
+        
+        with pytest.raises(RuntimeError):
+            switch.select(None, failing_loader)
+
+@pytest.mark.unit
+@pytest.mark.ml
+class TestModelPreload:
+    """Test suite for loading the model in a pre-fork master"""
+    
+    def test_preload_pins_and_warms_model(self, monkeypatch):
+        """Test the preloaded model is shared, single-threaded and warmed"""
+        import gc
+        from sklearn.linear_model import LinearRegression
+        import app.services.model_preload as model_preload
+        
+        class FakePredictor:
+            def __init__(self):
+                self.model = LinearRegression(n_jobs=-1)
+                self.warmed = False
+            
+            def predict_from_raw_inputs(self, raw_inputs):
+                self.warmed = True
+        
+        switch = DegradedMode(AdmissionController(concurrency=1))
+        monkeypatch.setattr(model_preload, "degraded_mode", switch)
+        try:
+            assert model_preload.preload_models(FakePredictor) is True
+        finally:
+            gc.unfreeze()
+        
+        predictor, degraded = switch.select(None, failing_loader)
+        assert degraded is False
+        assert predictor.warmed is True
+        assert predictor.model.n_jobs == 1
@@ -0,0 +1,65 @@
+"""
+Tests for the streaming history export
+"""
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from app.services.carbon_footprint_service import CarbonFootprintService
+from app.services.footprint_export import EXPORT_FIELDS, export_chunks, gzip_chunks
+from app.services.model_preload import WARMUP_INPUT
+
+@pytest.mark.unit
+class TestExportEncoding:
+    """Test suite for export chunk encoding"""
+
+    def test_chunks_and_gzip_round_trip(self):
+        """Test rows are split into chunks and the gzip stream decompresses to the same bytes"""
+        rows = [(f"uuid-{i}", None, i, 0.9, "m", "v", 1, 2, 3, 4, 5, 6, {"i": i}) for i in range(5)]
+        chunks = list(export_chunks(rows, "ndjson", rows_per_chunk=2))
+
+        assert len(chunks) == 3
+        records = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        assert [record["input_data"] for record in records] == [{"i": i} for i in range(5)]
+        assert gzip.decompress(b"".join(gzip_chunks(iter(chunks)))) == b"".join(chunks)
+
+@pytest.mark.api
+@pytest.mark.carbon
+class TestExportEndpoint:
+    """Test suite for /carbon-footprint/export"""
+
+    def test_export_formats(self, authenticated_client, test_db, test_user):
+        """Test the full history is exported oldest first as CSV and NDJSON"""
+        service = CarbonFootprintService(test_db)
+        uuids = [
+            service.calculate_carbon_footprint(test_user.id, dict(WARMUP_INPUT, household_size=size)).calculation_uuid
+            for size in (1, 2, 3)
+        ]
+
+        response = authenticated_client.get("/carbon-footprint/export?format=ndjson")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line)["calculation_uuid"] for line in response.text.splitlines()] == uuids
+
+        response = authenticated_client.get(
+            "/carbon-footprint/export?format=csv", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert list(rows[0]) == EXPORT_FIELDS
+        assert [row["calculation_uuid"] for row in rows] == uuids
+
+        assert authenticated_client.get("/carbon-footprint/export?format=xml").status_code == 400
+
+    def test_export_outlives_request_session(self, test_db, test_user):
+        """Test the stream reads through its own session, so closing the request's session doesn't cut it off"""
+        service = CarbonFootprintService(test_db)
+        uuid = service.calculate_carbon_footprint(test_user.id, WARMUP_INPUT).calculation_uuid
+
+        chunks = service.export_footprints(test_user.id, "ndjson")
+        test_db.close()
+        assert [json.loads(line)["calculation_uuid"] for line in b"".join(chunks).splitlines()] == [uuid]
@@ -0,0 +1,139 @@
+"""
+Tests for bulk CSV import of household calculations
+"""
+import csv
+import io
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models.carbon_footprint import CarbonFootprint
+from app.repositories.carbon_footprint_repository import UserFootprintRollupRepository
+from app.services import footprint_import
+from app.services.footprint_import import FootprintImportService, validate_row
+from app.services.job_queue import job_queue
+from app.services.model_preload import WARMUP_INPUT
+
+def households_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(WARMUP_INPUT))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+HOUSEHOLDS = [
+    dict(WARMUP_INPUT, household_size=2),
+    dict(WARMUP_INPUT, household_size=0),  # out of range
+    dict(WARMUP_INPUT, household_size=4, air_travel_hours=""),  # blank cell uses the default
+    dict(WARMUP_INPUT, household_size=5)
+]
+
+@pytest.mark.unit
+class TestRowValidation:
+    """Test suite for CSV row validation"""
+
+    def test_validate_row(self):
+        """Test rows are coerced with schema defaults, and invalid rows report every problem"""
+        raw = {key: str(value) for key, value in WARMUP_INPUT.items()}
+        input_data, errors = validate_row(dict(raw, household_size=" 3 ", air_travel_hours=""))
+        assert errors == []
+        assert input_data["household_size"] == 3
+        assert input_data["air_travel_hours"] == 10.0
+
+        input_data, errors = validate_row({"household_size": "many"})
+        assert input_data is None
+        assert any(error.startswith("household_size") for error in errors)
+        assert any(error.startswith("home_type") for error in errors)
+
+@pytest.mark.integration
+@pytest.mark.carbon
+class TestFootprintImport:
+    """Test suite for FootprintImportService"""
+
+    def test_import_resumes_by_chunk(self, test_db, test_user, tmp_path, monkeypatch):
+        """Test chunks are committed one at a time and bad rows are reported by row number"""
+        monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+        path = tmp_path / "households.csv"
+        path.write_text(households_csv(HOUSEHOLDS))
+
+        service = FootprintImportService(test_db)
+        own = service.carbon_service.calculate_carbon_footprint(test_user.id, WARMUP_INPUT)
+        created = service.create_import(test_user.id, "households.csv", str(path))
+
+        assert service.process_import(created.id, max_chunks=1) is False
+        progress = service.get_import(test_user.id, created.import_uuid)
+        assert (progress.status, progress.processed_rows, progress.imported_rows) == ("running", 2, 1)
+
+        assert service.process_import(created.id) is True
+        result = service.get_import(test_user.id, created.import_uuid)
+        assert (result.status, result.processed_rows, result.imported_rows, result.failed_rows) == ("completed", 4, 3, 1)
+        assert [error["row"] for error in result.errors] == [3]
+        assert path.exists()  # only uploaded copies are deleted
+
+        assert test_db.query(CarbonFootprint).filter(CarbonFootprint.import_id == created.id).count() == 3
+
+        # Imported households aren't the uploader's own calculations
+        rollup = UserFootprintRollupRepository(test_db).get_rollup(test_user.id)
+        assert rollup.calculation_count == 1
+        assert service.carbon_service.get_footprint_stats(test_user.id).total_calculations == 1
+        history = service.carbon_service.get_user_footprints(test_user.id)
+        assert [footprint.calculation_uuid for footprint in history] == [own.calculation_uuid]
+
+        UserFootprintRollupRepository(test_db).rebuild_user_rollup(test_user.id)
+        assert UserFootprintRollupRepository(test_db).get_rollup(test_user.id).calculation_count == 1
+
+    def test_unreadable_file_fails_import(self, test_db, test_user, tmp_path):
+        """Test a missing file marks the import failed instead of retrying forever"""
+        service = FootprintImportService(test_db)
+        created = service.create_import(test_user.id, "gone.csv", str(tmp_path / "gone.csv"))
+
+        assert service.process_import(created.id) is True
+        result = service.get_import(test_user.id, created.import_uuid)
+        assert result.status == "failed"
+        assert "Could not read" in result.error_message
+
+    def test_failing_job_fails_import_when_queue_gives_up(self, test_db, test_user, tmp_path, monkeypatch):
+        """Test an import whose chunks keep failing is marked failed once its job is parked"""
+        path = tmp_path / "households.csv"
+        path.write_text(households_csv(HOUSEHOLDS))
+        created = FootprintImportService(test_db).create_import(test_user.id, "households.csv", str(path))
+        job_queue.enqueue("import_footprints", {"import_id": created.id})
+
+        def unavailable(self, footprint_import, chunk):
+            raise RuntimeError("model unavailable")
+        monkeypatch.setattr(FootprintImportService, "_import_chunk", unavailable)
+        monkeypatch.setattr(job_queue, "max_attempts", 1)
+        job_queue.run_pending(sessionmaker(bind=test_db.get_bind()))
+
+        test_db.expire_all()
+        result = FootprintImportService(test_db).get_import(test_user.id, created.import_uuid)
+        assert result.status == "failed"
+        assert "model unavailable" in result.error_message
+        assert job_queue.stats()["failed"] == 1
+
+@pytest.mark.api
+@pytest.mark.carbon
+class TestImportEndpoints:
+    """Test suite for the upload and status endpoints"""
+
+    def test_upload_then_poll_status(self, authenticated_client, test_db, tmp_path, monkeypatch):
+        """Test an upload is queued, imported by the job worker and reported as completed"""
+        monkeypatch.setattr(footprint_import, "IMPORT_DIR", str(tmp_path))
+        response = authenticated_client.post(
+            "/carbon-footprint/import",
+            files={"file": ("households.csv", households_csv(HOUSEHOLDS), "text/csv")}
+        )
+        assert response.status_code == 202
+        import_uuid = response.json()["import_uuid"]
+        assert response.json()["status"] == "pending"
+
+        job_queue.run_pending(sessionmaker(bind=test_db.get_bind()))
+
+        status = authenticated_client.get(f"/carbon-footprint/import/{import_uuid}").json()
+        assert status["status"] == "completed"
+        assert (status["imported_rows"], status["failed_rows"]) == (3, 1)
+        assert status["errors"][0]["row"] == 3
+        assert list(tmp_path.iterdir()) == []
+
+        assert authenticated_client.get("/carbon-footprint/import/unknown").status_code == 404
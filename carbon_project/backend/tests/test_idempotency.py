@@ -0,0 +1,152 @@
+"""
+Tests for Idempotency-Key handling on /carbon-footprint/calculate
+"""
+import threading
+import time
+
+import pytest
+
+import app.api.dependencies as dependencies
+from app.models.carbon_footprint import CarbonFootprint
+from app.schemas.carbon_footprint import CarbonFootprintCalculationRequest
+from app.services.admission import AdmissionController
+from app.services.cache import SQLiteCacheStore, TTLCache
+from app.services.idempotency import (
+    IdempotencyKeyInProgress, IdempotencyKeyReused, IdempotencyStore, idempotency_store, request_fingerprint
+)
+from app.services.model_preload import WARMUP_INPUT
+
+@pytest.mark.unit
+class TestIdempotencyStore:
+    """Test suite for IdempotencyStore"""
+
+    def test_duplicates_in_flight_wait_for_the_first(self):
+        """Test duplicates arriving while the first request runs get its response, never run again"""
+        store = IdempotencyStore(TTLCache(), in_progress_ttl=60, wait_timeout=5)
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return {"value": len(calls)}
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(store.run("1", "key", "fp", compute)))
+        first.start()
+        started.wait()
+        assert store.run("1", "key", "fp", compute) == ({"value": 1}, True)
+        first.join()
+
+        assert len(calls) == 1
+        assert results == [({"value": 1}, False)]
+
+    def test_duplicates_refused_once_the_wait_runs_out(self):
+        """Test a duplicate gives up with IdempotencyKeyInProgress if the first request is too slow"""
+        store = IdempotencyStore(TTLCache(), in_progress_ttl=60, wait_timeout=0.1)
+        store.cache.add("1:key", {"fingerprint": "fp", "status": "in_progress"})
+
+        started = time.monotonic()
+        with pytest.raises(IdempotencyKeyInProgress):
+            store.run("1", "key", "fp", lambda: {"value": 1})
+        assert time.monotonic() - started >= 0.1
+        assert store.stats()["conflicts"] == 1
+
+    def test_claim_is_shared_between_workers(self, tmp_path):
+        """Test with the sqlite backend a key claimed by one worker is held for the others"""
+        path = str(tmp_path / "cache.sqlite3")
+        worker_a = IdempotencyStore(SQLiteCacheStore(path, "idempotency"), in_progress_ttl=60)
+        worker_b = IdempotencyStore(SQLiteCacheStore(path, "idempotency"), in_progress_ttl=60)
+
+        def compute():
+            with pytest.raises(IdempotencyKeyInProgress):
+                worker_b.run("1", "key", "fp", lambda: {"value": 2})
+            return {"value": 1}
+
+        assert worker_a.run("1", "key", "fp", compute) == ({"value": 1}, False)
+        assert worker_b.run("1", "key", "fp", lambda: {"value": 2}) == ({"value": 1}, True)
+
+        # A failed request releases its key for the retry
+        with pytest.raises(RuntimeError):
+            worker_a.run("1", "other", "fp", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+        assert worker_b.run("1", "other", "fp", lambda: {"value": 3}) == ({"value": 3}, False)
+
+    def test_claim_survives_a_full_cache(self, tmp_path):
+        """Test claiming a key in a full cache doesn't evict the claim, so a duplicate still waits"""
+        store = IdempotencyStore(
+            SQLiteCacheStore(str(tmp_path / "cache.sqlite3"), "idempotency", max_entries=3, default_ttl=86400),
+            in_progress_ttl=120, wait_timeout=5
+        )
+        for key in ("a", "b", "c"):
+            store.run("1", key, "fp", lambda: {"n": 0})
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return {"n": len(calls)}
+
+        first = threading.Thread(target=store.run, args=("1", "key", "fp", compute))
+        first.start()
+        started.wait()
+        assert store.run("1", "key", "fp", compute) == ({"n": 1}, True)
+        first.join()
+
+        assert len(calls) == 1
+        assert store.stats()["entries"] == 3
+
+    def test_key_reuse_with_different_body_is_rejected(self):
+        """Test a key can't be replayed for a different request body or another user"""
+        store = IdempotencyStore(TTLCache(), in_progress_ttl=60)
+        store.run("1", "key", request_fingerprint({"a": 1, "b": 2}), lambda: {"value": 1})
+
+        assert store.run("1", "key", request_fingerprint({"b": 2, "a": 1}), lambda: {"value": 2})[1]
+        with pytest.raises(IdempotencyKeyReused):
+            store.run("1", "key", request_fingerprint({"a": 3}), lambda: {"value": 3})
+        assert store.run("2", "key", request_fingerprint({"a": 3}), lambda: {"value": 3}) == ({"value": 3}, False)
+
+@pytest.mark.api
+@pytest.mark.carbon
+class TestIdempotentCalculate:
+    """Test suite for retried calculations"""
+
+    def test_retry_returns_stored_response(self, authenticated_client, test_db):
+        """Test a retried calculation returns the first response and records one footprint"""
+        headers = {"Idempotency-Key": "retry-1"}
+        first = authenticated_client.post("/carbon-footprint/calculate", json=WARMUP_INPUT, headers=headers)
+        retry = authenticated_client.post("/carbon-footprint/calculate", json=WARMUP_INPUT, headers=headers)
+
+        assert first.status_code == 200
+        assert retry.status_code == 200
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        assert test_db.query(CarbonFootprint).count() == 1
+
+        changed = dict(WARMUP_INPUT, household_size=5)
+        response = authenticated_client.post("/carbon-footprint/calculate", json=changed, headers=headers)
+        assert response.status_code == 422
+
+    def test_replay_takes_no_inference_slot(self, authenticated_client, monkeypatch):
+        """Test only the request that runs the calculation is admitted for inference"""
+        admission = AdmissionController(concurrency=1)
+        monkeypatch.setattr(dependencies, "inference_admission", admission)
+        headers = {"Idempotency-Key": "slot-1"}
+
+        assert authenticated_client.post("/carbon-footprint/calculate", json=WARMUP_INPUT, headers=headers).status_code == 200
+        assert authenticated_client.post("/carbon-footprint/calculate", json=WARMUP_INPUT, headers=headers).status_code == 200
+        assert admission.admitted == 1
+
+    def test_retry_while_in_progress_gets_409(self, authenticated_client, test_user, monkeypatch):
+        """Test a retry of a request that is still running past the wait is told to come back later"""
+        monkeypatch.setattr(idempotency_store, "wait_timeout", 0.1)
+        fingerprint = request_fingerprint(CarbonFootprintCalculationRequest(**WARMUP_INPUT).dict())
+        idempotency_store.cache.add(f"{test_user.id}:slow-1", {"fingerprint": fingerprint, "status": "in_progress"})
+        response = authenticated_client.post(
+            "/carbon-footprint/calculate", json=WARMUP_INPUT, headers={"Idempotency-Key": "slow-1"}
+        )
+        assert response.status_code == 409
+        assert response.headers["Retry-After"] == "1"
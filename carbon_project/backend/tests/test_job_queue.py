@@ -0,0 +1,106 @@
+"""
+Tests for the background job queue and deferred recommendation inserts
+"""
+import multiprocessing
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.services.job_queue import JobQueue, job_handler, job_queue
+from app.services.carbon_footprint_service import CarbonFootprintService
+from app.repositories.carbon_footprint_repository import RecommendationRepository
+
+calls = []
+
+@job_handler("test_flaky")
+def flaky_handler(db, payload):
+    calls.append(payload["n"])
+    if len(calls) < payload["fail_times"] + 1:
+        raise RuntimeError("temporary failure")
+
+class FakeSession:
+    def rollback(self):
+        pass
+    
+    def close(self):
+        pass
+
+@pytest.mark.unit
+class TestJobQueue:
+    """Test suite for JobQueue"""
+    
+    def setup_method(self):
+        calls.clear()
+    
+    def test_retries_then_completes(self):
+        """Test a failing job is retried after its backoff and removed once it succeeds"""
+        queue = JobQueue(":memory:", max_attempts=3, retry_base_seconds=0)
+        queue.enqueue("test_flaky", {"n": 1, "fail_times": 1})
+        
+        assert queue.run_pending(FakeSession) == 1
+        assert queue.stats()["pending"] == 1
+        assert queue.run_pending(FakeSession) == 1
+        assert calls == [1, 1]
+        assert queue.stats() == {"pending": 0, "failed": 0, "processed": 1, "retried": 1}
+    
+    def test_gives_up_after_max_attempts(self):
+        """Test a job that keeps failing is parked as failed"""
+        queue = JobQueue(":memory:", max_attempts=2, retry_base_seconds=0)
+        queue.enqueue("test_flaky", {"n": 2, "fail_times": 5})
+        
+        queue.run_pending(FakeSession)
+        queue.run_pending(FakeSession)
+        assert queue.run_pending(FakeSession) == 0
+        assert queue.stats()["failed"] == 1
+    
+    def test_claimed_jobs_are_leased(self):
+        """Test a claimed job isn't handed out again while its lease is held"""
+        queue = JobQueue(":memory:", lease_seconds=60)
+        queue.enqueue("test_flaky", {"n": 3, "fail_times": 0})
+        
+        assert len(queue.claim(10)) == 1
+        assert queue.claim(10) == []
+    
+    def test_forked_worker_opens_its_own_connection(self, tmp_path):
+        """Test a process forked after the queue was used doesn't reuse the parent's SQLite connection"""
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+        queue.enqueue("test_flaky", {"n": 4, "fail_times": 0})
+        parent_connection = id(queue._conn)
+        
+        def child(results):
+            results.put(id(queue._conn) != parent_connection)
+            queue.enqueue("test_flaky", {"n": 5, "fail_times": 0})
+        
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        process = context.Process(target=child, args=(results,))
+        process.start()
+        process.join(10)
+        
+        assert process.exitcode == 0
+        assert results.get(timeout=1) is True
+        assert id(queue._conn) == parent_connection
+        assert queue.stats()["pending"] == 2
+
+@pytest.mark.integration
+@pytest.mark.carbon
+class TestDeferredRecommendations:
+    """Test suite for recommendations saved by the job worker"""
+    
+    def test_calculate_defers_recommendation_inserts(self, test_db, test_user, sample_carbon_data):
+        """Test recommendations are returned at once and saved by the job, idempotently"""
+        service = CarbonFootprintService(test_db)
+        footprint, recommendations = service.calculate_with_recommendations(test_user.id, sample_carbon_data)
+        
+        repo = RecommendationRepository(test_db)
+        assert recommendations
+        assert not repo.has_recommendations(footprint.id)
+        
+        session_factory = sessionmaker(bind=test_db.get_bind())
+        assert job_queue.run_pending(session_factory) == 1
+        assert len(repo.get_recommendations_by_footprint(footprint.id)) == len(recommendations)
+        
+        # A re-delivered job doesn't insert the recommendations twice
+        service._save_recommendations_later(test_user.id, footprint.id, recommendations)
+        job_queue.run_pending(session_factory)
+        assert len(repo.get_recommendations_by_footprint(footprint.id)) == len(recommendations)
@@ -0,0 +1,85 @@
+"""
+Tests for the shared bcrypt pool
+"""
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import app.services.auth_service as auth_service_module
+from app.services.auth_service import AuthService
+from app.services.password_hasher import PasswordHasher, PasswordHasherBusy
+
+def _hold_slot(hasher):
+    """Occupy one of the hasher's slots until the returned event is set"""
+    release = threading.Event()
+    entered = threading.Event()
+
+    def blocked():
+        entered.set()
+        release.wait(5)
+
+    worker = threading.Thread(target=hasher.run, args=(blocked,))
+    worker.start()
+    entered.wait(5)
+    return release, worker
+
+@pytest.mark.unit
+@pytest.mark.auth
+class TestPasswordHasher:
+    """Test suite for PasswordHasher"""
+
+    def test_full_queue_raises_busy(self):
+        """Test a call that can't get a slot within queue_timeout is rejected instead of queued"""
+        hasher = PasswordHasher(workers=1, max_pending=0, queue_timeout=0.05, rounds=4)
+        release, worker = _hold_slot(hasher)
+        try:
+            with pytest.raises(PasswordHasherBusy):
+                hasher.hash("TestPassword123!")
+            assert hasher.stats()["rejected"] == 1
+        finally:
+            release.set()
+            worker.join()
+            hasher.shutdown()
+
+    def test_slot_released_after_error(self):
+        """Test a call that raises gives its slot back"""
+        hasher = PasswordHasher(workers=1, max_pending=0, queue_timeout=0, rounds=4)
+        try:
+            with pytest.raises(ValueError):
+                hasher.run(lambda: (_ for _ in ()).throw(ValueError("boom")))
+
+            assert hasher.stats()["in_flight"] == 0
+            assert hasher.verify("TestPassword123!", hasher.hash("TestPassword123!")) is True
+            assert hasher.stats()["rejected"] == 0
+        finally:
+            hasher.shutdown()
+
+    def test_stats(self):
+        """Test stats report the pool's configuration and the calls in flight"""
+        hasher = PasswordHasher(workers=2, max_pending=3, queue_timeout=0.05, rounds=4)
+        assert hasher.stats() == {"mode": "thread", "workers": 2, "max_pending": 3, "in_flight": 0, "rejected": 0}
+
+        release, worker = _hold_slot(hasher)
+        try:
+            assert hasher.stats()["in_flight"] == 1
+        finally:
+            release.set()
+            worker.join()
+            hasher.shutdown()
+        assert hasher.stats()["in_flight"] == 0
+
+    def test_auth_service_returns_503_when_busy(self, test_db, monkeypatch):
+        """Test AuthService sheds login work with 503 and Retry-After when the pool is full"""
+        hasher = PasswordHasher(workers=1, max_pending=0, queue_timeout=0.05, rounds=4)
+        monkeypatch.setattr(auth_service_module, "password_hasher", hasher)
+        release, worker = _hold_slot(hasher)
+        try:
+            with pytest.raises(HTTPException) as exc_info:
+                AuthService(test_db).verify_password("TestPassword123!", "$2b$04$" + "a" * 53)
+            assert exc_info.value.status_code == 503
+            assert exc_info.value.headers["Retry-After"] == "1"
+        finally:
+            release.set()
+            worker.join()
+            hasher.shutdown()
@@ -0,0 +1,56 @@
+"""
+Tests for per-request SQL query monitoring
+"""
+import pytest
+from sqlalchemy import text
+
+from app.database.query_monitor import (
+    install_query_monitor,
+    normalize_sql,
+    start_request_tracking,
+    stop_request_tracking,
+)
+
+@pytest.mark.unit
+@pytest.mark.database
+class TestQueryMonitor:
+    """Test suite for the query monitor"""
+
+    def test_normalize_sql_collapses_literals(self):
+        """Test that literals and IN-lists are normalized"""
+        first = normalize_sql("SELECT * FROM users WHERE id = 5 AND email = 'a@b.com'")
+        second = normalize_sql("SELECT  *  FROM users\nWHERE id = 42 AND email = 'x@y.org'")
+
+        assert first == second
+        assert normalize_sql("SELECT * FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (?)"
+
+    def test_queries_counted_per_request(self, test_db):
+        """Test that statements are counted against the active request"""
+        install_query_monitor(test_db.get_bind())
+
+        stats, token = start_request_tracking()
+        try:
+            for _ in range(3):
+                test_db.execute(text("SELECT 1"))
+        finally:
+            stop_request_tracking(token)
+
+        assert stats.query_count == 3
+        assert stats.total_db_time_ms >= 0
+        assert stats.repeated_statements()[0]["count"] == 3
+
+    def test_timing_headers_on_response(self, client):
+        """Test that responses carry timing and query count headers"""
+        response = client.get("/ping")
+
+        assert response.status_code == 200
+        assert "Server-Timing" in response.headers
+        assert response.headers["X-DB-Query-Count"] == "0"
+
+    def test_metrics_endpoint(self, client):
+        """Test that the metrics endpoint reports query aggregates"""
+        client.get("/ping")
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.json()["database"]["total_requests"] >= 1
@@ -0,0 +1,96 @@
+"""
+Tests for the token-bucket rate limiting middleware
+"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import charge_user_rate_limit
+from app.api.middleware import RateLimitMiddleware
+from app.config import settings
+from app.services.rate_limit import TokenBucketStore, resolve_client_ip
+
+def make_client(per_minute=60, burst=3, route_costs=None):
+    app = FastAPI()
+    
+    @app.get("/ping")
+    def ping():
+        return {"status": "ok"}
+    
+    @app.get("/predict")
+    def predict():
+        return {"status": "ok"}
+    
+    def signed_in(request: Request):
+        charge_user_rate_limit(request, SimpleNamespace(id=int(request.headers["X-User"])))
+    
+    @app.get("/me", dependencies=[Depends(signed_in)])
+    def me():
+        return {"status": "ok"}
+    
+    app.add_middleware(
+        RateLimitMiddleware,
+        store=TokenBucketStore(shards=4, max_keys=100),
+        per_minute=per_minute,
+        burst=burst,
+        route_costs=route_costs or {}
+    )
+    return TestClient(app, client=("10.0.0.2", 50000))
+
+@pytest.mark.unit
+@pytest.mark.api
+class TestRateLimit:
+    """Test suite for RateLimitMiddleware"""
+    
+    def test_burst_then_429_with_retry_after(self):
+        """Test requests beyond the burst are rejected with Retry-After"""
+        client = make_client(per_minute=60, burst=3)
+        
+        assert [client.get("/ping").status_code for _ in range(3)] == [200, 200, 200]
+        response = client.get("/ping")
+        
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+    
+    def test_route_costs_and_per_user_buckets(self, monkeypatch):
+        """Test expensive routes drain the IP bucket whatever token is sent, and users get their own bucket too"""
+        client = make_client(per_minute=6, burst=10, route_costs={"/predict": 10})
+        
+        assert client.get("/predict").status_code == 200
+        assert client.get("/ping").status_code == 429
+        assert client.get("/ping", headers={"X-Session-Token": "made-up"}).status_code == 429
+        
+        # One user spread over several client IPs still runs out of their own bucket
+        monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["10.0.0.0/8"])
+        client = make_client(per_minute=6, burst=2)
+        assert client.get("/me", headers={"X-User": "1", "X-Forwarded-For": "198.51.100.1"}).status_code == 200
+        assert client.get("/me", headers={"X-User": "1", "X-Forwarded-For": "198.51.100.2"}).status_code == 200
+        response = client.get("/me", headers={"X-User": "1", "X-Forwarded-For": "198.51.100.3"})
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+        assert client.get("/me", headers={"X-User": "2", "X-Forwarded-For": "198.51.100.4"}).status_code == 200
+    
+    def test_client_ip_from_trusted_proxy(self, monkeypatch):
+        """Test X-Forwarded-For is only honoured when the peer is a trusted proxy"""
+        proxies = ["10.0.0.0/8"]
+        assert resolve_client_ip("203.0.113.9", "198.51.100.1", proxies) == "203.0.113.9"
+        assert resolve_client_ip("10.0.0.5", "198.51.100.1", proxies) == "198.51.100.1"
+        # Entries left of the last untrusted hop are client-supplied and ignored
+        assert resolve_client_ip("10.0.0.5", "1.2.3.4, 198.51.100.1, 10.0.0.7", proxies) == "198.51.100.1"
+        assert resolve_client_ip("10.0.0.5", None, proxies) == "10.0.0.5"
+        
+        monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["10.0.0.2"])
+        client = make_client(per_minute=6, burst=1)
+        assert client.get("/ping", headers={"X-Forwarded-For": "198.51.100.1"}).status_code == 200
+        assert client.get("/ping", headers={"X-Forwarded-For": "198.51.100.2"}).status_code == 200
+        assert client.get("/ping", headers={"X-Forwarded-For": "198.51.100.1"}).status_code == 429
+    
+    def test_store_evicts_least_recently_used(self):
+        """Test the bucket store stays within its key budget"""
+        store = TokenBucketStore(shards=2, max_keys=10)
+        for i in range(100):
+            store.take(f"ip:{i}", 1, 1.0, 5)
+        
+        assert len(store) <= 10
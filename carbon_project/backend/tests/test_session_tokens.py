@@ -0,0 +1,118 @@
+"""
+Tests for signed session tokens and the revocation filter
+"""
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.services.auth_service import AuthService
+from app.services.session_tokens import (
+    DEFAULT_SECRET_KEY, _b64encode, _signature, revocation_filter, sign_session_token, verify_session_token
+)
+from app.schemas.user import LoginRequest
+
+@pytest.fixture
+def signed_mode(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TOKEN_MODE", "signed")
+    monkeypatch.setattr(settings, "SECRET_KEY", "test-signing-key-" + "k" * 32)
+
+@pytest.mark.unit
+@pytest.mark.auth
+class TestSignedSessionTokens:
+    """Test suite for SESSION_TOKEN_MODE=signed"""
+    
+    def _login(self, auth_service):
+        return auth_service.login(LoginRequest(
+            email="test@example.com",
+            name="Test User",
+            password="TestPassword123!"
+        ))
+    
+    def test_signed_token_verified_without_queries(self, test_db, test_user, signed_mode):
+        """Test a signed token resolves the user with no DB round trip once the filter is synced"""
+        from app.database.query_monitor import install_query_monitor, start_request_tracking, stop_request_tracking
+        
+        auth_service = AuthService(test_db)
+        login_response = self._login(auth_service)
+        auth_service.get_current_user(login_response.session_token)  # initial revocation sync
+        
+        install_query_monitor(test_db.get_bind())
+        query_stats, token = start_request_tracking()
+        try:
+            user = auth_service.get_current_user(login_response.session_token)
+        finally:
+            stop_request_tracking(token)
+        
+        assert query_stats.query_count == 0
+        assert user.id == test_user.id
+        assert user.email == "test@example.com"
+    
+    def test_tampered_token_rejected(self, test_db, test_user, signed_mode):
+        """Test a token whose payload was altered fails verification"""
+        auth_service = AuthService(test_db)
+        payload, signature = self._login(auth_service).session_token.split(".")
+        
+        tampered = payload[:-2] + ("AA" if payload[-2:] != "AA" else "BB") + "." + signature
+        
+        assert verify_session_token(tampered) is None
+        assert auth_service.get_current_user(tampered) is None
+    
+    def test_logout_revokes_across_workers(self, test_db, test_user, signed_mode):
+        """Test revocations recorded by one worker are picked up by another worker's sync"""
+        auth_service = AuthService(test_db)
+        first = self._login(auth_service)
+        second = self._login(auth_service)
+        
+        assert auth_service.logout(first.session_token) is True
+        assert auth_service.get_current_user(first.session_token) is None
+        assert auth_service.get_current_user(second.session_token) is not None
+        
+        # A fresh worker has an empty filter and must learn the revocation from user_sessions
+        revocation_filter.clear()
+        assert auth_service.get_current_user(first.session_token) is None
+        
+        assert auth_service.logout_all_sessions(test_user.id) == 1
+        revocation_filter.clear()
+        assert auth_service.get_current_user(second.session_token) is None
+    
+    def test_signed_mode_requires_private_key(self, monkeypatch, signed_mode):
+        """Test startup refuses signed mode with the default or a short SECRET_KEY"""
+        from app.services.session_tokens import check_signing_key
+        
+        monkeypatch.setattr(settings, "SECRET_KEY", DEFAULT_SECRET_KEY)
+        with pytest.raises(RuntimeError):
+            check_signing_key()
+        monkeypatch.setattr(settings, "SECRET_KEY", "short")
+        with pytest.raises(RuntimeError):
+            check_signing_key()
+        monkeypatch.setattr(settings, "SECRET_KEY", "k" * 48)
+        check_signing_key()
+
+    def test_signed_token_refused_in_opaque_mode(self, test_db, test_user, monkeypatch):
+        """Test a token signed with the public default key can't be used to log in by default"""
+        monkeypatch.setattr(settings, "SECRET_KEY", DEFAULT_SECRET_KEY)
+        monkeypatch.setattr(settings, "SESSION_TOKEN_MODE", "signed")
+        with pytest.raises(RuntimeError):
+            sign_session_token(999, {"id": test_user.id, "email": test_user.email}, datetime.utcnow() + timedelta(hours=1))
+        
+        # Forge the token by hand, as an attacker who knows the default key would
+        payload = _b64encode(json.dumps({
+            "sid": 999, "exp": int(time.time()) + 3600, "user": {"id": test_user.id, "email": test_user.email}
+        }).encode("utf-8"))
+        forged = f"{payload}.{_signature(payload)}"
+        
+        auth_service = AuthService(test_db)
+        assert auth_service.get_current_user(forged) is None
+        monkeypatch.setattr(settings, "SESSION_TOKEN_MODE", "opaque")
+        assert verify_session_token(forged) is None
+        assert auth_service.get_current_user(forged) is None
+        assert auth_service.logout(forged) is False
+    
+    def test_signed_token_refused_after_switching_to_opaque(self, test_db, test_user, signed_mode, monkeypatch):
+        """Test a validly signed token stops working once the app runs in opaque mode"""
+        token = self._login(AuthService(test_db)).session_token
+        monkeypatch.setattr(settings, "SESSION_TOKEN_MODE", "opaque")
+        assert AuthService(test_db).get_current_user(token) is None
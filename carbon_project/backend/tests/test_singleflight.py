@@ -0,0 +1,74 @@
+"""
+Tests for single-flight request coalescing
+"""
+import threading
+import time
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+@pytest.mark.unit
+class TestSingleFlight:
+    """Test suite for SingleFlight"""
+    
+    def _run_concurrently(self, flight, key, fn, callers, timeout=None):
+        results, errors = [], []
+        
+        def call():
+            try:
+                results.append(flight.do(key, fn, timeout))
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+    
+    def test_concurrent_calls_share_one_execution(self):
+        """Test identical concurrent calls run the function once"""
+        flight = SingleFlight()
+        executions = []
+        
+        def compute():
+            executions.append(1)
+            time.sleep(0.2)
+            return {"total": 42}
+        
+        results, errors = self._run_concurrently(flight, ("stats", 1), compute, 5)
+        
+        assert not errors
+        assert len(executions) == 1
+        assert results == [{"total": 42}] * 5
+        assert flight.stats()["coalesced"] == 4
+        assert flight.stats()["in_flight"] == 0
+    
+    def test_errors_propagate_to_waiters(self):
+        """Test waiters receive the leader's exception"""
+        flight = SingleFlight()
+        
+        def fail():
+            time.sleep(0.2)
+            raise RuntimeError("database unavailable")
+        
+        results, errors = self._run_concurrently(flight, "key", fail, 3)
+        
+        assert not results
+        assert len(errors) == 3
+        assert flight.stats()["errors"] == 1
+    
+    def test_waiter_timeout_computes_independently(self):
+        """Test a waiter that times out runs the function itself"""
+        flight = SingleFlight()
+        
+        def slow():
+            time.sleep(0.5)
+            return "done"
+        
+        results, errors = self._run_concurrently(flight, "key", slow, 2, timeout=0.05)
+        
+        assert results == ["done", "done"]
+        assert flight.stats()["timeouts"] == 1
+        assert flight.stats()["executions"] == 2
@@ -0,0 +1,71 @@
+"""
+Tests for SQL trend bucketing and LTTB downsampling
+"""
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.repositories.carbon_footprint_repository import CarbonFootprintRepository
+from app.repositories.trends import lttb
+from app.schemas.carbon_footprint import CarbonFootprintCreate
+
+@pytest.mark.unit
+@pytest.mark.carbon
+class TestTrends:
+    """Test suite for the trends engine"""
+
+    def _create_history(self, test_db, user_id, days):
+        footprint_repo = CarbonFootprintRepository(test_db)
+        now = datetime.utcnow()
+        for i in range(days):
+            footprint = footprint_repo.create_carbon_footprint(user_id, CarbonFootprintCreate(
+                input_data={"day": i},
+                total_emissions=Decimal(f"{1000 + i * 10}"),
+                confidence_score=Decimal("0.9"),
+                model_name="test_model",
+                electricity_emissions=Decimal("100")
+            ))
+            footprint.calculation_date = now - timedelta(days=i)
+        test_db.commit()
+        return footprint_repo
+
+    def test_lttb_keeps_endpoints_and_size(self):
+        """Test LTTB returns the requested number of points including first and last"""
+        points = [{"x": i, "y": (i % 7) * 3.0} for i in range(100)]
+
+        sampled = lttb(points, 10, x=lambda p: p["x"], y=lambda p: p["y"])
+
+        assert len(sampled) == 10
+        assert sampled[0] is points[0]
+        assert sampled[-1] is points[-1]
+        assert lttb(points, 200, x=lambda p: p["x"], y=lambda p: p["y"]) is points
+
+    def test_raw_trends_skip_input_data(self, test_db, test_user):
+        """Test raw trends return one point per calculation, oldest first"""
+        footprint_repo = self._create_history(test_db, test_user.id, 5)
+
+        trends = footprint_repo.get_footprint_trends(test_user.id, days=30)
+
+        assert len(trends) == 5
+        assert trends[0]["total_emissions"] == 1040.0
+        assert "input_data" not in trends[0]
+
+    def test_weekly_buckets_aggregate_in_sql(self, test_db, test_user):
+        """Test weekly buckets carry counts and min/max per category"""
+        footprint_repo = self._create_history(test_db, test_user.id, 21)
+
+        buckets = footprint_repo.get_footprint_trends(test_user.id, days=30, bucket="week")
+
+        assert sum(b["count"] for b in buckets) == 21
+        assert all(datetime.fromisoformat(b["date"]).weekday() == 0 for b in buckets)
+        for b in buckets:
+            assert b["min"]["total_emissions"] <= b["total_emissions"] <= b["max"]["total_emissions"]
+            assert b["electricity_emissions"] == 100.0
+
+    def test_daily_buckets_downsampled(self, test_db, test_user):
+        """Test max_points caps the number of returned buckets"""
+        footprint_repo = self._create_history(test_db, test_user.id, 20)
+
+        buckets = footprint_repo.get_footprint_trends(test_user.id, days=30, bucket="day", max_points=5)
+
+        assert len(buckets) == 5